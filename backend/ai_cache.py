@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(prompt, role, model):
+    """Content address for a model call: whitespace-normalized prompt + role + model."""
+    normalized = ' '.join(prompt.split())
+    digest = hashlib.sha256()
+    for part in (model, role or '', normalized):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU tier bounded by entry count and total bytes, with a TTL."""
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value.encode('utf-8'))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+
+class SQLiteCache:
+    """Shared tier in a local SQLite file so every gunicorn worker on the host sees the same entries."""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS ai_response_cache '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value FROM ai_response_cache WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, value, time.time() + self.ttl)
+        )
+        conn.execute('DELETE FROM ai_response_cache WHERE expires_at <= ?', (time.time(),))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM ai_response_cache')
+
+
+class RedisCache:
+    """Shared tier on any Redis-compatible server; entries expire server-side."""
+
+    prefix = 'aarna:ai:'
+
+    def __init__(self, url, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('AI_CACHE_URL points at Redis but the redis package is not installed')
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, value.encode('utf-8'), ex=int(self.ttl))
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+
+class ResponseCache:
+    """Two-tier cache for model responses with hit/miss counters."""
+
+    def __init__(self, memory, shared=None):
+        self.memory = memory
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0, 'bypassed': 0, 'shared_errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception:
+                # A broken shared tier must never fail the request; fall through to the model
+                logger.warning('AI cache shared tier read failed', exc_info=True)
+                self._count('shared_errors')
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+                self._count('shared_hits')
+                return value
+        self._count('misses')
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception:
+                logger.warning('AI cache shared tier write failed', exc_info=True)
+                self._count('shared_errors')
+
+    def record_bypass(self):
+        self._count('bypassed')
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats['memory_hits'] + stats['shared_hits']
+        lookups = hits + stats['misses']
+        stats.update({
+            'hits': hits,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'memory_entries': len(self.memory),
+            'memory_bytes': self.memory.size_bytes,
+            'shared_backend': type(self.shared).__name__ if self.shared is not None else None,
+        })
+        return stats
+
+    def clear(self):
+        self.memory.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def build_response_cache():
+    """Build the cache from AI_CACHE_* environment variables.
+
+    AI_CACHE_URL selects the optional shared tier: ``sqlite:///path/to/file``
+    or ``redis://host:port/db``. Without it only the in-process tier is used.
+    """
+    ttl = float(os.environ.get('AI_CACHE_TTL', 3600))
+    memory = MemoryCache(
+        ttl=ttl,
+        max_entries=int(os.environ.get('AI_CACHE_MAX_ENTRIES', 1000)),
+        max_bytes=int(os.environ.get('AI_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    )
+    url = os.environ.get('AI_CACHE_URL', '')
+    shared = None
+    if url.startswith('sqlite:///'):
+        shared = SQLiteCache(url[len('sqlite:///'):], ttl)
+    elif url.startswith(('redis://', 'rediss://', 'unix://')):
+        shared = RedisCache(url, ttl)
+    elif url:
+        raise RuntimeError(f"Unsupported AI_CACHE_URL: {url}")
+    return ResponseCache(memory, shared)
+
+
+def get_response_cache():
+    """Process-wide cache instance, created on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = build_response_cache()
+    return _cache
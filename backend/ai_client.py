@@ -0,0 +1,70 @@
+import atexit
+import os
+import threading
+import httpx
+from google import genai
+from google.genai import types
+
+
+def get_configured_api_key():
+    return os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
+
+
+class GenaiClientRegistry:
+    """One Gemini client per worker process, shared by all of its threads.
+
+    The client sits on a pooled keep-alive httpx connection pool, so requests
+    reuse warm TLS connections instead of building a client and handshaking
+    every time. It is rebuilt when the configured API key changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._api_key = None
+        self._http_clients = []
+
+    def get(self):
+        api_key = get_configured_api_key()
+        if not api_key:
+            return None
+        client = self._client
+        if client is not None and self._api_key == api_key:
+            return client
+        with self._lock:
+            if self._client is None or self._api_key != api_key:
+                # Clients for an old key are retired rather than closed, as other
+                # threads may still be mid-request on them; close() releases them all.
+                self._client = self._build(api_key)
+                self._api_key = api_key
+            return self._client
+
+    def _build(self, api_key):
+        max_connections = int(os.environ.get('AI_HTTP_MAX_CONNECTIONS', 8))
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=float(os.environ.get('AI_HTTP_KEEPALIVE', 60))
+            ),
+            timeout=float(os.environ.get('AI_HTTP_TIMEOUT', 60))
+        )
+        self._http_clients.append(http_client)
+        http_options = types.HttpOptions(
+            httpx_client=http_client,
+            # GEMINI_BASE_URL points the SDK at a local stub for benchmarks and offline runs
+            base_url=os.environ.get('GEMINI_BASE_URL') or None
+        )
+        return genai.Client(api_key=api_key, http_options=http_options)
+
+    def close(self):
+        with self._lock:
+            for http_client in self._http_clients:
+                http_client.close()
+            self._http_clients = []
+            self._client = None
+            self._api_key = None
+
+
+client_registry = GenaiClientRegistry()
+atexit.register(client_registry.close)
@@ -0,0 +1,219 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import httpx
+
+
+class AIUnavailable(Exception):
+    """The model call was refused locally (breaker open, queue full or deadline spent)."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+def is_throttled(error):
+    return getattr(error, 'code', None) == 429
+
+
+def is_upstream_failure(error):
+    """Errors that say Gemini is unhealthy, as opposed to a bad request."""
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError, TimeoutError))
+
+
+class AdaptiveTokenBucket:
+    """Token bucket shared by all threads; halves its rate on 429s and creeps back up on success."""
+
+    def __init__(self, rate, burst, min_rate):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, deadline):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                raise AIUnavailable('AI rate limit reached, try again shortly', wait)
+            time.sleep(wait)
+
+    def on_throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` upstream failures within `window` seconds.
+
+    While open every call fails fast; after `cooldown` one probe call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold, window, cooldown):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self._failures = []
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'closed':
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.cooldown - now
+            if self.state == 'open' and remaining <= 0:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            raise AIUnavailable('AI service is temporarily unavailable', max(remaining, 1))
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = []
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            self._probe_in_flight = False
+            self._failures = [t for t in self._failures if t > now - self.window] + [now]
+            if self.state == 'half_open' or len(self._failures) >= self.threshold:
+                self.state = 'open'
+                self._opened_at = now
+
+    def release_probe(self):
+        # A probe that ended without a verdict (e.g. a 400) lets the next call probe instead
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class ModelCallGuard:
+    """Rate limit, concurrency cap, circuit breaker and deadline for outbound model calls."""
+
+    def __init__(self, rate, burst, min_rate, max_in_flight, queue_timeout, deadline,
+                 breaker_threshold, breaker_window, breaker_cooldown):
+        self.bucket = AdaptiveTokenBucket(rate, burst, min_rate)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_window, breaker_cooldown)
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0, 'succeeded': 0, 'failed': 0, 'throttled': 0, 'rejected': 0, 'in_flight': 0,
+            'queue_delay_total_ms': 0.0, 'queue_delay_max_ms': 0.0
+        }
+
+    def _count(self, **changes):
+        with self._lock:
+            for name, delta in changes.items():
+                self.stats[name] += delta
+
+    @contextmanager
+    def slot(self):
+        """Hold an in-flight slot for one model call; yields the seconds left before the deadline."""
+        started = time.monotonic()
+        deadline = started + self.deadline
+        try:
+            self.breaker.before_call()
+        except AIUnavailable:
+            self._count(rejected=1)
+            raise
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.breaker.release_probe()
+            self._count(rejected=1)
+            raise AIUnavailable('Too many AI requests in flight, try again shortly', self.queue_timeout)
+        try:
+            try:
+                self.bucket.acquire(min(deadline, started + self.queue_timeout))
+            except AIUnavailable:
+                self.breaker.release_probe()
+                self._count(rejected=1)
+                raise
+            waited_ms = (time.monotonic() - started) * 1000
+            with self._lock:
+                self.stats['calls'] += 1
+                self.stats['in_flight'] += 1
+                self.stats['queue_delay_total_ms'] += waited_ms
+                self.stats['queue_delay_max_ms'] = max(self.stats['queue_delay_max_ms'], waited_ms)
+            try:
+                yield deadline - time.monotonic()
+            except Exception as e:
+                if is_throttled(e):
+                    self.bucket.on_throttled()
+                    self._count(throttled=1)
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release_probe()
+                self._count(failed=1)
+                raise
+            except BaseException:
+                # e.g. GeneratorExit when a streaming client disconnects
+                self.breaker.release_probe()
+                raise
+            else:
+                self.bucket.on_success()
+                self.breaker.record_success()
+                self._count(succeeded=1)
+            finally:
+                self._count(in_flight=-1)
+        finally:
+            self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({
+            'breaker_state': self.breaker.state,
+            'max_in_flight': self.max_in_flight,
+            'rate_per_sec': round(self.bucket.rate, 3),
+            'queue_delay_avg_ms': round(stats['queue_delay_total_ms'] / stats['calls'], 2) if stats['calls'] else 0.0,
+        })
+        return stats
+
+
+def build_model_call_guard():
+    """Build the guard from AI_* environment variables (per worker process)."""
+    rate = float(os.environ.get('AI_RATE_PER_SEC', 5))
+    return ModelCallGuard(
+        rate=rate,
+        burst=float(os.environ.get('AI_RATE_BURST', 10)),
+        min_rate=float(os.environ.get('AI_RATE_MIN_PER_SEC', 0.5)),
+        max_in_flight=int(os.environ.get('AI_MAX_IN_FLIGHT', 8)),
+        queue_timeout=float(os.environ.get('AI_QUEUE_TIMEOUT', 5)),
+        deadline=float(os.environ.get('AI_CALL_DEADLINE', 30)),
+        breaker_threshold=int(os.environ.get('AI_BREAKER_THRESHOLD', 5)),
+        breaker_window=float(os.environ.get('AI_BREAKER_WINDOW', 30)),
+        breaker_cooldown=float(os.environ.get('AI_BREAKER_COOLDOWN', 30))
+    )
+
+
+model_call_guard = build_model_call_guard()
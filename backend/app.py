@@ -9,7 +9,22 @@ from routes.assignments import assignments_bp
 from routes.submissions import submissions_bp
 from routes.resources import resources_bp
 from routes.users import users_bp
-from models import User
+from routes.dashboard import dashboard_bp
+from routes.bulk import bulk_bp
+from routes.health import health_bp
+from routes.search import search_bp
+from routes.tasks import tasks_bp
+from identity_cache import load_user_snapshot
+from pagination import PaginationError
+from blob_store import BlobTooLarge, blobs_cli, init_blob_store
+from instrumentation import init_instrumentation
+from db_config import configure_engine, engine_options
+from replicas import init_replicas, replica_binds
+from http_cache import init_http_cache
+from grading_queue import grading_queue_cli
+from search_index import search_cli
+from tasks import init_tasks, tasks_cli
+from semantic_index import init_semantic_index, semantic_cli
 
 # Load environment variables
 load_dotenv()
@@ -25,6 +40,9 @@ def create_app():
     if database_url.startswith('postgres://'):
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+    # Optional read replicas (DATABASE_REPLICA_URLS), used for reads in GET requests
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(engine_options)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
     # Session configuration for production
@@ -34,23 +52,37 @@ def create_app():
 
     # Initialize extensions
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine)
+        init_replicas(app, db)
     migrate.init_app(app, db)
     
     # CORS configuration - use CORS_ORIGINS env var for production
     cors_origins = os.environ.get('CORS_ORIGINS', 'http://localhost:3000,http://localhost:8080,http://localhost:5173').split(',')
     cors.init_app(app, resources={r"/api/*": {"origins": [o.strip() for o in cors_origins]}}, supports_credentials=True)
     
+    init_instrumentation(app)
+    init_http_cache(app)
+    init_blob_store(app)
+    init_tasks(app)
+    init_semantic_index(app)
+
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # Served from the per-worker identity cache; no query on a hit
+        return load_user_snapshot(int(user_id))
     
-    # Health check endpoint
-    @app.route('/health')
-    def health_check():
-        return jsonify({'status': 'healthy', 'service': 'aarna-backend'})
+    @app.errorhandler(PaginationError)
+    def handle_pagination_error(e):
+        return jsonify({'error': str(e)}), 400
+
+    @app.errorhandler(BlobTooLarge)
+    def handle_blob_too_large(e):
+        return jsonify({'error': str(e)}), 413
 
     # Register Blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -60,11 +92,22 @@ def create_app():
     app.register_blueprint(submissions_bp, url_prefix='/api/submissions')
     app.register_blueprint(resources_bp, url_prefix='/api/resources')
     app.register_blueprint(users_bp, url_prefix='/api/users')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(bulk_bp, url_prefix='/api/bulk')
+    app.register_blueprint(search_bp, url_prefix='/api/search')
+    app.register_blueprint(tasks_bp, url_prefix='/api/tasks')
+    app.register_blueprint(health_bp)
+
+    app.cli.add_command(grading_queue_cli)
+    app.cli.add_command(blobs_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(tasks_cli)
+    app.cli.add_command(semantic_cli)
 
     return app
 
 if __name__ == '__main__':
     app = create_app()
     with app.app_context():
-        db.create_all()
+        db.create_all(bind_key=None)
     app.run(debug=True, port=5000)
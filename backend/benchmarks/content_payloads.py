@@ -0,0 +1,100 @@
+"""Compare submission row width and list response size with content inline and offloaded to the blob store.
+
+Seeds one class (see synthetic_data.py) where every student has submitted
+--content-kb of text for one assignment, stored inline in the submission
+row as it was before the blob store. It then measures the teacher's
+submission list, runs `flask blobs offload` and measures again. The
+"full-content" column is what the list returned before it switched to
+previews.
+
+Usage (from backend/):
+    python benchmarks/content_payloads.py
+    python benchmarks/content_payloads.py --students 200 --content-kb 64
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select, update
+from synthetic_data import PIN, generate, reset_schema
+from models import Assignment, Submission
+
+WORDS = ('fraction', 'numerator', 'the', 'water', 'cycle', 'evaporates', 'and', 'story', 'summer', 'because')
+
+
+def row_bytes(db):
+    columns = (Submission.content, Submission.content_sha256, Submission.content_preview, Submission.feedback)
+    total = sum(func.coalesce(func.length(c), 0) for c in columns)
+    return db.session.execute(select(func.avg(total))).scalar()
+
+
+def measure(client, url, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    return len(response.data), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--content-kb', type=int, default=32)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='aarna-blobs-')
+    database_url = f"sqlite:///{os.path.join(workdir, 'content.sqlite3')}"
+    os.environ.update({'DATABASE_URL': database_url, 'BLOB_STORE_URL': f"file://{os.path.join(workdir, 'blobs')}",
+                       'PERF_REQUEST_LOG': '0', 'PASSWORD_HASH_WORKERS': '0'})
+
+    engine = create_engine(database_url)
+    reset_schema(engine)
+    _, ids = generate(engine, schools=1, classes_per_school=1, students_per_class=args.students,
+                      assignments_per_class=1, submission_rate=1, graded_rate=0, resources_per_teacher=0)
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        for submission_id in ids['submissions']:
+            words = [rng.choice(WORDS) for _ in range(args.content_kb * 1024 // 7)]
+            conn.execute(update(Submission).where(Submission.id == submission_id).values(content=' '.join(words)))
+    engine.dispose()
+
+    from app import create_app
+    from extensions import db
+    app = create_app()
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'user_id': ids['teachers'][0], 'pin': PIN})
+    if response.status_code != 200:
+        raise SystemExit(f'login failed: {response.get_json()}')
+    with app.app_context():
+        assignment_id = db.session.execute(select(Assignment.id)).scalar()
+        page = Submission.query.order_by(Submission.id).limit(100)
+        full = json.dumps([{'id': s.id, 'content': s.content} for s in page])
+    url = f'/api/submissions/assignment/{assignment_id}?limit=100'
+
+    print(f'{args.students} submissions of {args.content_kb} KB; list page of up to 100')
+    print(f"{'layout':10s} {'row bytes':>10s} {'list bytes':>11s} {'list p50 ms':>12s} {'full-content bytes':>19s}")
+    with app.app_context():
+        width = row_bytes(db)
+    size, p50 = measure(client, url, args.runs)
+    print(f"{'inline':10s} {width:10.0f} {size:11d} {p50:12.2f} {len(full):19d}")
+
+    result = app.test_cli_runner().invoke(args=['blobs', 'offload'])
+    if result.exit_code:
+        raise SystemExit(result.output)
+    with app.app_context():
+        width = row_bytes(db)
+    size, p50 = measure(client, url, args.runs)
+    print(f"{'offloaded':10s} {width:10.0f} {size:11d} {p50:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Local stand-in for the Gemini REST API so benchmarks run offline.
+
+Answers generateContent and streamGenerateContent calls with a canned completion after an optional
+artificial latency. Point the backend at it with GEMINI_BASE_URL.
+
+Usage (from backend/):
+    python benchmarks/gemini_stub.py --port 8765 --latency-ms 200
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def completion_body(text):
+    return {
+        'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+        'usageMetadata': {'promptTokenCount': 10, 'candidatesTokenCount': len(text.split()),
+                          'totalTokenCount': 10 + len(text.split())},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between calls
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    reply = '{"grade": "A", "feedback": "Stub feedback."}'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        if ':streamGenerateContent' in self.path:
+            return self.stream()
+        if self.latency:
+            time.sleep(self.latency)
+        payload = json.dumps(completion_body(self.reply)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def stream(self):
+        # The SDK requests alt=sse; spread the latency across word-sized chunks
+        words = self.reply.split(' ')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, word in enumerate(words):
+            if self.latency:
+                time.sleep(self.latency / len(words))
+            body = completion_body(word + (' ' if i < len(words) - 1 else ''))
+            if i < len(words) - 1:
+                del body['usageMetadata']
+            event = f'data: {json.dumps(body)}\r\n\r\n'.encode()
+            self.wfile.write(f'{len(event):x}\r\n'.encode() + event + b'\r\n')
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, latency_ms=0):
+    """Start the stub on a background thread and return (server, base_url)."""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'latency': latency_ms / 1000.0})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+    server, url = start_stub(args.port, args.latency_ms)
+    print(f'Gemini stub listening on {url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
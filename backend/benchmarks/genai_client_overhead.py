@@ -0,0 +1,68 @@
+"""Measure per-request overhead of building a Gemini client per call vs. reusing the worker's client.
+
+Runs against the local stub server, so the difference is client construction
+plus connection setup (a real deployment also saves the TLS handshake).
+
+Usage (from backend/):
+    python benchmarks/genai_client_overhead.py --requests 200 --threads 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google import genai
+from google.genai import types
+from ai_client import GenaiClientRegistry
+from gemini_stub import start_stub
+
+MODEL = 'gemini-2.5-flash'
+
+
+def fresh_client_call(base_url):
+    client = genai.Client(api_key='stub-key', http_options=types.HttpOptions(base_url=base_url))
+    return client.models.generate_content(model=MODEL, contents='Hello').text
+
+
+def run(label, call, requests, threads):
+    def timed(_):
+        started = time.perf_counter()
+        call()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+    p50 = statistics.median(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f'{label:16s} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  throughput {requests / elapsed:7.1f} req/s')
+    return p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    server, base_url = start_stub()
+    os.environ['GEMINI_API_KEY'] = 'stub-key'
+    os.environ['GEMINI_BASE_URL'] = base_url
+    registry = GenaiClientRegistry()
+    try:
+        fresh = run('client per call', lambda: fresh_client_call(base_url), args.requests, args.threads)
+        shared = run('shared client', lambda: registry.get().models.generate_content(model=MODEL, contents='Hello').text,
+                     args.requests, args.threads)
+        print(f'Saved per request (p50): {fresh - shared:.2f} ms')
+    finally:
+        registry.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
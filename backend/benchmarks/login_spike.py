@@ -0,0 +1,123 @@
+"""Replay the start-of-period login spike: a whole class signs in with PINs inside a few seconds.
+
+Seeds one school (see synthetic_data.py), serves the app on a local threaded
+server and fires --students PIN logins at random moments within --window
+seconds, alongside --email-logins email/password logins from teachers. A
+probe client polls a cheap endpoint throughout, so the report shows how much
+the spike slows unrelated requests on the same worker.
+
+Usage (from backend/):
+    python benchmarks/login_spike.py
+    python benchmarks/login_spike.py --students 30 --window 10 --email-logins 6
+    python benchmarks/login_spike.py --window 0    # everyone at the same instant
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import create_engine
+from werkzeug.serving import make_server
+from synthetic_data import PASSWORD, PIN, generate, reset_schema
+
+PROBE_INTERVAL = 0.05
+
+
+def summarize(label, latencies, failures=0):
+    if not latencies:
+        print(f'{label:22s} no samples')
+        return
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(round(len(latencies) * 0.95)) - 1)]
+    print(f'{label:22s} n={len(latencies):4d} fail={failures:3d}  p50 {statistics.median(latencies):8.1f} ms  '
+          f'p95 {p95:8.1f} ms  max {latencies[-1]:8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///bench_login_spike.sqlite3')
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--window', type=float, default=10.0, help='seconds over which the logins arrive')
+    parser.add_argument('--email-logins', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    if args.database_url.startswith('sqlite:///') and not args.database_url.startswith('sqlite:////'):
+        args.database_url = 'sqlite:///' + os.path.abspath(args.database_url[len('sqlite:///'):])
+    os.environ.update({'DATABASE_URL': args.database_url, 'PERF_REQUEST_LOG': '0'})
+    from app import create_app
+
+    engine = create_engine(args.database_url)
+    reset_schema(engine)
+    _, ids = generate(engine, schools=1, classes_per_school=2, students_per_class=args.students,
+                      assignments_per_class=1, classes_per_teacher=1, seed=args.seed)
+    with engine.connect() as conn:
+        emails = dict(conn.exec_driver_sql('SELECT id, email FROM "user"').fetchall())
+
+    app = create_app()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    rng = random.Random(args.seed)
+    results = {'pin': [], 'email': [], 'probe': []}
+    failures = {'pin': 0, 'email': 0}
+    lock = threading.Lock()
+
+    def login(kind, payload, at):
+        time.sleep(max(0.0, at - (time.perf_counter() - started)))
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            t = time.perf_counter()
+            response = client.post('/api/auth/login', json=payload)
+            elapsed = (time.perf_counter() - t) * 1000
+        with lock:
+            results[kind].append(elapsed)
+            if response.status_code != 200:
+                failures[kind] += 1
+
+    done = threading.Event()
+
+    def probe():
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while not done.is_set():
+                t = time.perf_counter()
+                client.get('/api/auth/public/classes')
+                results['probe'].append((time.perf_counter() - t) * 1000)
+                time.sleep(PROBE_INTERVAL)
+
+    students = ids['students'][:args.students]
+    teachers = (ids['teachers'] * args.email_logins)[:args.email_logins]
+    jobs = [('pin', {'user_id': s, 'pin': PIN}) for s in students]
+    jobs += [('email', {'email': emails[t], 'password': PASSWORD}) for t in teachers]
+
+    probe_thread = threading.Thread(target=probe, daemon=True)
+    probe_thread.start()
+    time.sleep(0.5)
+    started = time.perf_counter()
+    threads = [threading.Thread(target=login, args=(kind, payload, rng.uniform(0, args.window)))
+               for kind, payload in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+    server.shutdown()
+
+    print(f'{len(students)} PIN + {len(teachers)} email logins over {args.window:g}s (finished in {elapsed:.1f}s)')
+    summarize('PIN login', results['pin'], failures['pin'])
+    summarize('email/password login', results['email'], failures['email'])
+    summarize('other requests', results['probe'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Generate a deterministic synthetic school dataset and bulk-load it into SQLite or Postgres.
+
+Shape: schools x classes per school x students per class x assignments per class,
+with a configurable share of assignments submitted and graded. The same --seed
+always produces the same rows, so benchmark runs are comparable. Every user
+has PIN 1234 and password "password".
+
+There is no school table; a school is a naming prefix plus its own teachers
+and admin, which is how a multi-school deployment of this schema looks.
+
+Usage (from backend/):
+    python benchmarks/synthetic_data.py --database-url sqlite:///bench_synthetic.sqlite3
+    python benchmarks/synthetic_data.py --schools 10 --classes-per-school 40 --students-per-class 30
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from werkzeug.security import generate_password_hash
+from credentials import hash_pin
+from extensions import db
+from grading_queue import QUEUE_COLUMNS, pending_queue
+from models import User, Class, Enrollment, Assignment, Submission, Resource, GradingQueueItem
+
+CHUNK = 10000
+PIN = '1234'
+PASSWORD = 'password'
+SUBJECTS = ('Math', 'Science', 'English', 'History', 'Art')
+RESOURCE_TYPES = ('worksheet', 'quiz', 'visual')
+
+
+def insert_chunked(conn, table, rows):
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            conn.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+        count += len(batch)
+    return count
+
+
+def generate(engine, schools=2, classes_per_school=10, students_per_class=25, assignments_per_class=20,
+             classes_per_teacher=2, submission_rate=0.8, graded_rate=0.5, resources_per_teacher=10, seed=42):
+    """Load the dataset into an empty schema and return the ids the load harness needs."""
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 6, 9, 0, 0)
+    # One hash for everyone; hashing per user would dominate the load time
+    password_hash = generate_password_hash(PASSWORD)
+    pin_hash = hash_pin(PIN)
+
+    teachers_per_school = max(1, -(-classes_per_school // classes_per_teacher))
+    ids = {'admins': [], 'teachers': [], 'students': [], 'classes': [], 'assignments': [], 'submissions': []}
+    users, classes, enrollments, assignments = [], [], [], []
+    user_id = class_id = assignment_id = 0
+
+    def add_user(role, name, email, class_name=None):
+        nonlocal user_id
+        user_id += 1
+        users.append({'id': user_id, 'name': name, 'email': email, 'password_hash': password_hash,
+                      'role': role, 'pin_hash': pin_hash, 'class_name': class_name, 'created_at': now})
+        return user_id
+
+    for s in range(schools):
+        ids['admins'].append(add_user('admin', f'Admin {s}', f'admin{s}@school{s}.bench'))
+        teachers = [add_user('teacher', f'Teacher {s}-{t}', f'teacher{t}@school{s}.bench')
+                    for t in range(teachers_per_school)]
+        ids['teachers'].extend(teachers)
+        for c in range(classes_per_school):
+            class_id += 1
+            name = f'S{s} Grade {c // 4 + 1}{"ABCD"[c % 4]}'
+            classes.append({'id': class_id, 'name': name, 'teacher_id': teachers[c // classes_per_teacher],
+                            'created_at': now})
+            ids['classes'].append(class_id)
+            for n in range(students_per_class):
+                student = add_user('student', f'Student {s}-{c}-{n}', f'student{c}-{n}@school{s}.bench', name)
+                ids['students'].append(student)
+                enrollments.append({'class_id': class_id, 'student_id': student, 'created_at': now})
+            for a in range(assignments_per_class):
+                assignment_id += 1
+                assignments.append({
+                    'id': assignment_id, 'title': f'Assignment {a} for {name}', 'subject': SUBJECTS[a % len(SUBJECTS)],
+                    'description': 'Answer the questions in full sentences.', 'class_id': class_id, 'status': 'pending',
+                    'due_date': now + timedelta(days=a - assignments_per_class // 2), 'created_at': now + timedelta(minutes=a)
+                })
+                ids['assignments'].append(assignment_id)
+
+    def submissions():
+        submission_id = 0
+        students_by_class = {}
+        for e in enrollments:
+            students_by_class.setdefault(e['class_id'], []).append(e['student_id'])
+        for a in assignments:
+            for student in students_by_class[a['class_id']]:
+                if rng.random() >= submission_rate:
+                    continue
+                submission_id += 1
+                graded = rng.random() < graded_rate
+                ids['submissions'].append(submission_id)
+                yield {
+                    'id': submission_id, 'assignment_id': a['id'], 'student_id': student,
+                    'content': 'My answer. ' * rng.randint(5, 60),
+                    'submitted_at': a['created_at'] + timedelta(hours=rng.randint(1, 96)),
+                    'grade': rng.choice('ABCD') if graded else None,
+                    'feedback': 'Good work, keep it up.' if graded else None,
+                    'status': 'graded' if graded else 'submitted'
+                }
+
+    resources = ({
+        'title': f'Resource {r} by {t}', 'type': RESOURCE_TYPES[r % len(RESOURCE_TYPES)],
+        'subject': SUBJECTS[r % len(SUBJECTS)], 'grade': 'Grade 5', 'content': 'Worksheet body.',
+        'teacher_id': t, 'created_at': now + timedelta(minutes=r)
+    } for t in ids['teachers'] for r in range(resources_per_teacher))
+
+    counts = {}
+    with engine.begin() as conn:
+        counts['users'] = insert_chunked(conn, User.__table__, users)
+        counts['classes'] = insert_chunked(conn, Class.__table__, classes)
+        counts['enrollments'] = insert_chunked(conn, Enrollment.__table__, enrollments)
+        counts['assignments'] = insert_chunked(conn, Assignment.__table__, assignments)
+        counts['submissions'] = insert_chunked(conn, Submission.__table__, submissions())
+        counts['grading_queue'] = conn.execute(
+            insert(GradingQueueItem).from_select(QUEUE_COLUMNS, pending_queue())
+        ).rowcount
+        counts['resources'] = insert_chunked(conn, Resource.__table__, resources)
+
+    # Explicit ids leave Postgres sequences behind; move them past the loaded rows
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            for table in (User.__table__, Class.__table__, Assignment.__table__, Submission.__table__):
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM \"{table.name}\"))"
+                )
+    return counts, ids
+
+
+def reset_schema(engine):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///bench_synthetic.sqlite3')
+    parser.add_argument('--schools', type=int, default=2)
+    parser.add_argument('--classes-per-school', type=int, default=10)
+    parser.add_argument('--students-per-class', type=int, default=25)
+    parser.add_argument('--assignments-per-class', type=int, default=20)
+    parser.add_argument('--classes-per-teacher', type=int, default=2)
+    parser.add_argument('--submission-rate', type=float, default=0.8)
+    parser.add_argument('--graded-rate', type=float, default=0.5)
+    parser.add_argument('--resources-per-teacher', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    reset_schema(engine)
+    started = time.perf_counter()
+    counts, _ = generate(
+        engine, schools=args.schools, classes_per_school=args.classes_per_school,
+        students_per_class=args.students_per_class, assignments_per_class=args.assignments_per_class,
+        classes_per_teacher=args.classes_per_teacher, submission_rate=args.submission_rate,
+        graded_rate=args.graded_rate, resources_per_teacher=args.resources_per_teacher, seed=args.seed
+    )
+    elapsed = time.perf_counter() - started
+    print(', '.join(f'{count} {name}' for name, count in counts.items()))
+    print(f'Loaded {sum(counts.values())} rows in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+import click
+from flask import Response, current_app, request, send_file
+from flask.cli import AppGroup
+from sqlalchemy import select
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from extensions import db
+from models import Resource, Submission
+
+CHUNK_SIZE = 64 * 1024
+PREVIEW_CHARS = 200
+MAX_UPLOAD_BYTES = int(os.environ.get('BLOB_MAX_UPLOAD_BYTES', 25 * 1024 * 1024))
+# S3 uploads are buffered (in memory up to this size, then in a temp file) until their hash is known
+S3_SPOOL_BYTES = int(os.environ.get('BLOB_S3_SPOOL_BYTES', 8 * 1024 * 1024))
+
+TEXT_TYPE = 'text/plain; charset=utf-8'
+# Upload types kept as declared; anything else (HTML, SVG, scripts...) is stored as opaque bytes
+ALLOWED_CONTENT_TYPES = frozenset((
+    'text/plain', 'text/markdown', 'text/csv', 'application/json', 'application/pdf',
+    'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'audio/mpeg', 'audio/wav', 'video/mp4',
+    'application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'application/zip',
+))
+OPAQUE_TYPE = 'application/octet-stream'
+
+StoredBlob = namedtuple('StoredBlob', 'digest size head')
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+def spool(chunks, fileobj):
+    """Copy `chunks` into `fileobj`, hashing as it goes; keeps the first bytes for a preview."""
+    sha = hashlib.sha256()
+    size = 0
+    head = b''
+    for chunk in chunks:
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise BlobTooLarge(f'Content exceeds {MAX_UPLOAD_BYTES} bytes')
+        sha.update(chunk)
+        if len(head) < PREVIEW_CHARS * 4:
+            head += chunk[:PREVIEW_CHARS * 4 - len(head)]
+        fileobj.write(chunk)
+    return StoredBlob(sha.hexdigest(), size, head)
+
+
+class LocalBlobStore:
+    """Blobs as files under `root`, fanned out by the first hex digits of their SHA-256."""
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put(self, chunks):
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                blob = spool(chunks, f)
+                f.flush()
+                os.fsync(f.fileno())
+            path = self.path(blob.digest)
+            try:
+                # Same bytes already stored: a duplicate costs nothing, but its age is reset
+                # because `flask blobs gc` spares young blobs whose rows may not be committed yet
+                os.utime(path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+        return blob
+
+    def open(self, digest):
+        return open(self.path(digest), 'rb')
+
+    def delete(self, digest):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path(digest))
+
+    def digests(self):
+        """(digest, last modified epoch) for every stored blob."""
+        for directory, subdirs, files in os.walk(self.root):
+            if directory == self.root:
+                subdirs[:] = [d for d in subdirs if d != 'tmp']
+                continue
+            for name in files:
+                yield name, os.path.getmtime(os.path.join(directory, name))
+
+    def send(self, digest, mimetype, size, download_name=None):
+        # send_file handles Range/If-None-Match and hands the file to the server's
+        # wsgi.file_wrapper, which gunicorn serves with sendfile()
+        response = send_file(self.path(digest), mimetype=mimetype, download_name=download_name,
+                             conditional=True, etag=digest, max_age=None)
+        # As stored, without a second charset appended for text types
+        response.content_type = mimetype
+        return response
+
+
+class S3BlobStore:
+    """Blobs in an S3-compatible bucket (AWS, MinIO, ...) through a boto3 client."""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, client=None):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError('BLOB_STORE_URL points at S3 but the boto3 package is not installed')
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+
+    def key(self, digest):
+        return f'{self.prefix}{digest[:2]}/{digest}'
+
+    def touch(self, digest):
+        """Reset the object's LastModified (the age `flask blobs gc` goes by); False if there is no such object."""
+        key = self.key(digest)
+        try:
+            # Copying an object onto itself needs a metadata change; REPLACE with none is one
+            self.client.copy_object(Bucket=self.bucket, Key=key, CopySource={'Bucket': self.bucket, 'Key': key},
+                                    MetadataDirective='REPLACE')
+        except self.client.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def put(self, chunks):
+        with tempfile.SpooledTemporaryFile(max_size=S3_SPOOL_BYTES) as f:
+            blob = spool(chunks, f)
+            if not self.touch(blob.digest):
+                f.seek(0)
+                # upload_fileobj switches to a multipart upload for large bodies
+                self.client.upload_fileobj(f, self.bucket, self.key(blob.digest))
+        return blob
+
+    def open(self, digest):
+        return self.client.get_object(Bucket=self.bucket, Key=self.key(digest))['Body']
+
+    def delete(self, digest):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(digest))
+
+    def digests(self):
+        kwargs = {'Bucket': self.bucket, 'Prefix': self.prefix}
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for item in page.get('Contents', []):
+                yield item['Key'].rsplit('/', 1)[-1], item['LastModified'].timestamp()
+            if not page.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+    def send(self, digest, mimetype, size, download_name=None):
+        """Stream the blob (or the requested byte range of it) through from the bucket."""
+        response = Response(content_type=mimetype)
+        response.set_etag(digest)
+        response.headers['Accept-Ranges'] = 'bytes'
+        if download_name:
+            response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+        if request.if_none_match.contains(digest):
+            response.status_code = 304
+            return response
+
+        byte_range = None
+        # An If-Range that doesn't match this blob asks for the whole body instead of the range
+        if_range = request.if_range
+        range_applies = if_range.etag == digest if if_range.etag or if_range.date else True
+        if request.range and range_applies:
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                raise RequestedRangeNotSatisfiable(length=size)
+        kwargs = {'Bucket': self.bucket, 'Key': self.key(digest)}
+        if byte_range:
+            kwargs['Range'] = f'bytes={byte_range[0]}-{byte_range[1] - 1}'
+        body = self.client.get_object(**kwargs)['Body']
+        response.response = body.iter_chunks(CHUNK_SIZE)
+        response.call_on_close(body.close)
+        if byte_range:
+            response.status_code = 206
+            response.content_range = f'bytes {byte_range[0]}-{byte_range[1] - 1}/{size}'
+            response.content_length = byte_range[1] - byte_range[0]
+        else:
+            response.content_length = size
+        return response
+
+
+def build_blob_store(app):
+    """The store named by BLOB_STORE_URL: ``file:///path`` or ``s3://bucket/prefix``.
+
+    Defaults to a ``blobs`` directory in the app's instance folder.
+    """
+    url = os.environ.get('BLOB_STORE_URL', '')
+    if url.startswith('s3://'):
+        parsed = urlparse(url)
+        return S3BlobStore(parsed.netloc, parsed.path, endpoint_url=os.environ.get('BLOB_S3_ENDPOINT_URL') or None)
+    if url.startswith('file://'):
+        return LocalBlobStore(url[len('file://'):])
+    if url:
+        raise RuntimeError(f'Unsupported BLOB_STORE_URL: {url}')
+    return LocalBlobStore(os.path.join(app.instance_path, 'blobs'))
+
+
+def init_blob_store(app):
+    app.extensions['blob_store'] = build_blob_store(app)
+
+
+def blob_store():
+    return current_app.extensions['blob_store']
+
+
+def is_text(content_type):
+    return bool(content_type) and (content_type.startswith('text/') or content_type.startswith('application/json'))
+
+
+def allowed_content_type(content_type):
+    """`content_type` if it is on the allow-list (parameters such as charset kept), else application/octet-stream."""
+    if content_type and content_type.split(';', 1)[0].strip().lower() in ALLOWED_CONTENT_TYPES:
+        return content_type
+    return OPAQUE_TYPE
+
+
+def request_chunks():
+    """The request body in CHUNK_SIZE pieces, without reading it all into memory."""
+    if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+        raise BlobTooLarge(f'Content exceeds {MAX_UPLOAD_BYTES} bytes')
+    while chunk := request.stream.read(CHUNK_SIZE):
+        yield chunk
+
+
+def save_content(owner, chunks, content_type):
+    """Store `chunks` and point the owner's (Submission or Resource) content columns at the blob."""
+    blob = blob_store().put(chunks)
+    content_type = allowed_content_type(content_type)
+    owner.content = None
+    owner.content_sha256 = blob.digest
+    owner.content_size = blob.size
+    owner.content_type = content_type
+    owner.content_preview = blob.head.decode('utf-8', 'ignore')[:PREVIEW_CHARS] if is_text(content_type) else None
+
+
+def save_text(owner, text):
+    if text is None:
+        owner.content = owner.content_sha256 = owner.content_size = owner.content_type = owner.content_preview = None
+    else:
+        save_content(owner, [text.encode('utf-8')], TEXT_TYPE)
+
+
+def preview(owner):
+    if owner.content_sha256 is None:
+        return owner.content[:PREVIEW_CHARS] if owner.content is not None else None
+    return owner.content_preview
+
+
+def read_text(owner):
+    """The owner's full content as text; works on rows from before the blob store too."""
+    if owner.content_sha256 is None:
+        return owner.content
+    with contextlib.closing(blob_store().open(owner.content_sha256)) as f:
+        return f.read().decode('utf-8', 'replace')
+
+
+def content_response(owner, download_name=None):
+    """The owner's content as uploaded. Only plain text is shown inline; everything else downloads."""
+    if owner.content_sha256 is None:
+        response = Response(owner.content or '', content_type=TEXT_TYPE)
+    else:
+        # Rows stored before the allow-list are checked again on the way out
+        content_type = allowed_content_type(owner.content_type)
+        response = blob_store().send(owner.content_sha256, content_type, owner.content_size, download_name)
+        if content_type.split(';', 1)[0].strip().lower() != 'text/plain':
+            response.headers['Content-Disposition'] = \
+                f'attachment; filename="{download_name}"' if download_name else 'attachment'
+    # Uploads are student/teacher-controlled bytes served from the API origin: never sniffed, never scripted
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = "default-src 'none'; sandbox"
+    return response
+
+
+blobs_cli = AppGroup('blobs', help='Manage the content blob store.')
+
+
+@blobs_cli.command('offload')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+def offload_command(batch_size):
+    """Move inline content from before the blob store into it."""
+    for model in (Submission, Resource):
+        moved = 0
+        while True:
+            rows = model.query.filter(model.content_sha256.is_(None), model.content.isnot(None)).order_by(
+                model.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                save_text(row, row.content)
+            db.session.commit()
+            moved += len(rows)
+        click.echo(f'{model.__tablename__}: {moved} offloaded')
+
+
+@blobs_cli.command('gc')
+@click.option('--min-age-hours', type=float, default=24, show_default=True,
+              help='Keep unreferenced blobs younger than this (their rows may not be committed yet).')
+@click.option('--dry-run', is_flag=True)
+def gc_command(min_age_hours, dry_run):
+    """Delete blobs no submission or resource refers to any more."""
+    referenced = set()
+    for model in (Submission, Resource):
+        referenced.update(db.session.execute(
+            select(model.content_sha256).where(model.content_sha256.isnot(None)).distinct()
+        ).scalars())
+    cutoff = time.time() - min_age_hours * 3600
+    store = blob_store()
+    removed = 0
+    for digest, modified in list(store.digests()):
+        if digest not in referenced and modified < cutoff:
+            if not dry_run:
+                store.delete(digest)
+            removed += 1
+    click.echo(f"{removed} unreferenced blobs {'found' if dry_run else 'deleted'}; {len(referenced)} referenced")
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+from flask import Response, request, stream_with_context
+from extensions import db
+
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 500))
+BULK_MAX_ERRORS = 1000
+EXPORT_YIELD_PER = 1000
+
+
+class BulkFormatError(ValueError):
+    pass
+
+
+def request_format():
+    fmt = request.args.get('format')
+    if not fmt:
+        content_type = request.mimetype or ''
+        fmt = 'csv' if content_type in ('text/csv', 'application/csv') else 'ndjson'
+    if fmt not in ('csv', 'ndjson'):
+        raise BulkFormatError("format must be 'csv' or 'ndjson'")
+    return fmt
+
+
+def iter_records(stream, fmt):
+    """Yield (row_number, dict) pairs from a CSV or NDJSON body without reading it all into memory."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        # Row 1 is the header, so data rows are numbered from 2 like a spreadsheet
+        for number, row in enumerate(csv.DictReader(text), start=2):
+            yield number, {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+        return
+    for number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None
+            continue
+        yield number, record if isinstance(record, dict) else None
+
+
+def chunked(iterable, size=None):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size or BULK_CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < BULK_MAX_ERRORS:
+            self.errors.append({'row': row, 'error': message})
+
+    def to_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.error_count,
+            'errors': sorted(self.errors, key=lambda e: e['row']),
+            'errors_truncated': self.error_count > len(self.errors)
+        }
+
+
+def export_response(query, fields, serialize, filename):
+    """Stream a query as CSV or NDJSON, fetching rows in batches via yield_per."""
+    fmt = request_format()
+
+    def stream_rows():
+        # The view's session is removed once it returns; read through the session of the streaming context
+        return query.with_session(db.session()).execution_options(yield_per=EXPORT_YIELD_PER)
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for count, row in enumerate(stream_rows(), start=1):
+            writer.writerow(serialize(row))
+            if count % EXPORT_YIELD_PER == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_ndjson():
+        lines = []
+        for row in stream_rows():
+            lines.append(json.dumps(serialize(row), default=str))
+            if len(lines) == EXPORT_YIELD_PER:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    if fmt == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}.{fmt}'}
+    )
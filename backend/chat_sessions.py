@@ -0,0 +1,118 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from extensions import db
+from models import ChatHistory, ChatSession
+
+# Prompt budget for verbatim turns. Turns are folded into the rolling summary
+# once the unsummarized tail grows past budget + slack, so summarization runs
+# every few exchanges rather than on every request.
+HISTORY_TOKEN_BUDGET = int(os.environ.get('AI_CHAT_HISTORY_TOKENS', 1500))
+SUMMARY_SLACK_TOKENS = int(os.environ.get('AI_CHAT_SUMMARY_SLACK_TOKENS', 600))
+# Requests without a session_id continue the caller's conversation (per role) until it has been idle this long
+SESSION_IDLE_MINUTES = int(os.environ.get('AI_CHAT_SESSION_IDLE_MINUTES', 60))
+MAX_WINDOW_TURNS = 60
+SUMMARY_MAX_CHARS = 2000
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 4
+
+
+def get_or_create_session(user_id, session_id, role, new=False):
+    """Return the caller's session `session_id`, or None if it isn't theirs.
+
+    Without a `session_id` the caller's recently active session for `role` is
+    continued, and a new one is started if there is none or `new` is set.
+    """
+    if session_id:
+        session = db.session.get(ChatSession, session_id)
+        if not session or session.user_id != user_id:
+            return None
+        return session
+    if not new:
+        session = ChatSession.query.filter(
+            ChatSession.user_id == user_id,
+            ChatSession.role == role,
+            ChatSession.updated_at >= datetime.utcnow() - timedelta(minutes=SESSION_IDLE_MINUTES)
+        ).order_by(ChatSession.updated_at.desc(), ChatSession.id.desc()).first()
+        if session:
+            return session
+    session = ChatSession(user_id=user_id, role=role, summarized_through_id=0)
+    db.session.add(session)
+    db.session.flush()
+    return session
+
+
+def format_turn(turn):
+    speaker = 'User' if turn.role == 'user' else 'Assistant'
+    return f"{speaker}: {turn.message}"
+
+
+def build_summary_prompt(summary, turns):
+    transcript = '\n'.join(format_turn(t) for t in turns)
+    return (
+        "Update the running summary of a conversation between a user and an AI tutor.\n"
+        "Keep names, facts, decisions and open questions; stay under 150 words.\n\n"
+        f"Current summary: {summary or '(none)'}\n\n"
+        f"New turns:\n{transcript}\n\n"
+        "Updated summary:"
+    )
+
+
+def build_session_prompt(session, system_prompt, message, summarize_fn):
+    """Build the prompt from the rolling summary, a token-budgeted window of recent turns and `message`.
+
+    `summarize_fn(prompt)` returns summary text; if it fails the oldest turns
+    are simply left out of this prompt and folding is retried next time.
+    """
+    # Newest first; only turns not yet folded into the summary
+    recent = ChatHistory.query.filter(
+        ChatHistory.session_id == session.id,
+        ChatHistory.id > (session.summarized_through_id or 0)
+    ).order_by(ChatHistory.id.desc()).limit(MAX_WINDOW_TURNS).all()
+    recent.reverse()
+
+    older = []
+    if len(recent) == MAX_WINDOW_TURNS:
+        # A full window may hide older unsummarized turns (after failed summaries); they are folded first
+        older = ChatHistory.query.filter(
+            ChatHistory.session_id == session.id,
+            ChatHistory.id > (session.summarized_through_id or 0),
+            ChatHistory.id < recent[0].id
+        ).order_by(ChatHistory.id).all()
+
+    total = sum(estimate_tokens(t.message) for t in recent)
+    if older or total > HISTORY_TOKEN_BUDGET + SUMMARY_SLACK_TOKENS:
+        fold = older
+        while recent and total > HISTORY_TOKEN_BUDGET:
+            turn = recent.pop(0)
+            total -= estimate_tokens(turn.message)
+            fold.append(turn)
+        try:
+            summary = summarize_fn(build_summary_prompt(session.summary, fold))
+            session.summary = summary.strip()[:SUMMARY_MAX_CHARS]
+            session.summarized_through_id = fold[-1].id
+        except Exception:
+            logger.exception('Chat summary failed for session %s', session.id)
+
+    parts = [system_prompt] if system_prompt else []
+    if session.summary:
+        parts.append(f"Summary of the earlier conversation: {session.summary}")
+    history = '\n'.join(format_turn(t) for t in recent)
+    parts.append(f"{history}\nUser: {message}" if history else f"User: {message}")
+    return '\n\n'.join(parts)
+
+
+def append_turns(session, user_message, ai_message):
+    """Write the user turn and the answer together in one commit."""
+    now = datetime.utcnow()
+    db.session.add_all([
+        ChatHistory(user_id=session.user_id, session_id=session.id, role='user', message=user_message, timestamp=now),
+        ChatHistory(user_id=session.user_id, session_id=session.id, role='ai', message=ai_message, timestamp=now)
+    ])
+    session.updated_at = now
+    db.session.commit()
@@ -0,0 +1,81 @@
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# A 4-digit PIN has 10,000 values, so no KDF makes an offline guess expensive;
+# the login throttle is what protects PINs. The hash keeps them out of plain
+# sight in the database and costs about a millisecond to check, so a whole
+# class can sign in at once.
+PIN_HASH_ITERATIONS = 1000
+PIN_SALT_BYTES = 16
+
+# Password hashes (scrypt) take ~100 ms of CPU and 32 MB each. They run in a
+# small process pool so a burst of logins can't starve the worker's request threads.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+# Below this many passwords the pool's IPC costs more than it saves
+POOL_MIN_BATCH = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def is_valid_pin(pin):
+    return isinstance(pin, str) and len(pin) == 4 and pin.isdigit()
+
+
+def hash_pin(pin):
+    salt = os.urandom(PIN_SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', pin.encode('utf-8'), salt, PIN_HASH_ITERATIONS)
+    return f'pbkdf2_sha256${PIN_HASH_ITERATIONS}${salt.hex()}${digest.hex()}'
+
+
+def verify_pin(pin_hash, pin):
+    if not pin_hash or not isinstance(pin, str):
+        return False
+    try:
+        method, iterations, salt, expected = pin_hash.split('$')
+    except ValueError:
+        return False
+    if method != 'pbkdf2_sha256':
+        return False
+    digest = hashlib.pbkdf2_hmac('sha256', pin.encode('utf-8'), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+def get_hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: children don't inherit the locks of a threaded worker mid-request
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                        mp_context=multiprocessing.get_context('forkserver'))
+        return _pool
+
+
+def verify_password(password_hash, password):
+    """check_password_hash, run in the hash pool when one is configured."""
+    if PASSWORD_HASH_WORKERS <= 0:
+        return check_password_hash(password_hash, password)
+    future = get_hash_pool().submit(check_password_hash, password_hash, password)
+    return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+
+
+def hash_password(password):
+    """generate_password_hash, run in the hash pool when one is configured."""
+    if PASSWORD_HASH_WORKERS <= 0:
+        return generate_password_hash(password)
+    return get_hash_pool().submit(generate_password_hash, password).result(timeout=PASSWORD_HASH_TIMEOUT)
+
+
+def hash_passwords(passwords):
+    """Hash a batch of passwords, spreading the work over the hash pool when it is worth it."""
+    if PASSWORD_HASH_WORKERS <= 1 or len(passwords) < POOL_MIN_BATCH:
+        return [generate_password_hash(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (PASSWORD_HASH_WORKERS * 4))
+    return list(get_hash_pool().map(generate_password_hash, passwords, chunksize=chunksize))
@@ -0,0 +1,92 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool
+
+
+def env_flag(name, default):
+    return os.environ.get(name, '1' if default else '0').lower() not in ('0', 'false', 'no', '')
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for `database_url`, from DB_* environment variables.
+
+    Read when the app is created (not at import) so one process can build apps
+    with different settings, as the write benchmark does.
+    """
+    options = {'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True)}
+    if database_url.startswith('sqlite'):
+        if ':memory:' in database_url or database_url in ('sqlite://', 'sqlite:///'):
+            # In-memory databases use a single shared connection; there is no pool to size
+            return {}
+        # Connections are local file handles: pre-ping only adds a round trip
+        options['pool_pre_ping'] = env_flag('DB_POOL_PRE_PING', False)
+        options['connect_args'] = {'timeout': int(os.environ.get('DB_SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000}
+    elif env_flag('DB_PGBOUNCER', False):
+        # PgBouncer (transaction pooling) owns the server connections. Holding a pool here
+        # would pin bouncer clients, and startup `options` are rejected, so
+        # statement_timeout is set per transaction in configure_engine instead.
+        return {'poolclass': NullPool}
+    else:
+        statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+        if statement_timeout:
+            options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+        options['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+    options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    options['pool_timeout'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    return options
+
+
+def configure_engine(engine):
+    """Per-connection settings that can't be expressed as engine options."""
+    if engine.dialect.name == 'sqlite':
+        configure_sqlite(engine)
+    elif engine.dialect.name == 'postgresql' and env_flag('DB_PGBOUNCER', False):
+        statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+        if statement_timeout:
+            @event.listens_for(engine, 'begin')
+            def set_statement_timeout(conn):
+                conn.exec_driver_sql(f'SET LOCAL statement_timeout = {statement_timeout}')
+
+
+def configure_sqlite(engine):
+    """WAL journal, busy timeout and transaction start mode for SQLite.
+
+    WAL lets readers run alongside the single writer instead of blocking on
+    the file lock. DB_SQLITE_BEGIN picks when a transaction starts:
+
+    - ``auto`` (default): the sqlite3 module's own behaviour. Reads run in
+      autocommit and BEGIN is issued just before the first write.
+    - ``deferred``: BEGIN at the first statement, so a request reads one
+      snapshot. A read-then-write request fails with "database is locked"
+      when another writer commits first, because SQLite can't wait on that
+      lock upgrade.
+    - ``immediate``: takes the write lock at the first statement. Writers
+      queue on the busy timeout instead of failing, at the cost of
+      serializing every transaction.
+    """
+    journal_mode = os.environ.get('DB_SQLITE_JOURNAL_MODE', 'WAL')
+    synchronous = os.environ.get('DB_SQLITE_SYNCHRONOUS', 'NORMAL')
+    busy_timeout = int(os.environ.get('DB_SQLITE_BUSY_TIMEOUT_MS', 5000))
+    begin = os.environ.get('DB_SQLITE_BEGIN', 'auto').upper()
+    if begin not in ('AUTO', 'DEFERRED', 'IMMEDIATE'):
+        raise RuntimeError(f"DB_SQLITE_BEGIN must be 'auto', 'deferred' or 'immediate', not {begin.lower()!r}")
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if journal_mode:
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+        if synchronous:
+            cursor.execute(f'PRAGMA synchronous={synchronous}')
+        cursor.execute(f'PRAGMA busy_timeout={busy_timeout}')
+        cursor.close()
+        if begin != 'AUTO':
+            # SQLAlchemy's begin event issues BEGIN instead of the sqlite3 module
+            dbapi_connection.isolation_level = None
+
+    if begin != 'AUTO':
+        @event.listens_for(engine, 'begin')
+        def begin_transaction(conn):
+            conn.exec_driver_sql(f'BEGIN {begin}')
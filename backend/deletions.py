@@ -0,0 +1,68 @@
+from sqlalchemy import delete, select
+from extensions import db
+from grading_queue import dequeue
+from models import (Assignment, ChatHistory, ChatSession, Class, GradingJob, Resource, SearchDocument,
+                    Submission, User)
+from tasks import task
+
+# Rows deleted per transaction, so removing a big class never holds the write lock for long
+DELETE_BATCH = 500
+
+SEARCH_KINDS = {Submission: 'submission', Assignment: 'assignment', Resource: 'resource'}
+
+
+def delete_in_batches(model, where):
+    """Delete `model` rows matching `where` a batch per commit, with their queue and search rows; returns the count.
+
+    Each batch is re-selected, so a task retried after a crash picks up where it stopped.
+    """
+    deleted = 0
+    while True:
+        ids = db.session.execute(select(model.id).where(where).limit(DELETE_BATCH)).scalars().all()
+        if not ids:
+            return deleted
+        if model is Submission:
+            dequeue(ids)
+        if model in SEARCH_KINDS:
+            # Bulk deletes skip the flush hooks that keep the search index current
+            db.session.execute(delete(SearchDocument).where(
+                SearchDocument.kind == SEARCH_KINDS[model], SearchDocument.ref_id.in_(ids)
+            ))
+        db.session.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+        db.session.commit()
+        deleted += len(ids)
+
+
+@task('delete_class')
+def delete_class(class_id):
+    """Delete a class with its assignments, their submissions and grading jobs, and its enrollments."""
+    assignment_ids = select(Assignment.id).where(Assignment.class_id == class_id).scalar_subquery()
+    counts = {
+        'submissions': delete_in_batches(Submission, Submission.assignment_id.in_(assignment_ids)),
+        'grading_jobs': delete_in_batches(GradingJob, GradingJob.assignment_id.in_(assignment_ids)),
+        'assignments': delete_in_batches(Assignment, Assignment.class_id == class_id),
+    }
+    cls = db.session.get(Class, class_id)
+    if cls is not None:
+        db.session.delete(cls)  # Enrollments go with it
+    db.session.commit()
+    return counts
+
+
+@task('delete_user')
+def delete_user(user_id):
+    """Delete a user with the classes they teach and everything they wrote."""
+    counts = {'classes': 0}
+    for class_id in db.session.execute(select(Class.id).where(Class.teacher_id == user_id)).scalars().all():
+        delete_class(class_id)
+        counts['classes'] += 1
+    counts['submissions'] = delete_in_batches(Submission, Submission.student_id == user_id)
+    counts['resources'] = delete_in_batches(Resource, Resource.teacher_id == user_id)
+    counts['grading_jobs'] = delete_in_batches(GradingJob, GradingJob.teacher_id == user_id)
+    delete_in_batches(ChatHistory, ChatHistory.user_id == user_id)
+    delete_in_batches(ChatSession, ChatSession.user_id == user_id)
+    user = db.session.get(User, user_id)
+    if user is not None:
+        db.session.delete(user)  # Enrollments go with it
+    db.session.commit()
+    return counts
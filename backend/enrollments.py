@@ -0,0 +1,32 @@
+from extensions import db
+from models import Class, Enrollment, User
+
+
+def enrolled_class_ids(student_id):
+    """Subquery of the class ids a student is enrolled in (served by uq_enrollment_student_class)."""
+    return db.session.query(Enrollment.class_id).filter(Enrollment.student_id == student_id)
+
+
+def enroll_by_class_name(user):
+    """Enroll a new student in the class(es) named by their class_name label."""
+    if user.role != 'student' or not user.class_name:
+        return
+    for (class_id,) in db.session.query(Class.id).filter(Class.name == user.class_name):
+        db.session.add(Enrollment(class_id=class_id, student=user))
+
+
+def enroll_named_students(cls):
+    """Enroll the students whose class_name label names a newly created class."""
+    students = db.session.query(User.id).filter(User.role == 'student', User.class_name == cls.name)
+    for (student_id,) in students:
+        db.session.add(Enrollment(course=cls, student_id=student_id))
+
+
+def filter_by_enrollment(query, class_id=None, class_name=None):
+    """Restrict a User query to students enrolled in a class, given by id or (legacy) by name."""
+    enrolled = db.session.query(Enrollment.student_id)
+    if class_id:
+        enrolled = enrolled.filter(Enrollment.class_id == class_id)
+    else:
+        enrolled = enrolled.join(Class, Enrollment.class_id == Class.id).filter(Class.name == class_name)
+    return query.filter(User.id.in_(enrolled))
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from sqlalchemy import update
+from extensions import db
+from grading_queue import dequeue
+from blob_store import read_text
+from ai_limits import AIUnavailable
+from models import GradingJob, Submission
+
+GRADING_CONCURRENCY = int(os.environ.get('AI_GRADING_CONCURRENCY', 4))
+GRADING_RATE_PER_SEC = float(os.environ.get('AI_GRADING_RATE_PER_SEC', 2))
+GRADING_MAX_ATTEMPTS = int(os.environ.get('AI_GRADING_MAX_ATTEMPTS', 3))
+GRADING_WRITE_BATCH = 10
+JOB_POLL_INTERVAL = 1.0
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads of a job."""
+
+    def __init__(self, rate_per_sec):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def serialize_job(job):
+    return {
+        'id': job.id,
+        'assignment_id': job.assignment_id,
+        'status': job.status,
+        'total': job.total,
+        'graded': job.graded,
+        'failed': job.failed,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+def pending_submissions(assignment_id):
+    return Submission.query.filter(
+        Submission.assignment_id == assignment_id,
+        Submission.status != 'graded'
+    )
+
+
+def create_grading_job(assignment, teacher_id):
+    """Add a queued job for the assignment's pending submissions; the caller queues its task and commits."""
+    job = GradingJob(
+        assignment_id=assignment.id,
+        teacher_id=teacher_id,
+        status='queued',
+        total=pending_submissions(assignment.id).count()
+    )
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def grade_with_retries(grade_fn, limiter, title, description, content):
+    for attempt in range(1, GRADING_MAX_ATTEMPTS + 1):
+        limiter.wait()
+        try:
+            # Retries skip the cache so a bad cached answer isn't returned again
+            result = grade_fn(title, description, content, use_cache=attempt == 1)
+            if not result.get('grade') or result.get('grade') == 'Pending':
+                raise ValueError('Model did not return a grade')
+            return result
+        except Exception as e:
+            if attempt == GRADING_MAX_ATTEMPTS:
+                raise
+            # Respect the breaker's Retry-After; otherwise back off exponentially
+            time.sleep(e.retry_after if isinstance(e, AIUnavailable) else min(2 ** attempt, 30))
+
+
+def run_grading_job(job_id, grade_fn):
+    """Grade the job's pending submissions, on a task worker (see tasks.py).
+
+    `grade_fn(title, description, content, use_cache)` returns a dict with
+    'grade' and 'feedback'; it is injected so the job runs against whatever
+    model client the AI blueprint is configured with (including the local stub).
+    A job retried after its worker died picks up the submissions still pending.
+    A grade is only written if the submission is still ungraded and unchanged
+    since it was read; one graded by hand or resubmitted meanwhile is left
+    alone and dropped from the job's total.
+    """
+    job = db.session.get(GradingJob, job_id)
+    if job is None:
+        return  # Deleted along with its class
+    job.status = 'running'
+    job.started_at = job.started_at or datetime.utcnow()
+    job.failed = 0
+    db.session.commit()
+
+    try:
+        assignment = job.assignment
+        rows = pending_submissions(job.assignment_id).with_entities(
+            Submission.id, Submission.content, Submission.content_sha256, Submission.submitted_at
+        ).all()
+        job.total = job.graded + len(rows)
+        db.session.commit()
+
+        limiter = RateLimiter(GRADING_RATE_PER_SEC)
+        updates = []
+
+        def flush():
+            # Conditional UPDATEs, committed with the progress counters in one transaction per batch
+            graded = []
+            for row, result in updates:
+                written = db.session.execute(
+                    update(Submission)
+                    .where(Submission.id == row.id, Submission.status != 'graded',
+                           Submission.submitted_at.is_not_distinct_from(row.submitted_at))
+                    .values(grade=str(result['grade'])[:10], feedback=result.get('feedback'), status='graded')
+                ).rowcount
+                if written:
+                    graded.append(row.id)
+                else:
+                    job.total -= 1
+            dequeue(graded)
+            job.graded += len(graded)
+            updates.clear()
+            db.session.commit()
+
+        with ThreadPoolExecutor(max_workers=GRADING_CONCURRENCY) as pool:
+            futures = {
+                pool.submit(grade_with_retries, grade_fn, limiter,
+                            assignment.title, assignment.description, read_text(row)): row
+                for row in rows
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    updates.append((futures[future], future.result()))
+                except Exception as e:
+                    job.failed += 1
+                    job.error = str(e)
+                if done % GRADING_WRITE_BATCH == 0:
+                    flush()
+        flush()
+
+        job.status = 'failed' if job.failed and not job.graded else 'completed'
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(GradingJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
@@ -0,0 +1,110 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, or_, select, update
+from extensions import db
+from models import Assignment, Class, GradingQueueItem, Submission, User
+
+QUEUE_COLUMNS = ('submission_id', 'teacher_id', 'assignment_id', 'student_id', 'student_name',
+                 'assignment_title', 'status', 'submitted_at')
+COMPARED_COLUMNS = QUEUE_COLUMNS[1:]
+
+
+def enqueue(submission, assignment, student_name):
+    """Add or refresh the queue row for an ungraded submission, in the caller's transaction.
+
+    `assignment` is the submission's Assignment; its class gives the teacher.
+    """
+    if submission.id is None:
+        db.session.flush()
+    db.session.merge(GradingQueueItem(
+        submission_id=submission.id,
+        teacher_id=assignment.course.teacher_id,
+        assignment_id=assignment.id,
+        student_id=submission.student_id,
+        student_name=student_name,
+        assignment_title=assignment.title,
+        status=submission.status,
+        submitted_at=submission.submitted_at
+    ))
+
+
+def dequeue(submission_ids):
+    """Drop graded submissions from the queue, in the caller's transaction."""
+    if submission_ids:
+        db.session.execute(delete(GradingQueueItem).where(GradingQueueItem.submission_id.in_(submission_ids)))
+
+
+def rename_student(student_id, name):
+    db.session.execute(update(GradingQueueItem).where(GradingQueueItem.student_id == student_id)
+                       .values(student_name=name))
+
+
+def pending_queue(teacher_id=None):
+    """The queue as it should be, derived from the source tables (the old three-table join)."""
+    query = select(
+        Submission.id.label('submission_id'), Class.teacher_id, Submission.assignment_id, Submission.student_id,
+        User.name.label('student_name'), Assignment.title.label('assignment_title'), Submission.status,
+        Submission.submitted_at
+    ).join(Assignment, Submission.assignment_id == Assignment.id).join(
+        Class, Assignment.class_id == Class.id
+    ).join(User, Submission.student_id == User.id).where(Submission.status != 'graded')
+    if teacher_id is not None:
+        query = query.where(Class.teacher_id == teacher_id)
+    return query
+
+
+def rebuild(teacher_id=None):
+    """Replace the queue (or one teacher's part of it) with rows derived from scratch; caller commits."""
+    stale = delete(GradingQueueItem)
+    if teacher_id is not None:
+        # Also take rows of this teacher's submissions that were filed under someone else
+        expected_ids = pending_queue(teacher_id).with_only_columns(Submission.id)
+        stale = stale.where(or_(GradingQueueItem.teacher_id == teacher_id,
+                                GradingQueueItem.submission_id.in_(expected_ids)))
+    db.session.execute(stale)
+    db.session.execute(insert(GradingQueueItem).from_select(QUEUE_COLUMNS, pending_queue(teacher_id)))
+
+
+def check(teacher_id=None):
+    """Compare the queue with the source tables: returns missing, stale and mismatched submission ids."""
+    expected = {row.submission_id: row for row in db.session.execute(pending_queue(teacher_id))}
+    actual_query = select(*(getattr(GradingQueueItem, c) for c in QUEUE_COLUMNS))
+    if teacher_id is not None:
+        # Rows filed under the wrong teacher show up as missing here and stale in a full check
+        actual_query = actual_query.where(GradingQueueItem.teacher_id == teacher_id)
+    actual = {row.submission_id: row for row in db.session.execute(actual_query)}
+    mismatched = [
+        submission_id for submission_id in expected.keys() & actual.keys()
+        if any(getattr(expected[submission_id], c) != getattr(actual[submission_id], c) for c in COMPARED_COLUMNS)
+    ]
+    return {
+        'missing': sorted(expected.keys() - actual.keys()),
+        'stale': sorted(actual.keys() - expected.keys()),
+        'mismatched': sorted(mismatched)
+    }
+
+
+grading_queue_cli = AppGroup('grading-queue', help='Inspect or rebuild the materialized grading queue.')
+
+
+@grading_queue_cli.command('check')
+@click.option('--teacher-id', type=int, help='Only check this teacher\'s queue.')
+@click.option('--fix', is_flag=True, help='Rebuild the queue if it has drifted.')
+def check_command(teacher_id, fix):
+    problems = check(teacher_id)
+    for kind, ids in problems.items():
+        click.echo(f'{kind}: {len(ids)}' + (f" (e.g. {', '.join(map(str, ids[:10]))})" if ids else ''))
+    if any(problems.values()):
+        if not fix:
+            raise SystemExit(1)
+        rebuild(teacher_id)
+        db.session.commit()
+        click.echo('Rebuilt.')
+
+
+@grading_queue_cli.command('rebuild')
+@click.option('--teacher-id', type=int, help='Only rebuild this teacher\'s queue.')
+def rebuild_command(teacher_id):
+    rebuild(teacher_id)
+    db.session.commit()
+    click.echo(f'{GradingQueueItem.query.count()} submissions queued.')
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import Response, current_app, make_response, request
+from flask_login import current_user
+from sqlalchemy import event, select
+from sqlalchemy.orm import Mapper, Session, object_session
+from extensions import db
+from models import TableVersion
+
+# Bodies of public cached endpoints kept per worker, keyed by ETag
+HTTP_CACHE_MAX_ENTRIES = int(os.environ.get('HTTP_CACHE_MAX_ENTRIES', 256))
+
+# Tables read by at least one cached endpoint; writes to other tables don't bump a version
+versioned_tables = set()
+
+_versions = TableVersion.__table__
+
+
+class ResponseBodyCache:
+    """Small LRU of serialized bodies, so an unchanged public list is served without re-querying."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def bump_versions(connection, tables):
+    connection.execute(
+        _versions.update()
+        .where(_versions.c.table_name.in_(sorted(tables)))
+        .values(version=_versions.c.version + 1)
+    )
+
+
+def current_versions(tables):
+    """'table:version,...' for `tables`, or None if any of them has no version row."""
+    rows = dict(db.session.execute(
+        select(_versions.c.table_name, _versions.c.version).where(_versions.c.table_name.in_(tables))
+    ).all())
+    if len(rows) < len(tables):
+        return None
+    return ','.join(f'{name}:{rows[name]}' for name in sorted(tables))
+
+
+def etag_cached(tables, max_age=0, public=False):
+    """Serve a GET view with a strong ETag derived from the versions of the tables it reads.
+
+    A matching If-None-Match gets a 304 after one version lookup. Public views
+    (same body for every caller) also keep their body per worker, so clients
+    that don't revalidate skip the query and serialization too; everything
+    they return must be in the body. Other views are keyed per user.
+    """
+    tables = tuple(tables)
+    versioned_tables.update(tables)
+    if public:
+        cache_control = f'public, max-age={max_age}' if max_age else 'public, no-cache'
+    else:
+        cache_control = f'private, max-age={max_age}' if max_age else 'private, no-cache'
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Versions are read before the data; a write commits both together, so the body is never older than its tag
+            versions = current_versions(tables)
+            if versions is None:
+                return view(*args, **kwargs)
+            scope = 'public' if public else f'user:{current_user.get_id()}'
+            query = urlencode(sorted(request.args.items(multi=True)))
+            key = f'{request.path}?{query}|{scope}|{versions}'
+            etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                body_cache = current_app.extensions['http_cache'] if public else None
+                body = body_cache.get(etag) if body_cache else None
+                if body is not None:
+                    response = Response(body, mimetype='application/json')
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if body_cache:
+                        body_cache.put(etag, response.get_data())
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            if not public:
+                response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+
+def init_http_cache(app):
+    app.extensions['http_cache'] = ResponseBodyCache(HTTP_CACHE_MAX_ENTRIES)
+
+
+# Unit-of-work writes (including cascades) are noted per row and bumped once per flush,
+# inside the flush's transaction so a rollback undoes the bump too
+@event.listens_for(Mapper, 'after_insert')
+@event.listens_for(Mapper, 'after_update')
+@event.listens_for(Mapper, 'after_delete')
+def _note_written_table(mapper, connection, target):
+    table = mapper.local_table.name
+    if table in versioned_tables:
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault('written_tables', set()).add(table)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_written_tables(session, flush_context):
+    tables = session.info.pop('written_tables', None)
+    if tables:
+        bump_versions(session.connection(), tables)
+
+
+# Bulk insert(Model)/update(Model)/delete(Model) statements bypass the unit of work
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_for_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = orm_execute_state.statement.table.name
+    if table in versioned_tables:
+        bump_versions(orm_execute_state.session.connection(), {table})
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from extensions import db
+from models import User
+
+IDENTITY_CACHE_TTL = float(os.environ.get('IDENTITY_CACHE_TTL', 30))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES', 10000))
+
+
+class UserSnapshot(UserMixin):
+    """Detached, read-only view of a User for current_user.
+
+    Carries only what routes read on every request; it is not attached to a
+    session, so code that changes a user must load the User row itself.
+    """
+
+    __slots__ = ('id', 'name', 'email', 'role', 'class_name')
+
+    def __init__(self, id, name, email, role, class_name):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.role = role
+        self.class_name = class_name
+
+
+class IdentityCache:
+    """Per-worker user_id -> UserSnapshot map with a short TTL."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def put(self, snapshot):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first; if still full, start over rather than track recency
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache(IDENTITY_CACHE_TTL, IDENTITY_CACHE_MAX_ENTRIES)
+
+
+def load_user_snapshot(user_id):
+    snapshot = identity_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+    row = db.session.query(User.id, User.name, User.email, User.role, User.class_name).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    snapshot = UserSnapshot(*row)
+    identity_cache.put(snapshot)
+    return snapshot
+
+
+# Any committed change to a User (profile edits, role changes, deletes) evicts it
+# from this worker's cache. Other workers pick the change up within the TTL.
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_user_ids', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _evict_changed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        identity_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
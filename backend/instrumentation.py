@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('PERF_N_PLUS_ONE_THRESHOLD', 10))
+REQUEST_LOG_ENABLED = os.environ.get('PERF_REQUEST_LOG', '1') != '0'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+request_logger = logging.getLogger('aarna.requests')
+
+
+class RequestStats:
+    __slots__ = ('started', 'status', 'deferred', 'sql_count', 'db_seconds', 'statements',
+                 'ai_calls', 'ai_seconds', 'prompt_tokens', 'completion_tokens')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.status = None
+        self.deferred = False
+        self.sql_count = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+        self.ai_calls = 0
+        self.ai_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def repeated_statements(self):
+        """Statement templates run more than the threshold in this request (likely N+1 loops)."""
+        return [(sql, n) for sql, n in self.statements.items() if n > N_PLUS_ONE_THRESHOLD]
+
+
+def current_stats():
+    return g.get('perf') if has_request_context() else None
+
+
+def record_ai_call(seconds, usage=None):
+    """Attribute one model call (and its token usage, if reported) to the current request."""
+    stats = current_stats()
+    if stats is None:
+        return
+    stats.ai_calls += 1
+    stats.ai_seconds += seconds
+    if usage is not None:
+        stats.prompt_tokens += getattr(usage, 'prompt_token_count', None) or 0
+        stats.completion_tokens += getattr(usage, 'candidates_token_count', None) or 0
+
+
+@contextmanager
+def timed_ai_call():
+    """Time a model call; set `call['usage']` to the response's usage metadata when it arrives."""
+    call = {'usage': None}
+    started = time.perf_counter()
+    try:
+        yield call
+    finally:
+        record_ai_call(time.perf_counter() - started, call['usage'])
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_stats() is not None:
+        context._perf_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    started = getattr(context, '_perf_started', None)
+    if stats is None or started is None:
+        return
+    stats.sql_count += 1
+    stats.db_seconds += time.perf_counter() - started
+    stats.statements[statement] += 1
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{format_labels(self.label_names, labels, ("le", bound))} {n}')
+            lines.append(f'{self.name}_bucket{format_labels(self.label_names, labels, ("le", "+Inf"))} {count}')
+            lines.append(f'{self.name}_sum{format_labels(self.label_names, labels)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = Counter()
+
+    def inc(self, labels, amount=1):
+        self._values[labels] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class RequestMetrics:
+    """Per-endpoint aggregates for this worker process; Prometheus sums across workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        endpoint = ('endpoint', 'method')
+        self.requests = CounterMetric('aarna_http_requests_total', 'Requests handled', ('endpoint', 'method', 'status'))
+        self.duration = Histogram('aarna_http_request_duration_seconds', 'Request wall time', endpoint, DURATION_BUCKETS)
+        self.sql_count = Histogram('aarna_http_request_sql_statements', 'SQL statements per request', endpoint, COUNT_BUCKETS)
+        self.db_time = Histogram('aarna_http_request_db_seconds', 'Time spent in SQL per request', endpoint, DURATION_BUCKETS)
+        self.ai_time = Histogram('aarna_http_request_ai_seconds', 'Time spent in model calls per request', endpoint, DURATION_BUCKETS)
+        self.ai_tokens = CounterMetric('aarna_ai_tokens_total', 'Model tokens used', ('endpoint', 'kind'))
+        self.n_plus_one = CounterMetric('aarna_n_plus_one_total', 'Requests that repeated one SQL statement past the threshold', endpoint)
+        self.in_flight = 0
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def record(self, endpoint, method, stats, duration):
+        labels = (endpoint, method)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests.inc((endpoint, method, str(stats.status)))
+            self.duration.observe(labels, duration)
+            self.sql_count.observe(labels, stats.sql_count)
+            self.db_time.observe(labels, stats.db_seconds)
+            if stats.ai_calls:
+                self.ai_time.observe(labels, stats.ai_seconds)
+                self.ai_tokens.inc((endpoint, 'prompt'), stats.prompt_tokens)
+                self.ai_tokens.inc((endpoint, 'completion'), stats.completion_tokens)
+            if stats.repeated_statements():
+                self.n_plus_one.inc(labels)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.sql_count, self.db_time,
+                           self.ai_time, self.ai_tokens, self.n_plus_one):
+                lines.extend(metric.render())
+            lines.extend([
+                '# HELP aarna_http_requests_in_flight Requests being handled by this worker',
+                '# TYPE aarna_http_requests_in_flight gauge',
+                f'aarna_http_requests_in_flight {self.in_flight}'
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+def server_timing(stats):
+    total_ms = (time.perf_counter() - stats.started) * 1000
+    parts = [
+        f'app;dur={total_ms:.1f}',
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.sql_count} queries"'
+    ]
+    if stats.ai_calls:
+        parts.append(f'ai;dur={stats.ai_seconds * 1000:.1f};desc="{stats.ai_calls} calls"')
+    return ', '.join(parts)
+
+
+def request_endpoint():
+    # The URL rule, not the path, so ids don't explode the label set
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def finish_request(stats, endpoint, method, path):
+    duration = time.perf_counter() - stats.started
+    request_metrics.record(endpoint, method, stats, duration)
+    if not REQUEST_LOG_ENABLED:
+        return
+    repeated = stats.repeated_statements()
+    entry = {
+        'time': datetime.utcnow().isoformat() + 'Z',
+        'method': method,
+        'path': path,
+        'endpoint': endpoint,
+        'status': stats.status,
+        'duration_ms': round(duration * 1000, 2),
+        'sql_count': stats.sql_count,
+        'db_ms': round(stats.db_seconds * 1000, 2),
+        'ai_calls': stats.ai_calls,
+        'ai_ms': round(stats.ai_seconds * 1000, 2),
+        'prompt_tokens': stats.prompt_tokens,
+        'completion_tokens': stats.completion_tokens
+    }
+    if repeated:
+        entry['n_plus_one'] = [{'statement': sql[:300], 'count': n} for sql, n in repeated]
+    request_logger.log(logging.WARNING if repeated else logging.INFO, json.dumps(entry))
+
+
+def init_instrumentation(app):
+    """Time every request and expose the aggregates on /metrics."""
+    if REQUEST_LOG_ENABLED and not request_logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        request_logger.addHandler(handler)
+        request_logger.setLevel(logging.INFO)
+        request_logger.propagate = False
+
+    @app.before_request
+    def start_request_timer():
+        g.perf = RequestStats()
+        request_metrics.request_started()
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = current_stats()
+        if stats is not None:
+            stats.status = response.status_code
+            response.headers['Server-Timing'] = server_timing(stats)
+            if response.is_streamed:
+                # Streams (SSE, exports) are recorded when the last chunk has been sent
+                stats.deferred = True
+                response.call_on_close(partial(finish_request, stats, request_endpoint(), request.method, request.path))
+        return response
+
+    @app.teardown_request
+    def record_request(error=None):
+        stats = current_stats()
+        if stats is None or stats.deferred:
+            return
+        if stats.status is None:
+            stats.status = 500
+        finish_request(stats, request_endpoint(), request.method, request.path)
+
+    @app.route('/metrics')
+    def metrics():
+        if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
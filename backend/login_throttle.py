@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+import time
+
+LOGIN_THROTTLE_WINDOW = float(os.environ.get('LOGIN_THROTTLE_WINDOW', 300))
+LOGIN_MAX_USER_FAILURES = int(os.environ.get('LOGIN_MAX_USER_FAILURES', 5))
+# A whole classroom usually shares one public IP, so this is deliberately loose
+LOGIN_MAX_IP_FAILURES = int(os.environ.get('LOGIN_MAX_IP_FAILURES', 50))
+
+
+class MemoryCounterStore:
+    """Fixed-window counters local to this worker process."""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (count, seconds until the window resets)."""
+        now = time.monotonic()
+        entry = self._counters.get(key)
+        if entry is None or entry[1] <= now:
+            return 0, 0.0
+        return entry[0], entry[1] - now
+
+    def incr(self, key, window):
+        now = time.monotonic()
+        with self._lock:
+            count, expires = self._counters.get(key, (0, 0.0))
+            if expires <= now:
+                count, expires = 0, now + window
+                if len(self._counters) > 10000:
+                    self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+            self._counters[key] = (count + 1, expires)
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class SQLiteCounterStore:
+    """Counters in a local SQLite file so every gunicorn worker on the host shares them."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS login_attempts '
+            '(key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        row = self._connect().execute(
+            'SELECT count, expires_at FROM login_attempts WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        return (row[0], row[1] - now) if row else (0, 0.0)
+
+    def incr(self, key, window):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT INTO login_attempts (key, count, expires_at) VALUES (?, 1, ?) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            'count = CASE WHEN expires_at > ? THEN count + 1 ELSE 1 END, '
+            'expires_at = CASE WHEN expires_at > ? THEN expires_at ELSE excluded.expires_at END',
+            (key, now + window, now, now)
+        )
+
+    def reset(self, key):
+        self._connect().execute('DELETE FROM login_attempts WHERE key = ?', (key,))
+
+
+class RedisCounterStore:
+    """Counters on any Redis-compatible server; windows expire server-side."""
+
+    prefix = 'aarna:login:'
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('LOGIN_THROTTLE_URL points at Redis but the redis package is not installed')
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        pipe = self._client.pipeline()
+        pipe.get(self.prefix + key)
+        pipe.pttl(self.prefix + key)
+        count, ttl_ms = pipe.execute()
+        if count is None:
+            return 0, 0.0
+        return int(count), max(ttl_ms, 0) / 1000
+
+    def incr(self, key, window):
+        pipe = self._client.pipeline()
+        pipe.incr(self.prefix + key)
+        pipe.expire(self.prefix + key, int(window), nx=True)
+        pipe.execute()
+
+    def reset(self, key):
+        self._client.delete(self.prefix + key)
+
+
+class LoginThrottle:
+    """Counts failed logins per account and per client IP; too many in a window blocks further tries."""
+
+    def __init__(self, store, window, max_user_failures, max_ip_failures):
+        self.store = store
+        self.window = window
+        self.max_user_failures = max_user_failures
+        self.max_ip_failures = max_ip_failures
+
+    def retry_after(self, account, ip):
+        """Seconds until `account` from `ip` may try again, or 0 if it may try now."""
+        count, reset_in = self.store.get(f'account:{account}')
+        if count >= self.max_user_failures:
+            return reset_in
+        count, reset_in = self.store.get(f'ip:{ip}')
+        if count >= self.max_ip_failures:
+            return reset_in
+        return 0
+
+    def record_failure(self, account, ip):
+        self.store.incr(f'account:{account}', self.window)
+        self.store.incr(f'ip:{ip}', self.window)
+
+    def record_success(self, account):
+        self.store.reset(f'account:{account}')
+
+
+def build_login_throttle():
+    """Build the throttle from LOGIN_* environment variables.
+
+    LOGIN_THROTTLE_URL selects where counters live: ``sqlite:///path/to/file``
+    or ``redis://host:port/db``. Without it each worker counts on its own.
+    """
+    url = os.environ.get('LOGIN_THROTTLE_URL', '')
+    if url.startswith('sqlite:///'):
+        store = SQLiteCounterStore(url[len('sqlite:///'):])
+    elif url.startswith(('redis://', 'rediss://', 'unix://')):
+        store = RedisCounterStore(url)
+    elif url:
+        raise RuntimeError(f"Unsupported LOGIN_THROTTLE_URL: {url}")
+    else:
+        store = MemoryCounterStore()
+    return LoginThrottle(store, LOGIN_THROTTLE_WINDOW, LOGIN_MAX_USER_FAILURES, LOGIN_MAX_IP_FAILURES)
+
+
+login_throttle = build_login_throttle()
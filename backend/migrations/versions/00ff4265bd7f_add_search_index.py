@@ -0,0 +1,99 @@
+"""Add search index
+
+Backfills from the database; bodies already offloaded to the blob store are indexed by
+their preview until `flask search rebuild` runs.
+
+Revision ID: 00ff4265bd7f
+Revises: 0b2e57de9b5d
+Create Date: 2026-10-18 10:11:45.576658
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '00ff4265bd7f'
+down_revision = '0b2e57de9b5d'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE search_document_fts USING fts5("
+    "title, body, content='search_document', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER search_document_ai AFTER INSERT ON search_document BEGIN "
+    "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER search_document_ad AFTER DELETE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER search_document_au AFTER UPDATE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+)
+
+POSTGRES_DDL = (
+    "ALTER TABLE search_document ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED",
+    'CREATE INDEX ix_search_document_vector ON search_document USING GIN (search_vector)',
+)
+
+BACKFILL = (
+    "INSERT INTO search_document (kind, ref_id, title, body, teacher_id, student_id, class_id, updated_at) "
+    "SELECT 'resource', id, title, COALESCE(content, content_preview), teacher_id, NULL, NULL, CURRENT_TIMESTAMP "
+    "FROM resource",
+    "INSERT INTO search_document (kind, ref_id, title, body, teacher_id, student_id, class_id, updated_at) "
+    "SELECT 'assignment', assignment.id, assignment.title, assignment.description, class.teacher_id, NULL, "
+    "assignment.class_id, CURRENT_TIMESTAMP FROM assignment JOIN class ON assignment.class_id = class.id",
+    "INSERT INTO search_document (kind, ref_id, title, body, teacher_id, student_id, class_id, updated_at) "
+    "SELECT 'submission', submission.id, assignment.title, COALESCE(submission.content, submission.content_preview), "
+    "class.teacher_id, submission.student_id, assignment.class_id, CURRENT_TIMESTAMP "
+    "FROM submission JOIN assignment ON submission.assignment_id = assignment.id "
+    "JOIN class ON assignment.class_id = class.id",
+)
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('search_document',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('teacher_id', sa.Integer(), nullable=True),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('class_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('search_document', schema=None) as batch_op:
+        batch_op.create_index('ix_search_document_class_id', ['class_id'], unique=False)
+        batch_op.create_index('ix_search_document_student_id', ['student_id'], unique=False)
+        batch_op.create_index('ix_search_document_teacher_id', ['teacher_id'], unique=False)
+        batch_op.create_index('uq_search_document_kind_ref', ['kind', 'ref_id'], unique=True)
+
+    # ### end Alembic commands ###
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(dialect, ()):
+        op.execute(statement)
+    for statement in BACKFILL:
+        op.execute(statement)
+    op.execute("INSERT INTO table_version (table_name, version) VALUES ('search_document', 1)")
+
+
+def downgrade():
+    op.execute("DELETE FROM table_version WHERE table_name = 'search_document'")
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS search_document_fts')
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('search_document', schema=None) as batch_op:
+        batch_op.drop_index('uq_search_document_kind_ref')
+        batch_op.drop_index('ix_search_document_teacher_id')
+        batch_op.drop_index('ix_search_document_student_id')
+        batch_op.drop_index('ix_search_document_class_id')
+
+    op.drop_table('search_document')
+    # ### end Alembic commands ###
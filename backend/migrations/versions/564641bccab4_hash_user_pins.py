@@ -0,0 +1,52 @@
+"""Hash user PINs
+
+Revision ID: 564641bccab4
+Revises: 51dd84d5d615
+Create Date: 2026-10-18 09:34:14.057612
+
+"""
+import hashlib
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '564641bccab4'
+down_revision = '51dd84d5d615'
+branch_labels = None
+depends_on = None
+
+# Same format as credentials.hash_pin, inlined so this revision doesn't depend on app code
+PIN_HASH_ITERATIONS = 1000
+
+
+def hash_pin(pin):
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', pin.encode('utf-8'), salt, PIN_HASH_ITERATIONS)
+    return f'pbkdf2_sha256${PIN_HASH_ITERATIONS}${salt.hex()}${digest.hex()}'
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pin_hash', sa.String(length=128), nullable=True))
+
+    # Hash existing plaintext PINs before the column goes away
+    conn = op.get_bind()
+    user = sa.table('user', sa.column('id'), sa.column('pin'), sa.column('pin_hash'))
+    rows = conn.execute(sa.select(user.c.id, user.c.pin).where(user.c.pin.isnot(None))).fetchall()
+    if rows:
+        conn.execute(
+            user.update().where(user.c.id == sa.bindparam('user_id')).values(pin_hash=sa.bindparam('hashed')),
+            [{'user_id': row.id, 'hashed': hash_pin(row.pin)} for row in rows]
+        )
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('pin')
+
+
+def downgrade():
+    # Hashed PINs can't be recovered; users need a PIN reset after downgrading
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pin', sa.VARCHAR(length=4), nullable=True))
+        batch_op.drop_column('pin_hash')
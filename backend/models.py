@@ -1,4 +1,5 @@
 from extensions import db
+from sqlalchemy import DDL, event
 from flask_login import UserMixin
 from datetime import datetime
 
@@ -8,24 +9,44 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(150), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(20), nullable=False) # 'teacher', 'student', 'admin'
-    pin = db.Column(db.String(4)) # 4-digit PIN
-    class_name = db.Column(db.String(50)) # For students, e.g., "5A"
+    pin_hash = db.Column(db.String(128)) # Salted hash of the 4-digit PIN (see credentials.hash_pin)
+    class_name = db.Column(db.String(50), index=True) # Display label for students, e.g., "5A"; membership lives in Enrollment
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Login picker and admin filters look up users by role, then class
+        db.Index('ix_user_role_class_name', 'role', 'class_name'),
+    )
     
     # Relationships
     classes_teaching = db.relationship('Class', backref='teacher', lazy=True)
     submissions = db.relationship('Submission', backref='student', lazy=True)
     resources = db.relationship('Resource', backref='author', lazy=True)
     chat_history = db.relationship('ChatHistory', backref='user', lazy=True)
+    chat_sessions = db.relationship('ChatSession', backref='user', lazy=True)
+    enrollments = db.relationship('Enrollment', backref='student', lazy=True, cascade='all, delete-orphan')
 
 class Class(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     assignments = db.relationship('Assignment', backref='course', lazy=True)
+    enrollments = db.relationship('Enrollment', backref='course', lazy=True, cascade='all, delete-orphan')
+
+class Enrollment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # A student's classes, and (reversed) a class's roster, are each one index range
+        db.Index('uq_enrollment_student_class', 'student_id', 'class_id', unique=True),
+        db.Index('ix_enrollment_class_id_student_id', 'class_id', 'student_id'),
+    )
 
 class Assignment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,36 +54,198 @@ class Assignment(db.Model):
     subject = db.Column(db.String(100))
     description = db.Column(db.Text)
     due_date = db.Column(db.DateTime)
-    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False, index=True)
     status = db.Column(db.String(20), default='pending') # 'pending', 'completed'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     submissions = db.relationship('Submission', backref='assignment', lazy=True)
+    grading_jobs = db.relationship('GradingJob', backref='assignment', lazy=True)
 
 class Submission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    content = db.Column(db.Text) # Text or URL to file
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    content = db.Column(db.Text) # Inline text from before the blob store; new content is offloaded
+    content_sha256 = db.Column(db.String(64)) # Blob store key (see blob_store.py)
+    content_size = db.Column(db.Integer)
+    content_type = db.Column(db.String(100))
+    content_preview = db.Column(db.String(200))
     grade = db.Column(db.String(10))
     feedback = db.Column(db.Text)
-    status = db.Column(db.String(20), default='submitted') # 'submitted', 'graded'
+    status = db.Column(db.String(20), default='submitted', index=True) # 'submitted', 'graded'
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # One submission per student per assignment; also serves assignment_id lookups
+        db.Index('uq_submission_assignment_student', 'assignment_id', 'student_id', unique=True),
+    )
+
+class GradingQueueItem(db.Model):
+    # Denormalized "to grade" row per ungraded submission, shaped for the teacher's queue.
+    # Kept in step with Submission by grading_queue.py in the writer's transaction.
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id', ondelete='CASCADE'), primary_key=True)
+    teacher_id = db.Column(db.Integer, nullable=False)
+    assignment_id = db.Column(db.Integer, nullable=False)
+    student_id = db.Column(db.Integer, nullable=False)
+    student_name = db.Column(db.String(150), nullable=False)
+    assignment_title = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    submitted_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # The pending list is one range scan per teacher (optionally per assignment) in display order
+        db.Index('ix_grading_queue_teacher_submitted', 'teacher_id', 'submitted_at', 'submission_id'),
+        db.Index('ix_grading_queue_teacher_assignment', 'teacher_id', 'assignment_id', 'submitted_at', 'submission_id'),
+        db.Index('ix_grading_queue_student_id', 'student_id'),
+    )
+
 class Resource(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    type = db.Column(db.String(50)) # 'worksheet', 'visual', 'quiz'
-    content = db.Column(db.Text) # Markdown content or JSON
-    subject = db.Column(db.String(100))
+    type = db.Column(db.String(50), index=True) # 'worksheet', 'visual', 'quiz'
+    content = db.Column(db.Text) # Inline Markdown/JSON from before the blob store; new content is offloaded
+    content_sha256 = db.Column(db.String(64)) # Blob store key (see blob_store.py)
+    content_size = db.Column(db.Integer)
+    content_type = db.Column(db.String(100))
+    content_preview = db.Column(db.String(200))
+    subject = db.Column(db.String(100), index=True)
     grade = db.Column(db.String(50))
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Teachers list their own resources newest first
+        db.Index('ix_resource_teacher_id_created_at', 'teacher_id', 'created_at'),
+    )
+
+class ChatSession(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    role = db.Column(db.String(20)) # Prompt context: 'teacher', 'student' or 'user'
+    summary = db.Column(db.Text) # Rolling summary of turns that fell out of the prompt window
+    summarized_through_id = db.Column(db.Integer, default=0) # Last ChatHistory.id folded into summary
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relationships
+    messages = db.relationship('ChatHistory', backref='session', lazy=True)
+
 class ChatHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'))
     role = db.Column(db.String(20)) # 'user', 'ai'
     message = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_chat_history_user_id_timestamp', 'user_id', 'timestamp'),
+        # Prompt windows read a session's newest turns by id
+        db.Index('ix_chat_history_session_id_id', 'session_id', 'id'),
+    )
+
+class GradingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False, index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), default='queued') # 'queued', 'running', 'completed', 'failed'
+    total = db.Column(db.Integer, default=0)
+    graded = db.Column(db.Integer, default=0)
+    failed = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text) # Last error seen, if any
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class Task(db.Model):
+    # Slow work handed off by a request and run by a worker (see tasks.py)
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False) # Registered handler, e.g. 'delete_class'
+    payload = db.Column(db.Text) # JSON keyword arguments for the handler
+    key = db.Column(db.String(100)) # At most one queued or running task per key
+    status = db.Column(db.String(20), nullable=False, default='queued') # 'queued', 'running', 'succeeded', 'failed'
+    priority = db.Column(db.Integer, nullable=False, default=0) # Higher runs first
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow) # Not claimed before this (retry backoff)
+    locked_by = db.Column(db.String(100)) # Worker running it
+    locked_at = db.Column(db.DateTime) # Renewed while it runs; a stale lease means the worker died
+    error = db.Column(db.Text) # Last failure
+    result = db.Column(db.Text) # JSON returned by the handler
+    created_by = db.Column(db.Integer) # User whose request queued it, who may read its status
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Workers claim from the queued rows that are due; finished rows pile up behind them
+        db.Index('ix_task_status_run_at', 'status', 'run_at'),
+        db.Index('ix_task_key', 'key'),
+    )
+
+
+class TableVersion(db.Model):
+    # One row per table, bumped in the same transaction as any ORM write to a table
+    # an HTTP-cached endpoint reads (see http_cache.py). Migrations that add tables add their rows.
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def seed_table_versions(target, connection, **kw):
+    # create_all() (dev server, benchmarks) starts every table at version 1
+    connection.execute(target.insert(), [{'table_name': name, 'version': 1} for name in db.metadata.tables])
+
+
+class SearchDocument(db.Model):
+    # Text of every searchable resource, assignment and submission, kept in step with
+    # them by search_index.py. The text index itself is dialect-specific (DDL below).
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False) # 'resource', 'assignment', 'submission'
+    ref_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(200))
+    body = db.Column(db.Text)
+    teacher_id = db.Column(db.Integer) # Author of a resource; teacher of the class otherwise
+    student_id = db.Column(db.Integer) # Submissions only
+    class_id = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('uq_search_document_kind_ref', 'kind', 'ref_id', unique=True),
+        db.Index('ix_search_document_teacher_id', 'teacher_id'),
+        db.Index('ix_search_document_student_id', 'student_id'),
+        db.Index('ix_search_document_class_id', 'class_id'),
+    )
+
+
+# Postgres: a weighted tsvector (title above body) maintained by the database, with a GIN index
+event.listen(SearchDocument.__table__, 'after_create', DDL(
+    "ALTER TABLE search_document ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED"
+).execute_if(dialect='postgresql'))
+event.listen(SearchDocument.__table__, 'after_create', DDL(
+    'CREATE INDEX ix_search_document_vector ON search_document USING GIN (search_vector)'
+).execute_if(dialect='postgresql'))
+
+# SQLite: an FTS5 index over the table's title and body, kept current by triggers
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE search_document_fts USING fts5("
+    "title, body, content='search_document', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER search_document_ai AFTER INSERT ON search_document BEGIN "
+    "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER search_document_ad AFTER DELETE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER search_document_au AFTER UPDATE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+)
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(SearchDocument.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+# The triggers go with the table; the FTS table has to be dropped explicitly
+event.listen(SearchDocument.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS search_document_fts').execute_if(dialect='sqlite'))
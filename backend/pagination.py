@@ -0,0 +1,102 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from flask import request, jsonify
+from sqlalchemy import and_, or_
+from extensions import db
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+Page = namedtuple('Page', ['rows', 'next_cursor', 'limit'])
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed limit, cursor or sort argument (rendered as a 400)."""
+
+
+def _encode_cursor(sort_key, value, row_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_key, value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, sort_key, column):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_key, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(column.type, db.DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+        row_id = int(row_id)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if cursor_key != sort_key:
+        raise PaginationError('Cursor does not match sort order')
+    return value, row_id
+
+
+def _parse_limit():
+    raw = request.args.get('limit')
+    if raw is None:
+        # Callers that don't paginate at all (the current frontend) get every row, as before
+        return DEFAULT_LIMIT if 'cursor' in request.args else None
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def paginate(query, sort_columns, default_sort, id_column, entity=None):
+    """Apply keyset pagination to `query` using the request's limit/cursor/sort args.
+
+    `sort_columns` maps the public sort names to columns; `sort=-name` sorts
+    descending. Rows are ordered by (sort column, id) so the cursor is stable
+    even when sort values repeat. `entity` picks the model instance out of a
+    row when the query returns tuples. Requests with neither `limit` nor
+    `cursor` get all rows in one page.
+    """
+    limit = _parse_limit()
+    sort = request.args.get('sort', default_sort)
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in sort_columns:
+        raise PaginationError(f"Unsupported sort '{sort_key}'. Use one of: {', '.join(sorted(sort_columns))}")
+    column = sort_columns[sort_key]
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        value, row_id = _decode_cursor(cursor, sort_key, column)
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, id_column < row_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, id_column > row_id)))
+
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    if limit is None:
+        return Page(query.all(), None, None)
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = entity(rows[-1]) if entity else rows[-1]
+        next_cursor = _encode_cursor(sort_key, getattr(last, column.key), getattr(last, id_column.key))
+    return Page(rows, next_cursor, limit)
+
+
+def paginated_response(items, page):
+    """Serialize a page of already-shaped items.
+
+    Clients that ask for pagination (by passing `limit` or `cursor`) get an
+    envelope with `next_cursor`; older clients keep getting the whole list as
+    a bare JSON array.
+    """
+    if page.limit is not None:
+        return jsonify({'items': items, 'next_cursor': page.next_cursor, 'limit': page.limit})
+    return jsonify(items)
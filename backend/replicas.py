@@ -0,0 +1,187 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from flask import current_app, g, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+# After a client commits a write, its reads stay on the primary this long (read-your-writes)
+REPLICA_STICKY_SECONDS = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', 10))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+# How long a replica that failed stays out of rotation before it is probed again
+REPLICA_RETRY_INTERVAL = float(os.environ.get('DB_REPLICA_RETRY_INTERVAL', 15))
+
+READ_METHODS = ('GET', 'HEAD')
+
+logger = logging.getLogger(__name__)
+
+# Zero when the replica has replayed everything it received (an idle primary sends nothing)
+POSTGRES_LAG_SQL = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 '
+    'WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+class Replica:
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.lag = None
+        self.error = None
+        self.next_check = 0.0
+        self.check_lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """Round-robins reads over the replicas that are reachable and not lagging too far behind.
+
+    Each replica is re-checked at most every REPLICA_CHECK_INTERVAL seconds, by
+    whichever request thread finds the check due; the others keep using the
+    last result meanwhile.
+    """
+
+    def __init__(self, replicas, max_lag, check_interval, retry_interval):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self._turn = itertools.count()
+
+    def pick(self):
+        now = time.monotonic()
+        for replica in self.replicas:
+            if now >= replica.next_check and replica.check_lock.acquire(blocking=False):
+                try:
+                    self.check(replica)
+                finally:
+                    replica.check_lock.release()
+        usable = [r for r in self.replicas if r.healthy]
+        if not usable:
+            return None
+        return usable[next(self._turn) % len(usable)].engine
+
+    def check(self, replica):
+        try:
+            with replica.engine.connect() as conn:
+                if conn.dialect.name == 'postgresql':
+                    lag = conn.exec_driver_sql(POSTGRES_LAG_SQL).scalar()
+                    replica.lag = float(lag) if lag is not None else None
+                else:
+                    # No portable lag query; reachability is all we can check
+                    conn.exec_driver_sql('SELECT 1')
+                    replica.lag = None
+        except Exception as e:
+            self.mark_down(replica.engine, e)
+            return
+        lagging = replica.lag is not None and replica.lag > self.max_lag
+        if replica.healthy and lagging:
+            logger.warning('Replica %s is %.1fs behind; reading from the primary', replica.name, replica.lag)
+        replica.healthy = not lagging
+        replica.error = f'lag {replica.lag:.1f}s exceeds {self.max_lag:g}s' if lagging else None
+        replica.next_check = time.monotonic() + self.check_interval
+
+    def mark_down(self, engine, error):
+        for replica in self.replicas:
+            if replica.engine is engine:
+                if replica.healthy:
+                    logger.warning('Replica %s unavailable, reading from the primary: %s', replica.name, error)
+                replica.healthy = False
+                replica.error = f'{type(error).__name__}: {error}'[:200]
+                replica.next_check = time.monotonic() + self.retry_interval
+
+    def status(self):
+        return [{'name': r.name, 'healthy': r.healthy, 'lag_seconds': r.lag, 'error': r.error} for r in self.replicas]
+
+
+def replica_binds(engine_options):
+    """SQLALCHEMY_BINDS entries for the comma-separated DATABASE_REPLICA_URLS, configured like the primary."""
+    urls = [u.strip() for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+    urls = [u.replace('postgres://', 'postgresql://', 1) if u.startswith('postgres://') else u for u in urls]
+    return {f'replica{n}': {'url': url, **engine_options(url)} for n, url in enumerate(urls)}
+
+
+def init_replicas(app, db):
+    engines = db.engines
+    replicas = [Replica(key, engine) for key, engine in sorted(engines.items(), key=lambda item: str(item[0]))
+                if isinstance(key, str) and key.startswith('replica')]
+    if replicas:
+        app.extensions['replicas'] = ReplicaRouter(
+            replicas, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_INTERVAL, REPLICA_RETRY_INTERVAL
+        )
+
+
+def use_primary():
+    """Send the rest of this request's reads to the primary (e.g. a GET that must see the latest state)."""
+    g.use_primary = True
+
+
+def reads_may_use_replica():
+    if not has_request_context() or request.method not in READ_METHODS or g.get('use_primary'):
+        return False
+    return flask_session.get('primary_until', 0) <= time.time()
+
+
+class RoutingSession(Session):
+    """db.session that sends reads in GET/HEAD requests to a read replica.
+
+    Flushes, bulk DML and anything after them in the same session go to the
+    primary, as do all requests other than GET/HEAD and all work outside a
+    request (jobs, CLI). A replica is chosen once per session, so one request
+    reads a single consistent replica. If it fails mid-request, the session
+    rolls back (only reads ran there) and retries on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and current_app.extensions.get('replicas') is not None:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            elif not self.info.get('wrote') and reads_may_use_replica():
+                if 'replica' not in self.info:
+                    self.info['replica'] = current_app.extensions['replicas'].pick()
+                if self.info['replica'] is not None:
+                    return self.info['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._with_primary_fallback(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._with_primary_fallback(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._with_primary_fallback(super().scalars, *args, **kwargs)
+
+    def _with_primary_fallback(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except OperationalError as e:
+            engine = self.info.get('replica')
+            if engine is None:
+                raise
+            current_app.extensions['replicas'].mark_down(engine, e)
+            self.rollback()
+            self.info['replica'] = None
+            return method(*args, **kwargs)
+
+    def close(self):
+        self.info.pop('replica', None)
+        self.info.pop('wrote', None)
+        super().close()
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(session):
+    # The replicas may not have this commit yet; keep the client's reads on the primary for a while
+    if session.info.pop('wrote', None) and has_request_context() and 'replicas' in current_app.extensions:
+        flask_session['primary_until'] = time.time() + REPLICA_STICKY_SECONDS
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writes(session):
+    session.info.pop('wrote', None)
@@ -1,35 +1,202 @@
-from flask import Blueprint, request, jsonify
-import os
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_login import login_required, current_user
 import json
-from google import genai
+import logging
+import time
+from models import Assignment, GradingJob, ChatSession, ChatHistory, Resource
+from extensions import db
+from chat_sessions import get_or_create_session, build_session_prompt, append_turns
+from pagination import paginate, paginated_response
+from grading_jobs import create_grading_job, run_grading_job, serialize_job, JOB_POLL_INTERVAL
+from tasks import enqueue, task
+from blob_store import is_text, read_text
+from semantic_index import context_block, find_duplicate, retrieve
+from ai_client import client_registry
+from ai_cache import get_response_cache, make_cache_key
+from ai_limits import AIUnavailable, model_call_guard
+from instrumentation import timed_ai_call
+from google.genai import types
 
 ai_bp = Blueprint('ai', __name__)
+logger = logging.getLogger(__name__)
 
-# Initialize Gemini client
-# The client automatically reads from GEMINI_API_KEY or GOOGLE_API_KEY environment variable
+# Gemini client
+# The key is read from GEMINI_API_KEY or GOOGLE_API_KEY; one pooled client is shared per worker
 def get_genai_client():
-    """Get or create the Gemini AI client"""
-    api_key = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
-    if not api_key:
-        return None
-    return genai.Client(api_key=api_key)
+    """Get the worker's shared Gemini AI client (None if no key is configured)"""
+    return client_registry.get()
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+def cache_bypassed():
+    """Clients can skip the response cache with `X-AI-Cache: bypass` or `Cache-Control: no-cache`"""
+    return (request.headers.get('X-AI-Cache', '').lower() == 'bypass'
+            or 'no-cache' in request.headers.get('Cache-Control', '').lower())
 
-def call_gemini_api(prompt_text):
+def call_config(time_left):
+    # Whatever is left of the per-call deadline after queueing becomes the HTTP timeout
+    return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=max(1000, int(time_left * 1000))))
+
+def ai_unavailable_response(e):
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def call_gemini_api(prompt_text, role=None, use_cache=True):
     """Helper function to call Gemini API using google-genai SDK"""
+    cache = get_response_cache()
+    cache_key = make_cache_key(prompt_text, role, GEMINI_MODEL)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    else:
+        cache.record_bypass()
+
     client = get_genai_client()
     if not client:
         raise Exception("Google API Key not configured. Set GEMINI_API_KEY or GOOGLE_API_KEY environment variable.")
     
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt_text
-        )
-        return response.text
+        with model_call_guard.slot() as time_left, timed_ai_call() as call:
+            response = client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=prompt_text,
+                config=call_config(time_left)
+            )
+            call['usage'] = response.usage_metadata
+    except AIUnavailable:
+        raise
     except Exception as e:
-        print(f"Gemini API Error: {str(e)}")
+        logger.warning("Gemini API error: %s", e)
         raise Exception(f"Gemini API Error: {str(e)}")
 
+    # Only complete answers are cached; a bypass still refreshes the entry
+    if response.text:
+        cache.set(cache_key, response.text)
+    return response.text
+
+def stream_gemini_api(prompt_text, role=None, use_cache=True):
+    """Yield (text_chunk, usage) pairs as Gemini generates; usage is set on the final pair only"""
+    cache = get_response_cache()
+    cache_key = make_cache_key(prompt_text, role, GEMINI_MODEL)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached, {'cached': True}
+            return
+    else:
+        cache.record_bypass()
+
+    client = get_genai_client()
+    if not client:
+        raise Exception("Google API Key not configured. Set GEMINI_API_KEY or GOOGLE_API_KEY environment variable.")
+
+    parts = []
+    usage = None
+    try:
+        # The in-flight slot is held for the whole stream
+        with model_call_guard.slot() as time_left, timed_ai_call() as call:
+            for chunk in client.models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=prompt_text,
+                config=call_config(time_left)
+            ):
+                if chunk.usage_metadata:
+                    usage = call['usage'] = chunk.usage_metadata
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text, None
+    except AIUnavailable:
+        raise
+    except Exception as e:
+        logger.warning("Gemini API error: %s", e)
+        raise Exception(f"Gemini API Error: {str(e)}")
+
+    if parts:
+        cache.set(cache_key, ''.join(parts))
+    yield '', {
+        'cached': False,
+        'prompt_tokens': usage.prompt_token_count if usage else None,
+        'completion_tokens': usage.candidates_token_count if usage else None,
+        'total_tokens': usage.total_token_count if usage else None
+    }
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def system_prompt_for(role):
+    # Contextualize prompt based on role
+    if role == 'teacher':
+        return "You are a helpful teaching assistant. Help with lesson planning, grading, and creating educational content. "
+    if role == 'student':
+        return "You are a friendly learning buddy. Help explain concepts simply and encourage learning. Do not give direct answers to homework. "
+    return ""
+
+def build_chat_prompt(message, role):
+    # Combine system prompt and user message
+    return f"{system_prompt_for(role)}\n\nUser: {message}"
+
+def summarize_turns(prompt):
+    return call_gemini_api(prompt, role='summarizer')
+
+def open_chat_session(data, role):
+    """Signed-in callers get a persisted conversation: `session_id` if given, otherwise
+    their recent one for this role (a new one with `new_session: true`).
+
+    Returns (session, error_response); anonymous callers get (None, None) and
+    keep the stateless single-prompt behaviour.
+    """
+    if not current_user.is_authenticated:
+        return None, None
+    session = get_or_create_session(current_user.id, data.get('session_id'), role, new=bool(data.get('new_session')))
+    if session is None:
+        return None, (jsonify({'error': 'Chat session not found'}), 404)
+    # A new conversation is committed here, so no write transaction (on SQLite,
+    # the database's only write lock) stays open across the model call
+    db.session.commit()
+    return session, None
+
+def prompt_for_session(session, message, role, hits=()):
+    system_prompt = system_prompt_for(role)
+    if hits:
+        system_prompt = f"{system_prompt}\n\n{context_block(hits)}".lstrip()
+    if session is None:
+        return f"{system_prompt}\n\nUser: {message}" if hits else build_chat_prompt(message, role)
+    return build_session_prompt(session, system_prompt, message, summarize_turns)
+
+def library_hits(message):
+    """Passages of the library the signed-in caller may see that relate to `message` (none for anonymous calls)."""
+    if not current_user.is_authenticated or not message:
+        return []
+    try:
+        return retrieve(message, current_user)
+    except Exception:
+        # Grounding is an extra; the chat still answers without it
+        logger.exception('Library retrieval failed')
+        return []
+
+def serialize_sources(hits):
+    return [{'type': h.kind, 'id': h.ref_id, 'title': h.title, 'score': h.score} for h in hits]
+
+def library_duplicate(message):
+    """A teacher's text resource that `message` asks for again, as (text, {id, title, score}), or None.
+
+    Clients that bypass the response cache always get a fresh generation.
+    """
+    if not current_user.is_authenticated or not message or cache_bypassed():
+        return None
+    try:
+        hit = find_duplicate(message, current_user)
+        resource = db.session.get(Resource, hit.ref_id) if hit else None
+        if resource is None or not (resource.content_sha256 is None or is_text(resource.content_type)):
+            return None
+        return read_text(resource) or '', {'id': resource.id, 'title': resource.title, 'score': hit.score}
+    except Exception:
+        logger.exception('Library duplicate check failed')
+        return None
+
 @ai_bp.route('/chat', methods=['POST'])
 def chat():
     if not get_genai_client():
@@ -38,36 +205,128 @@ def chat():
     data = request.json
     message = data.get('message')
     role = data.get('role', 'user') # 'teacher' or 'student' context
+    session, error = open_chat_session(data, role)
+    if error:
+        return error
     
+    duplicate = library_duplicate(message)
+    if duplicate:
+        # The teacher already has this: hand it back instead of generating it again
+        response_text, resource = duplicate
+        result = {'response': response_text, 'resource': resource}
+        if session is not None:
+            append_turns(session, message, response_text)
+            result['session_id'] = session.id
+        return jsonify(result)
+
     try:
-        # Contextualize prompt based on role
-        system_prompt = ""
-        if role == 'teacher':
-            system_prompt = "You are a helpful teaching assistant. Help with lesson planning, grading, and creating educational content. "
-        elif role == 'student':
-            system_prompt = "You are a friendly learning buddy. Help explain concepts simply and encourage learning. Do not give direct answers to homework. "
-            
-        # Combine system prompt and user message
-        full_prompt = f"{system_prompt}\n\nUser: {message}"
-        
-        response_text = call_gemini_api(full_prompt)
-        return jsonify({'response': response_text})
+        hits = library_hits(message)
+        full_prompt = prompt_for_session(session, message, role, hits)
+        response_text = call_gemini_api(full_prompt, role=role, use_cache=not cache_bypassed())
+        if session is None:
+            return jsonify({'response': response_text, 'sources': serialize_sources(hits)})
+        append_turns(session, message, response_text)
+        return jsonify({'response': response_text, 'session_id': session.id, 'sources': serialize_sources(hits)})
         
+    except AIUnavailable as e:
+        return ai_unavailable_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@ai_bp.route('/grade', methods=['POST'])
-def grade():
+@ai_bp.route('/chat/sessions', methods=['GET'])
+@login_required
+def get_chat_sessions():
+    page = paginate(
+        ChatSession.query.filter_by(user_id=current_user.id),
+        sort_columns={'updated_at': ChatSession.updated_at},
+        default_sort='-updated_at',
+        id_column=ChatSession.id
+    )
+    return paginated_response([{
+        'id': cs.id,
+        'role': cs.role,
+        'summary': cs.summary,
+        'created_at': cs.created_at.isoformat(),
+        'updated_at': cs.updated_at.isoformat()
+    } for cs in page.rows], page)
+
+@ai_bp.route('/chat/sessions/<int:session_id>/messages', methods=['GET'])
+@login_required
+def get_chat_messages(session_id):
+    session = db.session.get(ChatSession, session_id)
+    if not session or session.user_id != current_user.id:
+        return jsonify({'error': 'Chat session not found'}), 404
+
+    page = paginate(
+        ChatHistory.query.filter_by(session_id=session_id),
+        sort_columns={'timestamp': ChatHistory.timestamp},
+        default_sort='-timestamp',
+        id_column=ChatHistory.id
+    )
+    return paginated_response([{
+        'id': m.id,
+        'role': m.role,
+        'message': m.message,
+        'timestamp': m.timestamp.isoformat()
+    } for m in page.rows], page)
+
+@ai_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same input as /chat, answered as Server-Sent Events.
+
+    Emits `token` events ({"text": ...}) as the model generates, then a single
+    `done` event with usage metadata and the library `sources` the prompt drew
+    on, or an `error` event if generation fails.
+    """
     if not get_genai_client():
         return jsonify({'error': 'AI service not configured. Set GEMINI_API_KEY environment variable.'}), 503
-        
+
     data = request.json
-    content = data.get('content')
-    assignment_title = data.get('assignment_title')
-    assignment_description = data.get('assignment_description')
-    
-    try:
-        prompt = f"""
+    message = data.get('message')
+    role = data.get('role', 'user')
+    session, error = open_chat_session(data, role)
+    if error:
+        return error
+    use_cache = not cache_bypassed()
+    duplicate = library_duplicate(message)
+    hits = [] if duplicate else library_hits(message)
+    # The view's db session is torn down before the body streams; the conversation
+    # (committed by open_chat_session) is reloaded in the generator's own db session
+    session_id = session.id if session is not None else None
+
+    def generate():
+        # Flush something immediately so proxies and the browser start the stream
+        yield ": stream open\n\n"
+        try:
+            session = db.session.get(ChatSession, session_id) if session_id else None
+            if duplicate:
+                text, resource = duplicate
+                pieces = [(text, None), ('', {'cached': True, 'duplicate_of': resource['id']})]
+            else:
+                pieces = stream_gemini_api(prompt_for_session(session, message, role, hits), role=role,
+                                           use_cache=use_cache)
+            parts = []
+            for text, usage in pieces:
+                if text:
+                    parts.append(text)
+                    yield sse_event('token', {'text': text})
+                if usage is not None:
+                    if session is not None:
+                        append_turns(session, message, ''.join(parts))
+                        usage = dict(usage, session_id=session.id)
+                    yield sse_event('done', {'usage': usage, 'sources': serialize_sources(hits)})
+        except AIUnavailable as e:
+            yield sse_event('error', {'error': str(e), 'retry_after': e.retry_after})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Disable nginx response buffering for this stream
+    })
+
+def build_grading_prompt(assignment_title, assignment_description, content):
+    return f"""
         You are an expert teacher. Please grade the following student submission.
         
         Assignment Title: {assignment_title}
@@ -82,18 +341,115 @@ def grade():
         
         Format the output as VALID JSON with keys 'grade' and 'feedback'. Do not include markdown formatting like ```json.
         """
+
+def parse_grading_response(response_text):
+    # Cleanup potential markdown formatting from LLM
+    clean_text = response_text.replace('```json', '').replace('```', '').strip()
+    
+    try:
+        return json.loads(clean_text)
+    except json.JSONDecodeError:
+        # Fallback if not valid JSON
+        return {'grade': 'Pending', 'feedback': clean_text}
+
+def grade_submission_text(assignment_title, assignment_description, content, use_cache=True):
+    prompt = build_grading_prompt(assignment_title, assignment_description, content)
+    return parse_grading_response(call_gemini_api(prompt, role='grader', use_cache=use_cache))
+
+@ai_bp.route('/grade', methods=['POST'])
+def grade():
+    if not get_genai_client():
+        return jsonify({'error': 'AI service not configured. Set GEMINI_API_KEY environment variable.'}), 503
         
-        response_text = call_gemini_api(prompt)
-        
-        # Cleanup potential markdown formatting from LLM
-        clean_text = response_text.replace('```json', '').replace('```', '').strip()
-        
-        try:
-            result = json.loads(clean_text)
-        except json.JSONDecodeError:
-            # Fallback if not valid JSON
-            result = {'grade': 'Pending', 'feedback': clean_text}
-            
+    data = request.json
+    
+    try:
+        result = grade_submission_text(
+            data.get('assignment_title'),
+            data.get('assignment_description'),
+            data.get('content'),
+            use_cache=not cache_bypassed()
+        )
         return jsonify(result)
+    except AIUnavailable as e:
+        return ai_unavailable_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+# Ahead of deletes and other housekeeping: a teacher is watching its progress
+@task('grade_assignment', priority=10)
+def grade_assignment_task(job_id):
+    run_grading_job(job_id, grade_submission_text)
+
+@ai_bp.route('/grade/jobs', methods=['POST'])
+@login_required
+def create_grade_job():
+    if current_user.role != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 403
+    if not get_genai_client():
+        return jsonify({'error': 'AI service not configured. Set GEMINI_API_KEY environment variable.'}), 503
+
+    assignment = Assignment.query.get_or_404(request.json.get('assignment_id'))
+    if assignment.course.teacher_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    active = GradingJob.query.filter(
+        GradingJob.assignment_id == assignment.id,
+        GradingJob.status.in_(['queued', 'running'])
+    ).first()
+    if active:
+        return jsonify({'error': 'A grading job is already running for this assignment', 'job': serialize_job(active)}), 409
+
+    job = create_grading_job(assignment, current_user.id)
+    enqueue(grade_assignment_task, {'job_id': job.id}, key=f'grade_assignment:{assignment.id}',
+            created_by=current_user.id)
+    db.session.commit()
+    return jsonify({'message': 'Grading job queued', 'job': serialize_job(job)}), 202
+
+def get_owned_job(job_id):
+    job = GradingJob.query.get_or_404(job_id)
+    if job.teacher_id != current_user.id:
+        return None
+    return job
+
+@ai_bp.route('/grade/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_grade_job(job_id):
+    job = get_owned_job(job_id)
+    if not job:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(serialize_job(job))
+
+@ai_bp.route('/grade/jobs/<int:job_id>/stream', methods=['GET'])
+@login_required
+def stream_grade_job(job_id):
+    """Server-Sent Events: a `progress` event whenever the job's counters change, then `done`"""
+    job = get_owned_job(job_id)
+    if not job:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    def generate():
+        last = None
+        while True:
+            db.session.expire_all()
+            current = serialize_job(db.session.get(GradingJob, job_id))
+            if current != last:
+                yield sse_event('progress', current)
+                last = current
+            if current['status'] in ('completed', 'failed'):
+                yield sse_event('done', current)
+                return
+            time.sleep(JOB_POLL_INTERVAL)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@ai_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_response_cache().snapshot())
+
+@ai_bp.route('/limits', methods=['GET'])
+def limits_stats():
+    return jsonify(model_call_guard.snapshot())
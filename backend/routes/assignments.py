@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import Assignment, Class, Submission
 from extensions import db
+from pagination import paginate, paginated_response
+from enrollments import enrolled_class_ids
+from sqlalchemy import and_, false, null
+from sqlalchemy.orm import contains_eager
 from datetime import datetime
 
 assignments_bp = Blueprint('assignments', __name__)
@@ -9,31 +13,41 @@ assignments_bp = Blueprint('assignments', __name__)
 @assignments_bp.route('/', methods=['GET'])
 @login_required
 def get_assignments():
+    # Classes are eager-loaded through the join so a.course.name never lazy-loads,
+    # and students get their own submission via a single outer join.
+    query = db.session.query(Assignment).join(Assignment.course).options(contains_eager(Assignment.course))
+
     if current_user.role == 'student':
-        # Find class of the student
-        # Assuming student.class_name matches Class.name
-        student_class = Class.query.filter_by(name=current_user.class_name).first()
-        if not student_class:
-            return jsonify([])
-        assignments = Assignment.query.filter_by(class_id=student_class.id).all()
+        # Assignments of every class the student is enrolled in
+        query = query.outerjoin(Submission, and_(
+            Submission.assignment_id == Assignment.id,
+            Submission.student_id == current_user.id
+        )).add_columns(Submission.status, Submission.grade).filter(
+            Assignment.class_id.in_(enrolled_class_ids(current_user.id))
+        )
     elif current_user.role == 'teacher':
         # Get assignments for classes taught by this teacher
-        classes = Class.query.filter_by(teacher_id=current_user.id).with_entities(Class.id).all()
-        class_ids = [c.id for c in classes]
-        assignments = Assignment.query.filter(Assignment.class_id.in_(class_ids)).all()
+        query = query.add_columns(null(), null()).filter(
+            Class.teacher_id == current_user.id
+        )
+        if request.args.get('class_id'):
+            query = query.filter(Assignment.class_id == request.args.get('class_id', type=int))
     else:
-        assignments = []
+        query = query.add_columns(null(), null()).filter(false())
+
+    if request.args.get('subject'):
+        query = query.filter(Assignment.subject == request.args['subject'])
+
+    page = paginate(
+        query,
+        sort_columns={'created_at': Assignment.created_at, 'title': Assignment.title},
+        default_sort='-created_at',
+        id_column=Assignment.id,
+        entity=lambda row: row[0]
+    )
 
     results = []
-    for a in assignments:
-        submission_status = 'pending'
-        grade = None
-        if current_user.role == 'student':
-            submission = Submission.query.filter_by(assignment_id=a.id, student_id=current_user.id).first()
-            if submission:
-                submission_status = submission.status
-                grade = submission.grade
-        
+    for a, submission_status, grade in page.rows:
         results.append({
             'id': a.id,
             'title': a.title,
@@ -42,11 +56,11 @@ def get_assignments():
             'due_date': a.due_date.isoformat() if a.due_date else None,
             'status': a.status,
             'class_name': a.course.name,
-            'submission_status': submission_status,
+            'submission_status': submission_status or 'pending',
             'grade': grade
         })
 
-    return jsonify(results)
+    return paginated_response(results, page)
 
 @assignments_bp.route('/', methods=['POST'])
 @login_required
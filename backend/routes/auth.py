@@ -1,12 +1,17 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, Class
 from extensions import db
+from enrollments import enroll_by_class_name, filter_by_enrollment
+from credentials import hash_password, hash_pin, is_valid_pin, verify_password, verify_pin
+from login_throttle import login_throttle
+from http_cache import etag_cached
+from grading_queue import rename_student
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/public/classes', methods=['GET'])
+@etag_cached(tables=('class',), max_age=60, public=True)
 def get_public_classes():
     # Return list of unique class names for login dropdown
     # Assuming class_name in User model is what we use for grouping students
@@ -15,17 +20,19 @@ def get_public_classes():
     return jsonify([c.name for c in classes])
 
 @auth_bp.route('/public/users', methods=['GET'])
+@etag_cached(tables=('user', 'enrollment', 'class'), public=True)
 def get_public_users():
     role = request.args.get('role')
     class_name = request.args.get('class_name')
+    class_id = request.args.get('class_id', type=int)
     
     query = User.query
     
     if role:
         query = query.filter_by(role=role)
     
-    if class_name and role == 'student':
-        query = query.filter_by(class_name=class_name)
+    if role == 'student' and (class_id or class_name):
+        query = filter_by_enrollment(query, class_id, class_name)
         
     users = query.with_entities(User.id, User.name).all()
     return jsonify([{'id': u.id, 'name': u.name} for u in users])
@@ -35,55 +42,72 @@ def register():
     data = request.json
     if User.query.filter_by(email=data['email']).first():
         return jsonify({'error': 'Email already exists'}), 400
+    if data.get('pin') and not is_valid_pin(data['pin']):
+        return jsonify({'error': 'PIN must be 4 digits'}), 400
     
     user = User(
         name=data['name'],
         email=data['email'],
-        password_hash=generate_password_hash(data['password']),
+        password_hash=hash_password(data['password']),
         role=data['role'],
-        pin=data.get('pin'),
+        pin_hash=hash_pin(data['pin']) if data.get('pin') else None,
         class_name=data.get('class_name')
     )
     db.session.add(user)
+    enroll_by_class_name(user)
     db.session.commit()
     return jsonify({'message': 'User registered successfully'}), 201
 
+def login_response(user):
+    login_user(user)
+    return jsonify({
+        'message': 'Logged in successfully',
+        'user': {
+            'id': user.id,
+            'name': user.name,
+            'role': user.role,
+            'email': user.email,
+            'className': user.class_name
+        }
+    }), 200
+
+def throttled_response(retry_after):
+    retry_after = max(1, int(retry_after + 0.999))
+    response = jsonify({'error': 'Too many failed attempts, try again later', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     data = request.json
+    ip = request.remote_addr
     
     # Login with User ID and PIN (New Flow)
     if 'user_id' in data and 'pin' in data:
-        user = User.query.get(data['user_id'])
-        if user and user.pin == data['pin']:
-            login_user(user)
-            return jsonify({
-                'message': 'Logged in successfully',
-                'user': {
-                    'id': user.id,
-                    'name': user.name,
-                    'role': user.role,
-                    'email': user.email,
-                    'className': user.class_name
-                }
-            }), 200
+        account = f"user:{data['user_id']}"
+        retry_after = login_throttle.retry_after(account, ip)
+        if retry_after:
+            return throttled_response(retry_after)
+        user = db.session.get(User, data['user_id'])
+        if user and verify_pin(user.pin_hash, data['pin']):
+            login_throttle.record_success(account)
+            return login_response(user)
+        login_throttle.record_failure(account, ip)
         return jsonify({'error': 'Invalid PIN'}), 401
 
     # Login with Email/Password (Fallback/Admin)
     if 'email' in data and 'password' in data:
+        account = f"email:{data['email'].lower()}"
+        retry_after = login_throttle.retry_after(account, ip)
+        if retry_after:
+            return throttled_response(retry_after)
         user = User.query.filter_by(email=data['email']).first()
-        if user and check_password_hash(user.password_hash, data['password']):
-            login_user(user)
-            return jsonify({
-                'message': 'Logged in successfully',
-                'user': {
-                    'id': user.id,
-                    'name': user.name,
-                    'role': user.role,
-                    'email': user.email,
-                    'className': user.class_name
-                }
-            }), 200
+        # scrypt runs in the hash pool, off this worker's request threads
+        if user and verify_password(user.password_hash, data['password']):
+            login_throttle.record_success(account)
+            return login_response(user)
+        login_throttle.record_failure(account, ip)
             
     return jsonify({'error': 'Invalid credentials'}), 401
 
@@ -109,29 +133,33 @@ def get_current_user():
 def update_profile():
     data = request.json
     current_pin = data.get('currentPin')
+    # current_user is a cached snapshot; edits go through the User row
+    user = User.query.get_or_404(current_user.id)
     
-    if not current_pin or current_user.pin != current_pin:
+    if not verify_pin(user.pin_hash, current_pin):
         return jsonify({'error': 'Invalid current PIN'}), 403
         
-    if 'name' in data:
-        current_user.name = data['name']
+    if 'name' in data and data['name'] != user.name:
+        user.name = data['name']
+        rename_student(user.id, user.name)
         
     if 'pin' in data and data['pin']:
         # Ensure PIN is 4 digits
-        if len(data['pin']) == 4 and data['pin'].isdigit():
-            current_user.pin = data['pin']
+        if is_valid_pin(data['pin']):
+            user.pin_hash = hash_pin(data['pin'])
         else:
             return jsonify({'error': 'PIN must be 4 digits'}), 400
             
+    # Committing evicts the cached identity (see identity_cache)
     db.session.commit()
     
     return jsonify({
         'message': 'Profile updated successfully',
         'user': {
-            'id': current_user.id,
-            'name': current_user.name,
-            'role': current_user.role,
-            'email': current_user.email,
-            'className': current_user.class_name
+            'id': user.id,
+            'name': user.name,
+            'role': user.role,
+            'email': user.email,
+            'className': user.class_name
         }
     })
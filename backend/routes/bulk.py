@@ -0,0 +1,265 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import insert, tuple_
+from models import User, Class, Enrollment, Assignment
+from extensions import db
+from bulk_io import BulkFormatError, ImportReport, chunked, export_response, iter_records, request_format
+from credentials import hash_passwords, hash_pin, is_valid_pin
+from search_index import index_rows
+
+bulk_bp = Blueprint('bulk', __name__)
+
+ROLES = ('teacher', 'student', 'admin')
+USER_FIELDS = ['id', 'name', 'email', 'role', 'class_name', 'created_at']
+CLASS_FIELDS = ['id', 'name', 'teacher_email', 'created_at']
+ASSIGNMENT_FIELDS = ['id', 'title', 'subject', 'description', 'due_date', 'class_id', 'class_name', 'created_at']
+
+
+@bulk_bp.errorhandler(BulkFormatError)
+def handle_format_error(e):
+    return jsonify({'error': str(e)}), 400
+
+
+def records():
+    """The request body as chunks of (row_number, record) pairs; malformed rows come through as None."""
+    return chunked(iter_records(request.stream, request_format()))
+
+
+def missing_fields(record, fields):
+    return [f for f in fields if not record.get(f)]
+
+
+def isoformat(value):
+    return value.isoformat() if value else None
+
+
+@bulk_bp.route('/users/import', methods=['POST'])
+@login_required
+def import_users():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    report = ImportReport()
+    seen = set()
+    for chunk in records():
+        valid = []
+        for number, record in chunk:
+            if record is None:
+                report.error(number, 'Malformed row')
+                continue
+            missing = missing_fields(record, ('name', 'email', 'password', 'role'))
+            if missing:
+                report.error(number, f"Missing {', '.join(missing)}")
+            elif record['role'] not in ROLES:
+                report.error(number, f"Invalid role '{record['role']}'")
+            elif record.get('pin') and not is_valid_pin(str(record['pin'])):
+                report.error(number, 'PIN must be 4 digits')
+            elif record['email'] in seen:
+                report.error(number, 'Duplicate email in file')
+            else:
+                seen.add(record['email'])
+                valid.append((number, record))
+
+        # One IN query per chunk instead of an existence check per row
+        existing = {email for (email,) in db.session.query(User.email).filter(
+            User.email.in_([r['email'] for _, r in valid])
+        )} if valid else set()
+        for number, record in valid:
+            if record['email'] in existing:
+                report.error(number, 'Email already exists')
+        valid = [(n, r) for n, r in valid if r['email'] not in existing]
+        if not valid:
+            continue
+
+        hashes = hash_passwords([str(r['password']) for _, r in valid])
+        rows = [{
+            'name': r['name'],
+            'email': r['email'],
+            'password_hash': password_hash,
+            'role': r['role'],
+            'pin_hash': hash_pin(str(r['pin'])) if r.get('pin') else None,
+            'class_name': r.get('class_name') or None
+        } for (_, r), password_hash in zip(valid, hashes)]
+        created = db.session.execute(insert(User).returning(User.id, User.role, User.class_name), rows).all()
+        report.created += len(created)
+
+        # Enroll new students in the classes named by their class_name, as single registration does
+        names = {u.class_name for u in created if u.role == 'student' and u.class_name}
+        if names:
+            class_ids = {}
+            for class_id, name in db.session.query(Class.id, Class.name).filter(Class.name.in_(names)):
+                class_ids.setdefault(name, []).append(class_id)
+            enrollments = [
+                {'class_id': class_id, 'student_id': u.id}
+                for u in created if u.role == 'student'
+                for class_id in class_ids.get(u.class_name, ())
+            ]
+            if enrollments:
+                db.session.execute(insert(Enrollment), enrollments)
+
+    db.session.commit()
+    return jsonify(report.to_dict()), 200
+
+
+@bulk_bp.route('/users/export', methods=['GET'])
+@login_required
+def export_users():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    query = db.session.query(User.id, User.name, User.email, User.role, User.class_name, User.created_at)
+    if request.args.get('role'):
+        query = query.filter(User.role == request.args['role'])
+    return export_response(query.order_by(User.id), USER_FIELDS, lambda u: {
+        'id': u.id,
+        'name': u.name,
+        'email': u.email,
+        'role': u.role,
+        'class_name': u.class_name,
+        'created_at': isoformat(u.created_at)
+    }, 'users')
+
+
+@bulk_bp.route('/classes/import', methods=['POST'])
+@login_required
+def import_classes():
+    if current_user.role not in ['teacher', 'admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    report = ImportReport()
+    for chunk in records():
+        valid = []
+        for number, record in chunk:
+            if record is None:
+                report.error(number, 'Malformed row')
+            elif not record.get('name'):
+                report.error(number, 'Missing name')
+            else:
+                valid.append((number, record))
+
+        # Admins may assign classes to a teacher by email; teachers always import their own
+        teacher_ids = {}
+        if current_user.role == 'admin':
+            emails = {r['teacher_email'] for _, r in valid if r.get('teacher_email')}
+            if emails:
+                teacher_ids = dict(db.session.query(User.email, User.id).filter(
+                    User.email.in_(emails), User.role == 'teacher'
+                ))
+
+        rows = []
+        for number, record in valid:
+            teacher_id = current_user.id
+            if current_user.role == 'admin' and record.get('teacher_email'):
+                teacher_id = teacher_ids.get(record['teacher_email'])
+                if teacher_id is None:
+                    report.error(number, f"Unknown teacher '{record['teacher_email']}'")
+                    continue
+            rows.append((number, {'name': record['name'], 'teacher_id': teacher_id}))
+
+        # Re-running an import must not duplicate a teacher's classes
+        pairs = {(r['teacher_id'], r['name']) for _, r in rows}
+        existing = set(db.session.query(Class.teacher_id, Class.name).filter(
+            tuple_(Class.teacher_id, Class.name).in_(pairs)
+        )) if pairs else set()
+        new = []
+        for number, row in rows:
+            key = (row['teacher_id'], row['name'])
+            if key in existing:
+                report.error(number, 'Class already exists')
+            else:
+                existing.add(key)
+                new.append(row)
+        if new:
+            db.session.execute(insert(Class), new)
+            report.created += len(new)
+
+    db.session.commit()
+    return jsonify(report.to_dict()), 200
+
+
+@bulk_bp.route('/classes/export', methods=['GET'])
+@login_required
+def export_classes():
+    if current_user.role not in ['teacher', 'admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    query = db.session.query(Class.id, Class.name, User.email, Class.created_at).join(User, Class.teacher_id == User.id)
+    if current_user.role == 'teacher':
+        query = query.filter(Class.teacher_id == current_user.id)
+    return export_response(query.order_by(Class.id), CLASS_FIELDS, lambda c: {
+        'id': c.id,
+        'name': c.name,
+        'teacher_email': c.email,
+        'created_at': isoformat(c.created_at)
+    }, 'classes')
+
+
+@bulk_bp.route('/assignments/import', methods=['POST'])
+@login_required
+def import_assignments():
+    if current_user.role != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    # A teacher has a handful of classes; resolve ids and names once
+    own_classes = db.session.query(Class.id, Class.name).filter(Class.teacher_id == current_user.id).all()
+    class_ids = {c.id for c in own_classes}
+    class_by_name = {c.name: c.id for c in own_classes}
+
+    report = ImportReport()
+    for chunk in records():
+        rows = []
+        for number, record in chunk:
+            if record is None:
+                report.error(number, 'Malformed row')
+                continue
+            if not record.get('title'):
+                report.error(number, 'Missing title')
+                continue
+            try:
+                class_id = int(record['class_id']) if record.get('class_id') else class_by_name.get(record.get('class_name'))
+                due_date = datetime.fromisoformat(record['due_date']) if record.get('due_date') else None
+            except (TypeError, ValueError):
+                report.error(number, 'Invalid class_id or due_date')
+                continue
+            if class_id not in class_ids:
+                report.error(number, 'Invalid class')
+                continue
+            rows.append({
+                'title': record['title'],
+                'subject': record.get('subject') or None,
+                'description': record.get('description') or None,
+                'class_id': class_id,
+                'due_date': due_date
+            })
+        if rows:
+            ids = db.session.execute(insert(Assignment).returning(Assignment.id), rows).scalars().all()
+            index_rows('assignment', ids)
+            report.created += len(rows)
+
+    db.session.commit()
+    return jsonify(report.to_dict()), 200
+
+
+@bulk_bp.route('/assignments/export', methods=['GET'])
+@login_required
+def export_assignments():
+    if current_user.role not in ['teacher', 'admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    query = db.session.query(
+        Assignment.id, Assignment.title, Assignment.subject, Assignment.description,
+        Assignment.due_date, Assignment.class_id, Class.name, Assignment.created_at
+    ).join(Class, Assignment.class_id == Class.id)
+    if current_user.role == 'teacher':
+        query = query.filter(Class.teacher_id == current_user.id)
+    return export_response(query.order_by(Assignment.id), ASSIGNMENT_FIELDS, lambda a: {
+        'id': a.id,
+        'title': a.title,
+        'subject': a.subject,
+        'description': a.description,
+        'due_date': isoformat(a.due_date),
+        'class_id': a.class_id,
+        'class_name': a.name,
+        'created_at': isoformat(a.created_at)
+    }, 'assignments')
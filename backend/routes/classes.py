@@ -1,7 +1,13 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from models import Class, User
+from models import Class, User, Enrollment
 from extensions import db
+from enrollments import enroll_named_students
+from pagination import paginate, paginated_response
+from sqlalchemy.orm import joinedload
+from http_cache import etag_cached
+from tasks import enqueue, serialize_task
+import deletions
 
 classes_bp = Blueprint('classes', __name__)
 
@@ -9,31 +15,34 @@ classes_bp = Blueprint('classes', __name__)
 @login_required
 def get_classes():
     if current_user.role == 'teacher':
-        classes = Class.query.filter_by(teacher_id=current_user.id).all()
+        query = Class.query.filter_by(teacher_id=current_user.id)
     elif current_user.role == 'student':
-        # For now, assuming manual enrollment or simple logic
-        # In the new model, we don't have a many-to-many table explicitly defined in models.py 
-        # (Wait, I removed the secondary table in the previous step's models.py update? Let me check models.py again)
-        # Ah, I see I removed 'student_class' table in the new models.py. 
-        # The User model has 'class_name'. So students belong to one class effectively in this simple schema?
-        # Or I should have kept the many-to-many.
-        # The new models.py has: class_name = db.Column(db.String(50))
-        # This implies a student belongs to one class string (e.g. "5A").
-        # And Class model has name="5A".
-        # So we can link them by name.
-        classes = Class.query.filter_by(name=current_user.class_name).all()
+        # Classes the student is enrolled in
+        query = Class.query.join(Enrollment).filter(Enrollment.student_id == current_user.id)
     elif current_user.role == 'admin':
-        classes = Class.query.all()
+        query = Class.query
+        if request.args.get('teacher_id'):
+            query = query.filter_by(teacher_id=request.args.get('teacher_id', type=int))
     else:
-        classes = []
-        
-    return jsonify([{
+        return jsonify([])
+
+    if request.args.get('name'):
+        query = query.filter_by(name=request.args['name'])
+
+    page = paginate(
+        query.options(joinedload(Class.teacher)),
+        sort_columns={'created_at': Class.created_at, 'name': Class.name},
+        default_sort='name',
+        id_column=Class.id
+    )
+    return paginated_response([{
         'id': c.id, 
         'name': c.name, 
         'teacher': c.teacher.name
-    } for c in classes])
+    } for c in page.rows], page)
 
 @classes_bp.route('/public', methods=['GET'])
+@etag_cached(tables=('class', 'user'), max_age=60, public=True)
 def get_public_classes():
     classes = Class.query.all()
     return jsonify([{
@@ -51,16 +60,71 @@ def create_class():
     data = request.json
     new_class = Class(name=data['name'], teacher_id=current_user.id)
     db.session.add(new_class)
+    # Students who registered under this class name before it existed
+    enroll_named_students(new_class)
     db.session.commit()
     return jsonify({'message': 'Class created', 'id': new_class.id}), 201
 
+def get_managed_class(class_id):
+    cls = Class.query.get_or_404(class_id)
+    if current_user.role != 'admin' and (current_user.role != 'teacher' or cls.teacher_id != current_user.id):
+        return None
+    return cls
+
+@classes_bp.route('/<int:class_id>/students', methods=['GET'])
+@login_required
+def get_class_students(class_id):
+    if not get_managed_class(class_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    page = paginate(
+        User.query.join(Enrollment, Enrollment.student_id == User.id).filter(Enrollment.class_id == class_id),
+        sort_columns={'name': User.name},
+        default_sort='name',
+        id_column=User.id
+    )
+    return paginated_response([{
+        'id': u.id,
+        'name': u.name,
+        'email': u.email
+    } for u in page.rows], page)
+
+@classes_bp.route('/<int:class_id>/students', methods=['POST'])
+@login_required
+def enroll_student(class_id):
+    if not get_managed_class(class_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    student = User.query.get_or_404(request.json.get('student_id'))
+    if student.role != 'student':
+        return jsonify({'error': 'Only students can be enrolled'}), 400
+    if Enrollment.query.filter_by(class_id=class_id, student_id=student.id).first():
+        return jsonify({'error': 'Student already enrolled'}), 400
+
+    db.session.add(Enrollment(class_id=class_id, student_id=student.id))
+    db.session.commit()
+    return jsonify({'message': 'Student enrolled'}), 201
+
+@classes_bp.route('/<int:class_id>/students/<int:student_id>', methods=['DELETE'])
+@login_required
+def unenroll_student(class_id, student_id):
+    if not get_managed_class(class_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    enrollment = Enrollment.query.filter_by(class_id=class_id, student_id=student_id).first_or_404()
+    db.session.delete(enrollment)
+    db.session.commit()
+    return jsonify({'message': 'Student unenrolled'}), 200
+
 @classes_bp.route('/<int:class_id>', methods=['DELETE'])
 @login_required
 def delete_class(class_id):
     cls = Class.query.get_or_404(class_id)
     if current_user.role != 'admin' and (current_user.role != 'teacher' or cls.teacher_id != current_user.id):
         return jsonify({'error': 'Unauthorized'}), 403
-        
-    db.session.delete(cls)
+
+    # Assignments and submissions can run to thousands of rows: a worker deletes them
+    task = enqueue(deletions.delete_class, {'class_id': class_id}, key=f'delete_class:{class_id}',
+                   created_by=current_user.id)
     db.session.commit()
-    return jsonify({'message': 'Class deleted'}), 200
+    return jsonify({'message': 'Class deletion queued', 'task': serialize_task(task)}), 202
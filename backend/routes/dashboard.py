@@ -0,0 +1,130 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from models import User, Class, Assignment, Submission, Enrollment, GradingQueueItem
+from enrollments import enrolled_class_ids
+from extensions import db
+from sqlalchemy import and_, func
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+DEFAULT_TOP_N = 5
+MAX_TOP_N = 20
+
+def top_n():
+    return max(1, min(request.args.get('limit', DEFAULT_TOP_N, type=int), MAX_TOP_N))
+
+@dashboard_bp.route('/student', methods=['GET'])
+@login_required
+def student_dashboard():
+    if current_user.role != 'student':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    limit = top_n()
+    class_ids = enrolled_class_ids(current_user.id)
+    my_submission = and_(Submission.assignment_id == Assignment.id, Submission.student_id == current_user.id)
+    status = func.coalesce(Submission.status, 'pending')
+
+    # pending / submitted / graded counts in one GROUP BY over the class's assignments
+    counts = {'pending': 0, 'submitted': 0, 'graded': 0}
+    for key, count in db.session.query(status, func.count(Assignment.id)).outerjoin(
+        Submission, my_submission
+    ).filter(Assignment.class_id.in_(class_ids)).group_by(status):
+        counts[key] = count
+
+    upcoming = db.session.query(Assignment).outerjoin(Submission, my_submission).filter(
+        Assignment.class_id.in_(class_ids),
+        Submission.id.is_(None)
+    ).order_by(Assignment.due_date.is_(None), Assignment.due_date, Assignment.id).limit(limit).all()
+
+    recent_grades = db.session.query(Submission.assignment_id, Assignment.title, Submission.grade, Submission.feedback).join(
+        Assignment, Submission.assignment_id == Assignment.id
+    ).filter(
+        Submission.student_id == current_user.id,
+        Submission.status == 'graded'
+    ).order_by(Submission.submitted_at.desc(), Submission.id.desc()).limit(limit).all()
+
+    return jsonify({
+        'counts': counts,
+        'upcoming': [{
+            'id': a.id,
+            'title': a.title,
+            'subject': a.subject,
+            'due_date': a.due_date.isoformat() if a.due_date else None
+        } for a in upcoming],
+        'recent_grades': [{
+            'assignment_id': g.assignment_id,
+            'title': g.title,
+            'grade': g.grade,
+            'feedback': g.feedback
+        } for g in recent_grades]
+    })
+
+@dashboard_bp.route('/teacher', methods=['GET'])
+@login_required
+def teacher_dashboard():
+    if current_user.role != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    limit = top_n()
+    class_ids = db.session.query(Class.id).filter(Class.teacher_id == current_user.id)
+
+    classes = db.session.query(func.count(Class.id)).filter(Class.teacher_id == current_user.id).scalar()
+    assignments = db.session.query(func.count(Assignment.id)).filter(Assignment.class_id.in_(class_ids)).scalar()
+    students = db.session.query(func.count(func.distinct(Enrollment.student_id))).filter(
+        Enrollment.class_id.in_(class_ids)
+    ).scalar()
+
+    submissions = {'submitted': 0, 'graded': 0}
+    for key, count in db.session.query(Submission.status, func.count(Submission.id)).join(
+        Assignment, Submission.assignment_id == Assignment.id
+    ).filter(Assignment.class_id.in_(class_ids)).group_by(Submission.status):
+        submissions[key] = count
+
+    to_grade = GradingQueueItem.query.filter_by(teacher_id=current_user.id).order_by(
+        GradingQueueItem.submitted_at, GradingQueueItem.submission_id
+    ).limit(limit).all()
+
+    return jsonify({
+        'counts': {
+            'classes': classes,
+            'assignments': assignments,
+            'students': students,
+            'to_grade': sum(v for k, v in submissions.items() if k != 'graded'),
+            'graded': submissions['graded']
+        },
+        'to_grade': [{
+            'id': item.submission_id,
+            'student_name': item.student_name,
+            'assignment_title': item.assignment_title,
+            'submitted_at': item.submitted_at.isoformat()
+        } for item in to_grade]
+    })
+
+@dashboard_bp.route('/admin', methods=['GET'])
+@login_required
+def admin_dashboard():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    limit = top_n()
+    users_by_role = dict(db.session.query(User.role, func.count(User.id)).group_by(User.role).all())
+    submissions_by_status = dict(db.session.query(Submission.status, func.count(Submission.id)).group_by(Submission.status).all())
+    recent_users = db.session.query(User.id, User.name, User.role, User.created_at).order_by(
+        User.created_at.desc(), User.id.desc()
+    ).limit(limit).all()
+
+    return jsonify({
+        'counts': {
+            'users': sum(users_by_role.values()),
+            'users_by_role': users_by_role,
+            'classes': db.session.query(func.count(Class.id)).scalar(),
+            'assignments': db.session.query(func.count(Assignment.id)).scalar(),
+            'submissions_by_status': submissions_by_status
+        },
+        'recent_users': [{
+            'id': u.id,
+            'name': u.name,
+            'role': u.role,
+            'created_at': u.created_at.isoformat() if u.created_at else None
+        } for u in recent_users]
+    })
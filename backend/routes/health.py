@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+from extensions import db
+from ai_client import get_configured_api_key
+from ai_limits import model_call_guard
+from instrumentation import request_metrics
+
+HEALTH_CHECK_TTL = float(os.environ.get('HEALTH_CHECK_TTL', 5))
+# Report not-ready above this many in-flight requests on the probed worker (0 disables)
+HEALTH_MAX_IN_FLIGHT = int(os.environ.get('HEALTH_MAX_IN_FLIGHT', 0))
+
+health_bp = Blueprint('health', __name__)
+
+_lock = threading.Lock()
+_cached = {'at': 0.0, 'result': None}
+_script_heads = None
+
+
+def migration_heads():
+    global _script_heads
+    if _script_heads is None:
+        directory = current_app.extensions['migrate'].directory
+        if not os.path.isabs(directory):
+            directory = os.path.join(current_app.root_path, directory)
+        _script_heads = set(ScriptDirectory(directory).get_heads())
+    return _script_heads
+
+
+def check_database():
+    """SELECT 1 plus the schema revision, on one pooled connection."""
+    started = time.perf_counter()
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+            current = set(MigrationContext.configure(conn).get_current_heads())
+    except Exception as e:
+        return {'ok': False, 'error': f'{type(e).__name__}: {e}'[:200]}, None
+    database = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+    head = migration_heads()
+    migrations = {'ok': current == head, 'current': sorted(current), 'head': sorted(head)}
+    return database, migrations
+
+
+def cached_checks():
+    """Database and migration checks, memoized for HEALTH_CHECK_TTL so frequent probes stay cheap."""
+    with _lock:
+        now = time.monotonic()
+        if _cached['result'] is None or now - _cached['at'] >= HEALTH_CHECK_TTL:
+            _cached['result'] = check_database()
+            _cached['at'] = now
+        return _cached['result']
+
+
+def pool_status():
+    pool = db.engine.pool
+    if not hasattr(pool, 'checkedout'):
+        return {'class': type(pool).__name__}
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        'class': type(pool).__name__,
+        'size': pool.size(),
+        'checked_out': checked_out,
+        'overflow': pool.overflow(),
+        'capacity': capacity,
+        'saturation': round(checked_out / capacity, 3) if capacity else None
+    }
+
+
+@health_bp.route('/health', methods=['GET'])
+def health_check():
+    # Liveness: the process is up and serving; no database or network calls
+    return jsonify({'status': 'healthy', 'service': 'aarna-backend'})
+
+
+@health_bp.route('/health/ready', methods=['GET'])
+def readiness_check():
+    pool = pool_status()
+    in_flight = request_metrics.in_flight
+    checks = {
+        'pool': {'ok': pool.get('saturation') is None or pool['saturation'] < 1, **pool},
+        'requests': {'ok': not HEALTH_MAX_IN_FLIGHT or in_flight <= HEALTH_MAX_IN_FLIGHT,
+                     'in_flight': in_flight, 'max_in_flight': HEALTH_MAX_IN_FLIGHT or None}
+    }
+    if checks['pool']['ok']:
+        checks['database'], migrations = cached_checks()
+        if migrations is not None:
+            checks['migrations'] = migrations
+    else:
+        # A probe that waited on the pool would only add to the queue
+        checks['database'] = {'ok': False, 'error': 'connection pool saturated'}
+    router = current_app.extensions.get('replicas')
+    if router is not None:
+        # Informational: reads fall back to the primary when no replica is usable
+        checks['replicas'] = {'ok': True, 'replicas': router.status()}
+    ready = all(check['ok'] for check in checks.values())
+    # Reported, not gating: everything but the AI features works without Gemini
+    dependencies = {
+        'gemini': {'configured': bool(get_configured_api_key()), 'breaker_state': model_call_guard.breaker.state}
+    }
+    return jsonify({
+        'status': 'ready' if ready else 'unavailable', 'checks': checks, 'dependencies': dependencies
+    }), 200 if ready else 503
@@ -2,11 +2,15 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import Resource
 from extensions import db
+from pagination import paginate, paginated_response
+from http_cache import etag_cached
+from blob_store import content_response, preview, request_chunks, save_content, save_text
 
 resources_bp = Blueprint('resources', __name__)
 
 @resources_bp.route('/', methods=['GET'])
 @login_required
+@etag_cached(tables=('resource',))
 def get_resources():
     # Filter by type or subject if provided
     type_filter = request.args.get('type')
@@ -17,21 +21,30 @@ def get_resources():
         query = query.filter_by(type=type_filter)
     if subject_filter:
         query = query.filter_by(subject=subject_filter)
+    if request.args.get('grade'):
+        query = query.filter_by(grade=request.args['grade'])
         
     # If teacher, show their own resources + maybe shared ones?
     # For now, let's show all resources created by this teacher
     if current_user.role == 'teacher':
         query = query.filter_by(teacher_id=current_user.id)
         
-    resources = query.all()
-    return jsonify([{
+    page = paginate(
+        query,
+        sort_columns={'created_at': Resource.created_at, 'title': Resource.title},
+        default_sort='-created_at',
+        id_column=Resource.id
+    )
+    return paginated_response([{
         'id': r.id,
         'title': r.title,
         'type': r.type,
         'subject': r.subject,
         'grade': r.grade,
+        'preview': preview(r),
+        'content_size': r.content_size,
         'created_at': r.created_at.strftime('%Y-%m-%d')
-    } for r in resources])
+    } for r in page.rows], page)
 
 @resources_bp.route('/', methods=['POST'])
 @login_required
@@ -43,15 +56,35 @@ def create_resource():
     resource = Resource(
         title=data['title'],
         type=data['type'],
-        content=data.get('content'),
         subject=data.get('subject'),
         grade=data.get('grade'),
         teacher_id=current_user.id
     )
+    save_text(resource, data.get('content'))
     db.session.add(resource)
     db.session.commit()
     return jsonify({'message': 'Resource saved', 'id': resource.id}), 201
 
+@resources_bp.route('/<int:id>/content', methods=['GET'])
+@login_required
+def get_resource_content(id):
+    resource = Resource.query.get_or_404(id)
+    # Teachers see their own resources, as in the list
+    if current_user.role == 'teacher' and resource.teacher_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return content_response(resource, download_name=f'resource-{resource.id}')
+
+@resources_bp.route('/<int:id>/content', methods=['PUT'])
+@login_required
+def upload_resource_content(id):
+    resource = Resource.query.get_or_404(id)
+    if resource.teacher_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    # The body is streamed to the blob store in chunks, so large files never sit in memory
+    save_content(resource, request_chunks(), request.mimetype or 'application/octet-stream')
+    db.session.commit()
+    return jsonify({'message': 'Content saved', 'content_size': resource.content_size}), 200
+
 @resources_bp.route('/<int:id>', methods=['DELETE'])
 @login_required
 def delete_resource(id):
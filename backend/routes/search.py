@@ -0,0 +1,38 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from search_index import SEARCH_KINDS, highlighted, search, search_terms, visible_to
+
+search_bp = Blueprint('search', __name__)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+# Ranked results are paged by offset; deep pages mean the query should be narrower
+MAX_OFFSET = 1000
+
+@search_bp.route('/', methods=['GET'], strict_slashes=False)
+@login_required
+def search_all():
+    terms = search_terms(request.args.get('q', ''))
+    if not terms:
+        return jsonify({'error': 'q is required'}), 400
+
+    kinds = [k for k in request.args.get('types', ','.join(SEARCH_KINDS)).split(',') if k]
+    unknown = set(kinds) - set(SEARCH_KINDS)
+    if unknown or not kinds:
+        return jsonify({'error': f"types must be among: {', '.join(SEARCH_KINDS)}"}), 400
+
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    offset = max(0, min(request.args.get('offset', 0, type=int), MAX_OFFSET))
+
+    rows = search(terms, visible_to(current_user), kinds, limit + 1, offset)
+    return jsonify({
+        'items': [{
+            'type': row.kind,
+            'id': row.ref_id,
+            'title': highlighted(row.title),
+            'snippet': highlighted(row.snippet),
+            'score': round(row.score, 4)
+        } for row in rows[:limit]],
+        'next_offset': offset + limit if len(rows) > limit else None,
+        'limit': limit
+    })
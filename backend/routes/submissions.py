@@ -1,7 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from models import Submission, Assignment, Class
+from models import Submission, Assignment, GradingQueueItem
 from extensions import db
+import grading_queue
+from blob_store import content_response, is_text, preview, read_text, request_chunks, save_content, save_text
+from pagination import paginate, paginated_response
+from sqlalchemy.orm import joinedload
+from datetime import datetime
 
 submissions_bp = Blueprint('submissions', __name__)
 
@@ -11,21 +16,41 @@ def submit_assignment():
     if current_user.role != 'student':
         return jsonify({'error': 'Only students can submit'}), 403
 
-    data = request.json
-    assignment_id = data.get('assignment_id')
+    if request.is_json:
+        data = request.json
+        assignment_id = data.get('assignment_id')
+    else:
+        # Any other body (e.g. a file) is the content itself, streamed to the blob store
+        data = None
+        assignment_id = request.args.get('assignment_id', type=int)
     
     # Check if assignment exists
     assignment = Assignment.query.get_or_404(assignment_id)
-    
-    submission = Submission(
-        assignment_id=assignment_id,
-        student_id=current_user.id,
-        content=data.get('content'),
-        status='submitted'
-    )
-    db.session.add(submission)
+
+    # Submissions are unique per (assignment, student); resubmitting replaces the content
+    submission = Submission.query.filter_by(assignment_id=assignment_id, student_id=current_user.id).first()
+    created = submission is None
+    if submission:
+        if submission.status == 'graded':
+            return jsonify({'error': 'Assignment already graded'}), 400
+        submission.submitted_at = datetime.utcnow()
+    else:
+        submission = Submission(
+            assignment_id=assignment_id,
+            student_id=current_user.id,
+            status='submitted'
+        )
+        db.session.add(submission)
+
+    if data is not None:
+        save_text(submission, data.get('content'))
+    else:
+        save_content(submission, request_chunks(), request.mimetype or 'application/octet-stream')
+    grading_queue.enqueue(submission, assignment, current_user.name)
     db.session.commit()
-    return jsonify({'message': 'Assignment submitted', 'id': submission.id}), 201
+    if created:
+        return jsonify({'message': 'Assignment submitted', 'id': submission.id}), 201
+    return jsonify({'message': 'Submission updated', 'id': submission.id}), 200
 
 @submissions_bp.route('/assignment/<int:assignment_id>', methods=['GET'])
 @login_required
@@ -38,35 +63,49 @@ def get_submissions(assignment_id):
     if assignment.course.teacher_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
 
-    submissions = Submission.query.filter_by(assignment_id=assignment_id).all()
-    return jsonify([{
+    query = Submission.query.filter_by(assignment_id=assignment_id).options(joinedload(Submission.student))
+    if request.args.get('status'):
+        query = query.filter(Submission.status == request.args['status'])
+
+    page = paginate(
+        query,
+        sort_columns={'submitted_at': Submission.submitted_at},
+        default_sort='submitted_at',
+        id_column=Submission.id
+    )
+    return paginated_response([{
         'id': s.id,
         'student_name': s.student.name,
-        'content': s.content,
+        'preview': preview(s),
+        'content_size': s.content_size,
         'submitted_at': s.submitted_at.isoformat(),
         'grade': s.grade,
         'status': s.status
-    } for s in submissions])
+    } for s in page.rows], page)
+
+def can_view(submission):
+    # Teacher of the class OR Student who submitted
+    if current_user.role == 'teacher':
+        return submission.assignment.course.teacher_id == current_user.id
+    if current_user.role == 'student':
+        return submission.student_id == current_user.id
+    return False
 
 @submissions_bp.route('/<int:id>', methods=['GET'])
 @login_required
 def get_submission(id):
     submission = Submission.query.get_or_404(id)
-    
-    # Authorization: Teacher of the class OR Student who submitted
-    if current_user.role == 'teacher':
-        if submission.assignment.course.teacher_id != current_user.id:
-            return jsonify({'error': 'Unauthorized'}), 403
-    elif current_user.role == 'student':
-        if submission.student_id != current_user.id:
-            return jsonify({'error': 'Unauthorized'}), 403
-    else:
+    if not can_view(submission):
         return jsonify({'error': 'Unauthorized'}), 403
 
+    # Text is inlined for the detail view; files are fetched from /content
+    inline = submission.content_sha256 is None or is_text(submission.content_type)
     return jsonify({
         'id': submission.id,
         'student_name': submission.student.name,
-        'content': submission.content,
+        'content': read_text(submission) if inline else None,
+        'content_type': submission.content_type,
+        'content_size': submission.content_size,
         'submitted_at': submission.submitted_at.isoformat(),
         'grade': submission.grade,
         'feedback': submission.feedback,
@@ -75,6 +114,15 @@ def get_submission(id):
         'assignment_description': submission.assignment.description
     })
 
+@submissions_bp.route('/<int:id>/content', methods=['GET'])
+@login_required
+def get_submission_content(id):
+    submission = Submission.query.get_or_404(id)
+    if not can_view(submission):
+        return jsonify({'error': 'Unauthorized'}), 403
+    # Supports Range requests, so large files can be fetched in parts or resumed
+    return content_response(submission, download_name=f'submission-{submission.id}')
+
 @submissions_bp.route('/<int:id>/grade', methods=['POST'])
 @login_required
 def grade_submission(id):
@@ -89,6 +137,7 @@ def grade_submission(id):
     submission.grade = data.get('grade')
     submission.feedback = data.get('feedback')
     submission.status = 'graded'
+    grading_queue.dequeue([submission.id])
     
     db.session.commit()
     return jsonify({'message': 'Grade saved'}), 200
@@ -99,16 +148,21 @@ def get_pending_submissions():
     if current_user.role != 'teacher':
         return jsonify({'error': 'Unauthorized'}), 403
         
-    # Join Submission with Assignment and Class to filter by teacher
-    submissions = Submission.query.join(Assignment).join(Class).filter(
-        Class.teacher_id == current_user.id,
-        Submission.status != 'graded'
-    ).all()
-    
-    return jsonify([{
-        'id': s.id,
-        'student_name': s.student.name,
-        'assignment_title': s.assignment.title,
-        'submitted_at': s.submitted_at.isoformat(),
-        'status': s.status
-    } for s in submissions])
+    # Materialized queue (see grading_queue.py): one indexed range scan, no joins
+    query = GradingQueueItem.query.filter_by(teacher_id=current_user.id)
+    if request.args.get('assignment_id'):
+        query = query.filter(GradingQueueItem.assignment_id == request.args.get('assignment_id', type=int))
+
+    page = paginate(
+        query,
+        sort_columns={'submitted_at': GradingQueueItem.submitted_at},
+        default_sort='submitted_at',
+        id_column=GradingQueueItem.submission_id
+    )
+    return paginated_response([{
+        'id': item.submission_id,
+        'student_name': item.student_name,
+        'assignment_title': item.assignment_title,
+        'submitted_at': item.submitted_at.isoformat(),
+        'status': item.status
+    } for item in page.rows], page)
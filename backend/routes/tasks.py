@@ -0,0 +1,35 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from models import Task
+from pagination import paginate, paginated_response
+from tasks import serialize_task
+
+tasks_bp = Blueprint('tasks', __name__)
+
+@tasks_bp.route('/', methods=['GET'])
+@login_required
+def get_tasks():
+    # Admins see every task; everyone else the ones their requests queued
+    query = Task.query
+    if current_user.role != 'admin':
+        query = query.filter_by(created_by=current_user.id)
+    if request.args.get('status'):
+        query = query.filter_by(status=request.args['status'])
+    if request.args.get('name'):
+        query = query.filter_by(name=request.args['name'])
+
+    page = paginate(
+        query,
+        sort_columns={'created_at': Task.created_at},
+        default_sort='-created_at',
+        id_column=Task.id
+    )
+    return paginated_response([serialize_task(t) for t in page.rows], page)
+
+@tasks_bp.route('/<int:task_id>', methods=['GET'])
+@login_required
+def get_task(task_id):
+    task = Task.query.get_or_404(task_id)
+    if current_user.role != 'admin' and task.created_by != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(serialize_task(task))
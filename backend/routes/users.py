@@ -2,7 +2,12 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import User
 from extensions import db
-from werkzeug.security import generate_password_hash
+from pagination import paginate, paginated_response
+from enrollments import enroll_by_class_name, filter_by_enrollment
+from credentials import hash_password, hash_pin, is_valid_pin
+from http_cache import etag_cached
+from tasks import enqueue, serialize_task
+import deletions
 
 users_bp = Blueprint('users', __name__)
 
@@ -12,25 +17,38 @@ def get_users():
     if current_user.role != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
         
-    users = User.query.all()
-    return jsonify([{
+    query = User.query
+    if request.args.get('role'):
+        query = query.filter_by(role=request.args['role'])
+    if request.args.get('class_id') or request.args.get('class_name'):
+        query = filter_by_enrollment(query, request.args.get('class_id', type=int), request.args.get('class_name'))
+
+    page = paginate(
+        query,
+        sort_columns={'created_at': User.created_at, 'name': User.name, 'email': User.email},
+        default_sort='-created_at',
+        id_column=User.id
+    )
+    return paginated_response([{
         'id': u.id,
         'name': u.name,
         'email': u.email,
         'role': u.role,
         'status': 'active' # Placeholder
-    } for u in users])
+    } for u in page.rows], page)
 
 @users_bp.route('/public', methods=['GET'])
+@etag_cached(tables=('user', 'enrollment', 'class'), public=True)
 def get_public_users():
     role = request.args.get('role')
     class_name = request.args.get('class_name')
+    class_id = request.args.get('class_id', type=int)
     
     query = User.query
     if role:
         query = query.filter_by(role=role)
-    if class_name:
-        query = query.filter_by(class_name=class_name)
+    if class_id or class_name:
+        query = filter_by_enrollment(query, class_id, class_name)
         
     users = query.all()
     return jsonify([{
@@ -49,16 +67,19 @@ def create_user():
     data = request.json
     if User.query.filter_by(email=data['email']).first():
         return jsonify({'error': 'Email already exists'}), 400
+    if data.get('pin') and not is_valid_pin(data['pin']):
+        return jsonify({'error': 'PIN must be 4 digits'}), 400
         
     user = User(
         name=data['name'],
         email=data['email'],
-        password_hash=generate_password_hash(data['password']),
+        password_hash=hash_password(data['password']),
         role=data['role'],
-        pin=data.get('pin'),
+        pin_hash=hash_pin(data['pin']) if data.get('pin') else None,
         class_name=data.get('class_name')
     )
     db.session.add(user)
+    enroll_by_class_name(user)
     db.session.commit()
     return jsonify({'message': 'User created', 'id': user.id}), 201
 
@@ -71,7 +92,9 @@ def delete_user(id):
     user = User.query.get_or_404(id)
     if user.id == current_user.id:
         return jsonify({'error': 'Cannot delete yourself'}), 400
-        
-    db.session.delete(user)
+
+    # A teacher takes their classes, submissions and resources along: a worker deletes them
+    task = enqueue(deletions.delete_user, {'user_id': user.id}, key=f'delete_user:{user.id}',
+                   created_by=current_user.id)
     db.session.commit()
-    return jsonify({'message': 'User deleted'}), 200
+    return jsonify({'message': 'User deletion queued', 'task': serialize_task(task)}), 202
@@ -0,0 +1,208 @@
+import contextlib
+import html
+import os
+import re
+from collections import defaultdict
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, column, delete, event, func, insert, inspect, literal_column, null, or_, select, table, text
+from sqlalchemy.orm import Session, object_session
+from blob_store import blob_store, is_text
+from enrollments import enrolled_class_ids
+from extensions import db
+from models import Assignment, Class, Resource, SearchDocument, Submission
+
+SEARCH_KINDS = ('resource', 'assignment', 'submission')
+# Longer bodies are indexed by their beginning only
+MAX_BODY_CHARS = int(os.environ.get('SEARCH_MAX_BODY_CHARS', 100000))
+MAX_TERMS = 8
+CHUNK = 500
+# Highlight markers that don't occur in text; swapped for <mark> once the rest is HTML-escaped
+MARK_START, MARK_END = '\x02', '\x03'
+
+_documents = SearchDocument.__table__
+_fts = table('search_document_fts', column('rowid'))
+
+
+def _source_query(kind):
+    """(id, title, content, content_sha256, content_type, teacher_id, student_id, class_id) rows for `kind`."""
+    if kind == 'resource':
+        return select(
+            Resource.id, Resource.title, Resource.content, Resource.content_sha256, Resource.content_type,
+            Resource.teacher_id, null().label('student_id'), null().label('class_id')
+        ), Resource.id
+    if kind == 'assignment':
+        return select(
+            Assignment.id, Assignment.title, Assignment.description.label('content'),
+            null().label('content_sha256'), null().label('content_type'),
+            Class.teacher_id, null().label('student_id'), Assignment.class_id
+        ).join(Class, Assignment.class_id == Class.id), Assignment.id
+    return select(
+        Submission.id, Assignment.title, Submission.content, Submission.content_sha256, Submission.content_type,
+        Class.teacher_id, Submission.student_id, Assignment.class_id
+    ).join(Assignment, Submission.assignment_id == Assignment.id).join(
+        Class, Assignment.class_id == Class.id
+    ), Submission.id
+
+
+def body_text(row):
+    if row.content_sha256 is None:
+        body = row.content
+    elif is_text(row.content_type):
+        with contextlib.closing(blob_store().open(row.content_sha256)) as f:
+            body = f.read(MAX_BODY_CHARS * 4).decode('utf-8', 'ignore')
+    else:
+        return None
+    return body[:MAX_BODY_CHARS] if body else None
+
+
+def reindex(connection, kind, ids):
+    """Rewrite the search documents of `kind` rows `ids`; rows that no longer exist lose theirs."""
+    query, id_column = _source_query(kind)
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        connection.execute(delete(_documents).where(_documents.c.kind == kind, _documents.c.ref_id.in_(chunk)))
+        documents = [{
+            'kind': kind, 'ref_id': row.id, 'title': row.title, 'body': body_text(row),
+            'teacher_id': row.teacher_id, 'student_id': row.student_id, 'class_id': row.class_id
+        } for row in connection.execute(query.where(id_column.in_(chunk)))]
+        if documents:
+            connection.execute(insert(_documents), documents)
+
+
+def index_rows(kind, ids):
+    """Index rows written with bulk statements, which the flush hooks below don't see."""
+    reindex(db.session.connection(), kind, ids)
+
+
+def search_terms(q):
+    return re.findall(r'\w+', q.lower())[:MAX_TERMS]
+
+
+def visible_to(user):
+    """Which documents `user` may find: what the list endpoints would show them."""
+    if user.role == 'teacher':
+        return SearchDocument.teacher_id == user.id
+    if user.role == 'student':
+        return or_(
+            SearchDocument.kind == 'resource',
+            and_(SearchDocument.kind == 'assignment', SearchDocument.class_id.in_(enrolled_class_ids(user.id))),
+            and_(SearchDocument.kind == 'submission', SearchDocument.student_id == user.id)
+        )
+    return SearchDocument.kind == 'resource'
+
+
+def search(terms, scope, kinds, limit, offset):
+    """Best matches first, with every term matched as a prefix; title and snippet carry highlight markers."""
+    conditions = [scope, SearchDocument.kind.in_(kinds)]
+    if db.engine.dialect.name == 'postgresql':
+        query = func.to_tsquery('english', ' & '.join(f'{t}:*' for t in terms))
+        vector = literal_column('search_document.search_vector')
+        rank = func.ts_rank_cd(vector, query)
+        page = select(
+            SearchDocument.id, SearchDocument.kind, SearchDocument.ref_id, SearchDocument.title,
+            SearchDocument.body, rank.label('score')
+        ).where(vector.op('@@')(query), *conditions).order_by(
+            rank.desc(), SearchDocument.id
+        ).limit(limit).offset(offset).subquery()
+        # ts_headline re-parses the text, so it only runs for the page being returned
+        marks = f'StartSel="{MARK_START}", StopSel="{MARK_END}"'
+        title_options = f'{marks}, HighlightAll=true'
+        snippet_options = f'{marks}, MaxFragments=2, MaxWords=24, MinWords=8, FragmentDelimiter=" … "'
+        statement = select(
+            page.c.kind, page.c.ref_id,
+            func.ts_headline('english', func.coalesce(page.c.title, ''), query, title_options).label('title'),
+            func.ts_headline('english', func.coalesce(page.c.body, ''), query, snippet_options).label('snippet'),
+            page.c.score
+        ).order_by(page.c.score.desc(), page.c.id)
+    else:
+        fts = literal_column('search_document_fts')
+        rank = func.bm25(fts, 10.0, 1.0)  # Title matches count ten times a body match; lower is better
+        statement = select(
+            SearchDocument.kind, SearchDocument.ref_id,
+            func.highlight(fts, 0, MARK_START, MARK_END).label('title'),
+            func.snippet(fts, 1, MARK_START, MARK_END, ' … ', 24).label('snippet'),
+            (-rank).label('score')
+        ).select_from(_fts.join(SearchDocument, SearchDocument.id == _fts.c.rowid)).where(
+            fts.op('MATCH')(' '.join(f'"{t}"*' for t in terms)), *conditions
+        ).order_by(rank, SearchDocument.id).limit(limit).offset(offset)
+    return db.session.execute(statement).all()
+
+
+def highlighted(text):
+    return html.escape(text or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+# Unit-of-work writes are noted per row and reindexed once per flush, in the flush's transaction
+WATCHED = {
+    Resource: ('resource', ('title', 'content', 'content_sha256', 'teacher_id')),
+    Assignment: ('assignment', ('title', 'description', 'class_id')),
+    Submission: ('submission', ('content', 'content_sha256', 'assignment_id', 'student_id')),
+}
+
+
+def _note(target, kind):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('search_dirty', set()).add((kind, target.id))
+
+
+def _note_insert_or_delete(mapper, connection, target):
+    _note(target, WATCHED[mapper.class_][0])
+
+
+def _note_update(mapper, connection, target):
+    kind, fields = WATCHED[mapper.class_]
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in fields):
+        _note(target, kind)
+        if kind == 'assignment':
+            # Submission documents carry their assignment's title and class
+            _note(target, 'assignment_submissions')
+
+
+for _model in WATCHED:
+    event.listen(_model, 'after_insert', _note_insert_or_delete)
+    event.listen(_model, 'after_delete', _note_insert_or_delete)
+    event.listen(_model, 'after_update', _note_update)
+
+
+@event.listens_for(Session, 'after_flush')
+def _reindex_written_rows(session, flush_context):
+    dirty = session.info.pop('search_dirty', None)
+    if not dirty:
+        return
+    connection = session.connection()
+    by_kind = defaultdict(set)
+    for kind, ref_id in dirty:
+        by_kind[kind].add(ref_id)
+    assignment_ids = by_kind.pop('assignment_submissions', None)
+    if assignment_ids:
+        by_kind['submission'].update(connection.execute(
+            select(Submission.id).where(Submission.assignment_id.in_(assignment_ids))
+        ).scalars())
+    for kind, ids in by_kind.items():
+        reindex(connection, kind, ids)
+
+
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+
+
+@search_cli.command('rebuild')
+@click.option('--kind', type=click.Choice(SEARCH_KINDS), multiple=True, help='Only these kinds (default: all).')
+def rebuild_command(kind):
+    """Reindex every resource, assignment and submission from scratch."""
+    for name in kind or SEARCH_KINDS:
+        query, id_column = _source_query(name)
+        ids = db.session.execute(select(id_column).order_by(id_column)).scalars().all()
+        db.session.execute(delete(_documents).where(_documents.c.kind == name))
+        for start in range(0, len(ids), CHUNK):
+            reindex(db.session.connection(), name, ids[start:start + CHUNK])
+            db.session.commit()
+        db.session.commit()
+        click.echo(f'{name}: {len(ids)} indexed')
+    if db.engine.dialect.name == 'sqlite':
+        # Merge the FTS segments written batch by batch
+        db.session.execute(text("INSERT INTO search_document_fts(search_document_fts) VALUES ('optimize')"))
+        db.session.commit()
@@ -1,15 +1,16 @@
 from app import create_app
 from extensions import db
-from models import User, Class, Assignment, Resource
+from models import User, Class, Enrollment, Assignment, Resource
 from werkzeug.security import generate_password_hash
+from credentials import hash_pin
 from datetime import datetime, timedelta
 
 app = create_app()
 
 with app.app_context():
     # Clear existing data
-    db.drop_all()
-    db.create_all()
+    db.drop_all(bind_key=None)  # Primary only; replicas follow it
+    db.create_all(bind_key=None)
 
     # Create Teachers
     teacher1 = User(
@@ -17,7 +18,7 @@ with app.app_context():
         email='johnson@school.org',
         password_hash=generate_password_hash('password'),
         role='teacher',
-        pin='1234'
+        pin_hash=hash_pin('1234')
     )
     
     teacher2 = User(
@@ -25,7 +26,7 @@ with app.app_context():
         email='garcia@school.org',
         password_hash=generate_password_hash('password'),
         role='teacher',
-        pin='1234'
+        pin_hash=hash_pin('1234')
     )
     
     teacher3 = User(
@@ -33,7 +34,7 @@ with app.app_context():
         email='thompson@school.org',
         password_hash=generate_password_hash('password'),
         role='teacher',
-        pin='1234'
+        pin_hash=hash_pin('1234')
     )
 
     # Create Students
@@ -42,7 +43,7 @@ with app.app_context():
         email='emma@school.org',
         password_hash=generate_password_hash('password'),
         role='student',
-        pin='1234',
+        pin_hash=hash_pin('1234'),
         class_name='Grade 5A'
     )
     
@@ -51,7 +52,7 @@ with app.app_context():
         email='james@school.org',
         password_hash=generate_password_hash('password'),
         role='student',
-        pin='1234',
+        pin_hash=hash_pin('1234'),
         class_name='Grade 5A'
     )
     
@@ -60,7 +61,7 @@ with app.app_context():
         email='sofia@school.org',
         password_hash=generate_password_hash('password'),
         role='student',
-        pin='1234',
+        pin_hash=hash_pin('1234'),
         class_name='Grade 5B'
     )
     
@@ -70,7 +71,7 @@ with app.app_context():
         email='admin@school.org',
         password_hash=generate_password_hash('password'),
         role='admin',
-        pin='1234'
+        pin_hash=hash_pin('1234')
     )
     
     admin2 = User(
@@ -78,7 +79,7 @@ with app.app_context():
         email='roberts@school.org',
         password_hash=generate_password_hash('password'),
         role='admin',
-        pin='1234'
+        pin_hash=hash_pin('1234')
     )
 
     db.session.add_all([teacher1, teacher2, teacher3, student1, student2, student3, admin1, admin2])
@@ -90,6 +91,14 @@ with app.app_context():
     db.session.add_all([class_5a, class_5b])
     db.session.commit()
 
+    # Enroll Students
+    db.session.add_all([
+        Enrollment(class_id=class_5a.id, student_id=student1.id),
+        Enrollment(class_id=class_5a.id, student_id=student2.id),
+        Enrollment(class_id=class_5b.id, student_id=student3.id)
+    ])
+    db.session.commit()
+
     # Create Assignments
     assignment1 = Assignment(
         title='Write a short story about your summer vacation',
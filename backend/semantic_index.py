@@ -0,0 +1,451 @@
+import contextlib
+import hashlib
+import importlib
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from array import array
+from collections import Counter, namedtuple
+from functools import lru_cache
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect, select, tuple_
+from sqlalchemy.orm import Session, object_session
+from enrollments import enrolled_class_ids
+from extensions import db
+from models import Assignment, Resource, SearchDocument
+from search_index import visible_to
+from tasks import schedule, task
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: refreshes are only serialized within a process
+    fcntl = None
+
+# What gets embedded: the search index's text of these kinds (see search_index.py)
+SEMANTIC_KINDS = ('resource', 'assignment')
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+EMBED_BATCH = 256
+HASHING_DIM = 256
+SNIPPET_CHARS = 600
+SEMANTIC_TOP_K = int(os.environ.get('SEMANTIC_TOP_K', 4))
+# Chunks scoring below this are too loosely related to be worth prompt space
+SEMANTIC_MIN_SCORE = float(os.environ.get('SEMANTIC_MIN_SCORE', 0.2))
+# A teacher's request this close to one of their resources gets the resource back instead of a model call
+SEMANTIC_DUPLICATE_THRESHOLD = float(os.environ.get('SEMANTIC_DUPLICATE_THRESHOLD', 0.9))
+# Writes are folded into one incremental refresh this many seconds after the first
+SEMANTIC_REFRESH_DELAY = float(os.environ.get('SEMANTIC_REFRESH_DELAY', 30))
+SEMANTIC_RELOAD_INTERVAL = 5
+REFRESH_KEY = 'semantic_refresh'
+
+Hit = namedtuple('Hit', ['kind', 'ref_id', 'title', 'snippet', 'score'])
+
+WORD = re.compile(r'\w+')
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the this to was were will with '
+    'you your i me my we our they them their he she his her do does did not no can could should would'.split()
+)
+
+
+def _stem(word):
+    # Enough folding for "fractions"/"fraction" and "adding"/"add" to share features
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=50000)
+def _feature_slot(feature, dim):
+    h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+    return h % dim, 1.0 if h >> 63 else -1.0
+
+
+def hashing_embedder(texts, dim=HASHING_DIM):
+    """Local CPU embedding: signed feature hashing of word unigrams and bigrams, log-scaled counts.
+
+    It matches shared vocabulary rather than meaning; point SEMANTIC_EMBEDDER at
+    a model-backed function for paraphrase-level matches.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = [_stem(w) for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+        features = Counter(words)
+        features.update(f'{a} {b}' for a, b in zip(words, words[1:]))
+        for feature, count in features.items():
+            slot, sign = _feature_slot(feature, dim)
+            vectors[row, slot] += sign * (1 + math.log(count))
+    return vectors
+
+
+def stub_embedder(texts, dim=64):
+    """Deterministic stand-in for tests: equal texts get equal vectors, different texts near-orthogonal ones."""
+    vectors = np.empty((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        seed = int.from_bytes(hashlib.sha256(' '.join(text.lower().split()).encode()).digest()[:8], 'little')
+        vectors[row] = np.random.default_rng(seed).standard_normal(dim)
+    return vectors
+
+
+EMBEDDERS = {'hashing': hashing_embedder, 'stub': stub_embedder}
+
+
+def load_embedder(name):
+    """'hashing', 'stub', or 'package.module:function' taking a list of texts and returning an (n, dim) array."""
+    if name in EMBEDDERS:
+        return EMBEDDERS[name]
+    module, _, attribute = name.partition(':')
+    return getattr(importlib.import_module(module), attribute)
+
+
+def normalized(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def chunk_spans(word_count):
+    """(start, end) word ranges covering a body, overlapping so no passage is cut in half everywhere."""
+    if word_count <= CHUNK_WORDS:
+        return [(0, word_count)]
+    step = CHUNK_WORDS - CHUNK_OVERLAP
+    return [(start, min(start + CHUNK_WORDS, word_count)) for start in range(0, word_count - CHUNK_OVERLAP, step)]
+
+
+def document_digest(title, body):
+    return hashlib.blake2b(f'{title or ""}\0{body or ""}'.encode(), digest_size=16).hexdigest()
+
+
+class VectorStore:
+    """One published generation: unit-length float32 chunk vectors, memory-mapped read-only, plus their metadata.
+
+    Files: vectors.f32 (count x dim, row-major), one .npy per metadata column
+    and manifest.json, which maps each document to its digest and row range.
+    """
+
+    COLUMNS = ('kind', 'ref_id', 'teacher_id', 'class_id', 'start', 'end')
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.embedder = self.manifest['embedder']
+        self.dim = self.manifest['dim']
+        self.count = self.manifest['count']
+        self.documents = self.manifest['documents']
+        if self.count:
+            self.vectors = np.memmap(os.path.join(path, 'vectors.f32'), dtype=np.float32, mode='r',
+                                     shape=(self.count, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        for column in self.COLUMNS:
+            setattr(self, column, np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r'))
+
+    def top(self, query, mask, k):
+        """(row, score) of the best-scoring chunk of each of the `k` best documents among rows where `mask` holds."""
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return []
+        # A narrow scope (one teacher's library) only touches its own rows of the file
+        scores = (self.vectors if len(rows) == self.count else self.vectors[rows]) @ query
+        candidates = min(len(rows), k * 4)
+        best = np.argpartition(-scores, candidates - 1)[:candidates]
+        best = best[np.argsort(-scores[best])]
+        results, seen = [], set()
+        for i in best:
+            row = int(rows[i])
+            document = (int(self.kind[row]), int(self.ref_id[row]))
+            if document not in seen:
+                seen.add(document)
+                results.append((row, float(scores[i])))
+                if len(results) == k:
+                    break
+        return results
+
+
+class SemanticIndex:
+    """The vector store of this app: which generation is current, and how queries are embedded."""
+
+    def __init__(self, directory, embedder_name):
+        self.directory = directory
+        self.embedder_name = embedder_name
+        self.embed = load_embedder(embedder_name)
+        self._lock = threading.Lock()
+        self._store = None
+        self._store_name = None
+        self._checked_at = 0.0
+        self._missing_reported_at = 0.0
+
+    def current_name(self):
+        try:
+            with open(os.path.join(self.directory, 'CURRENT')) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def store(self):
+        """The published generation, re-opened when a refresh has replaced it (checked every few seconds)."""
+        now = time.monotonic()
+        if now - self._checked_at < SEMANTIC_RELOAD_INTERVAL:
+            return self._store
+        with self._lock:
+            if now - self._checked_at >= SEMANTIC_RELOAD_INTERVAL:
+                name = self.current_name()
+                if name != self._store_name:
+                    store = VectorStore(os.path.join(self.directory, name)) if name else None
+                    if store is not None and store.embedder != self.embedder_name:
+                        store = None  # Built by another embedder; a full refresh replaces it
+                    self._store, self._store_name = store, name
+                self._checked_at = now
+            return self._store
+
+    def embed_query(self, text):
+        return normalized(self.embed([text]))[0]
+
+
+def semantic_index():
+    return current_app.extensions['semantic_index']
+
+
+def init_semantic_index(app):
+    directory = os.environ.get('SEMANTIC_INDEX_DIR') or os.path.join(app.instance_path, 'vectors')
+    index = SemanticIndex(directory, os.environ.get('SEMANTIC_EMBEDDER', 'hashing'))
+    index.store()  # Memory-map the published generation now rather than on the first chat
+    app.extensions['semantic_index'] = index
+
+
+def scope_mask(store, user):
+    """Rows `user` may be shown, as in search_index.visible_to (which re-checks the hits against current rows)."""
+    resources = store.kind == SEMANTIC_KINDS.index('resource')
+    if user.role == 'teacher':
+        return store.teacher_id == user.id
+    if user.role == 'student':
+        class_ids = np.fromiter((class_id for (class_id,) in enrolled_class_ids(user.id)),
+                                dtype=store.class_id.dtype)
+        assignments = (store.kind == SEMANTIC_KINDS.index('assignment')) & np.isin(store.class_id, class_ids)
+        return resources | assignments
+    return resources
+
+
+def retrieve(text, user, k=SEMANTIC_TOP_K, min_score=SEMANTIC_MIN_SCORE, kinds=SEMANTIC_KINDS):
+    """The `k` library passages closest to `text` that `user` may see, best first."""
+    index = semantic_index()
+    store = index.store()
+    if store is None:
+        _report_missing(index)
+        return []
+    if not store.count or not text:
+        return []
+    mask = scope_mask(store, user)
+    if set(kinds) != set(SEMANTIC_KINDS):
+        mask = mask & np.isin(store.kind, [SEMANTIC_KINDS.index(kind) for kind in kinds])
+    found = [(row, score) for row, score in store.top(index.embed_query(text), mask, k) if score >= min_score]
+    if not found:
+        return []
+    keys = [(SEMANTIC_KINDS[store.kind[row]], int(store.ref_id[row])) for row, _ in found]
+    documents = {(d.kind, d.ref_id): d for d in db.session.execute(
+        select(SearchDocument.kind, SearchDocument.ref_id, SearchDocument.title, SearchDocument.body)
+        .where(tuple_(SearchDocument.kind, SearchDocument.ref_id).in_(keys), visible_to(user))
+    )}
+    hits = []
+    for (row, score), key in zip(found, keys):
+        document = documents.get(key)
+        if document is None:
+            continue  # Deleted or moved out of scope since the last refresh
+        words = (document.body or '').split()
+        snippet = ' '.join(words[int(store.start[row]):int(store.end[row])])[:SNIPPET_CHARS]
+        hits.append(Hit(key[0], key[1], document.title, snippet, round(score, 4)))
+    return hits
+
+
+def find_duplicate(text, user):
+    """The teacher's own resource that `text` nearly repeats, if any."""
+    if user.role != 'teacher':
+        return None
+    hits = retrieve(text, user, k=1, min_score=SEMANTIC_DUPLICATE_THRESHOLD, kinds=('resource',))
+    return hits[0] if hits else None
+
+
+def context_block(hits):
+    lines = ["Relevant material from the school's own library (build on it rather than repeating it):"]
+    for n, hit in enumerate(hits, 1):
+        lines.append(f'[{n}] {hit.kind.title()} "{hit.title}": {hit.snippet}')
+    return '\n'.join(lines)
+
+
+def _report_missing(index):
+    # No index yet (fresh deploy, new volume): build one in the background, at most once a minute per process.
+    # Queued in its own short transaction, not the caller's, which would then hold the write lock through
+    # the model call; callers commit their own writes first so this doesn't wait on them (SQLite)
+    now = time.monotonic()
+    if now - index._missing_reported_at < 60:
+        return
+    index._missing_reported_at = now
+    with db.engine.begin() as connection:
+        schedule(connection, refresh_task, REFRESH_KEY)
+
+
+@contextlib.contextmanager
+def _refresh_lock(directory):
+    with open(os.path.join(directory, '.lock'), 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def refresh(full=False):
+    """Write and publish a new generation; unchanged documents keep their vectors unless `full`.
+
+    Returns counts of documents, chunks and chunks embedded.
+    """
+    index = semantic_index()
+    os.makedirs(index.directory, exist_ok=True)
+    with _refresh_lock(index.directory):
+        previous_name = index.current_name()
+        previous = VectorStore(os.path.join(index.directory, previous_name)) if previous_name else None
+        if previous is not None and (full or previous.embedder != index.embedder_name
+                                     or previous.manifest.get('chunking') != [CHUNK_WORDS, CHUNK_OVERLAP]):
+            previous = None
+        name = f'gen-{int(time.time() * 1000)}-{os.getpid()}'
+        path = os.path.join(index.directory, name)
+        os.makedirs(path)
+        columns = {column: array('i') for column in VectorStore.COLUMNS}
+        documents = {}
+        counts = {'documents': 0, 'chunks': 0, 'embedded': 0}
+        pending = []  # Reused vector blocks and texts to embed, written in document order
+        dim = previous.dim if previous is not None else None
+
+        with open(os.path.join(path, 'vectors.f32'), 'wb') as out:
+            def flush():
+                nonlocal dim
+                texts = [item for block in pending if isinstance(block, list) for item in block]
+                embedded = iter(normalized(index.embed(texts))) if texts else None
+                for block in pending:
+                    vectors = np.stack([next(embedded) for _ in block]) if isinstance(block, list) else block
+                    dim = vectors.shape[1]
+                    out.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                counts['embedded'] += len(texts)
+                pending.clear()
+
+            rows = db.session.execute(
+                select(SearchDocument.kind, SearchDocument.ref_id, SearchDocument.title, SearchDocument.body,
+                       SearchDocument.teacher_id, SearchDocument.class_id)
+                .where(SearchDocument.kind.in_(SEMANTIC_KINDS))
+                .order_by(SearchDocument.kind, SearchDocument.ref_id)
+                .execution_options(yield_per=500)
+            )
+            queued_texts = 0
+            for row in rows:
+                words = (row.body or '').split()
+                if not words and not row.title:
+                    continue
+                key = f'{row.kind}:{row.ref_id}'
+                digest = document_digest(row.title, row.body)
+                spans = chunk_spans(len(words))
+                first_row = counts['chunks']
+                known = previous.documents.get(key) if previous is not None else None
+                if known and known[0] == digest:
+                    pending.append(np.asarray(previous.vectors[known[1]:known[1] + known[2]]))
+                else:
+                    pending.append([f"{row.title or ''}\n{' '.join(words[start:end])}" for start, end in spans])
+                    queued_texts += len(spans)
+                for start, end in spans:
+                    columns['kind'].append(SEMANTIC_KINDS.index(row.kind))
+                    columns['ref_id'].append(row.ref_id)
+                    columns['teacher_id'].append(row.teacher_id if row.teacher_id is not None else -1)
+                    columns['class_id'].append(row.class_id if row.class_id is not None else -1)
+                    columns['start'].append(start)
+                    columns['end'].append(end)
+                documents[key] = [digest, first_row, len(spans)]
+                counts['documents'] += 1
+                counts['chunks'] += len(spans)
+                if queued_texts >= EMBED_BATCH or len(pending) >= EMBED_BATCH:
+                    flush()
+                    queued_texts = 0
+            flush()
+
+        if dim is None:
+            dim = normalized(index.embed(['dimension probe'])).shape[1]
+        for column, values in columns.items():
+            np.save(os.path.join(path, f'{column}.npy'), np.frombuffer(values, dtype=np.int32))
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump({'embedder': index.embedder_name, 'dim': dim, 'count': counts['chunks'],
+                       'chunking': [CHUNK_WORDS, CHUNK_OVERLAP], 'documents': documents, 'built_at': time.time()}, f)
+
+        # Publish atomically; readers that still map the previous generation keep it until they reload
+        with open(os.path.join(index.directory, 'CURRENT.tmp'), 'w') as f:
+            f.write(name)
+        os.replace(os.path.join(index.directory, 'CURRENT.tmp'), os.path.join(index.directory, 'CURRENT'))
+        for entry in os.listdir(index.directory):
+            if entry.startswith('gen-') and entry not in (name, previous_name):
+                shutil.rmtree(os.path.join(index.directory, entry), ignore_errors=True)
+    return counts
+
+
+@task('semantic_refresh', priority=-10)
+def refresh_task():
+    return refresh()
+
+
+# Edits to what gets embedded schedule one debounced refresh, in the writer's transaction.
+# Deletes need no refresh to be safe: retrieve() drops hits whose search document is gone.
+WATCHED = {
+    Resource: ('title', 'content', 'content_sha256', 'teacher_id'),
+    Assignment: ('title', 'description', 'class_id'),
+}
+WATCHED_TABLES = {model.__table__.name for model in WATCHED}
+
+
+def _note(target):
+    session = object_session(target)
+    if session is not None:
+        session.info['semantic_dirty'] = True
+
+
+def _note_insert(mapper, connection, target):
+    _note(target)
+
+
+def _note_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in WATCHED[mapper.class_]):
+        _note(target)
+
+
+for _model in WATCHED:
+    event.listen(_model, 'after_insert', _note_insert)
+    event.listen(_model, 'after_update', _note_update)
+
+
+@event.listens_for(Session, 'after_flush')
+def _schedule_refresh(session, flush_context):
+    if session.info.pop('semantic_dirty', False):
+        schedule(session.connection(), refresh_task, REFRESH_KEY, delay=SEMANTIC_REFRESH_DELAY)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _schedule_refresh_for_bulk_statement(orm_execute_state):
+    if (orm_execute_state.is_insert or orm_execute_state.is_update) and \
+            getattr(orm_execute_state.statement.table, 'name', None) in WATCHED_TABLES:
+        schedule(orm_execute_state.session.connection(), refresh_task, REFRESH_KEY, delay=SEMANTIC_REFRESH_DELAY)
+
+
+semantic_cli = AppGroup('semantic', help='Maintain the vector index behind AI retrieval.')
+
+
+@semantic_cli.command('rebuild')
+@click.option('--full', is_flag=True, help='Re-embed every document instead of only the changed ones.')
+def rebuild_command(full):
+    """Embed the library and publish a new index generation."""
+    started = time.perf_counter()
+    counts = refresh(full=full)
+    click.echo(f"{counts['documents']} documents, {counts['chunks']} chunks "
+               f"({counts['embedded']} embedded) in {time.perf_counter() - started:.1f}s")
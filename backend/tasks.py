@@ -0,0 +1,316 @@
+import contextlib
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Task
+
+# Threads each web worker runs tasks on; 0 leaves them to `flask tasks worker`
+TASK_WORKER_THREADS = int(os.environ.get('TASK_WORKER_THREADS', 2))
+TASK_POLL_INTERVAL = float(os.environ.get('TASK_POLL_INTERVAL', 1))
+# A running task's lease is renewed every quarter of this; once it lapses the task is retried elsewhere
+TASK_LEASE_SECONDS = int(os.environ.get('TASK_LEASE_SECONDS', 120))
+TASK_RETRY_BASE_SECONDS = float(os.environ.get('TASK_RETRY_BASE_SECONDS', 5))
+TASK_RETRY_MAX_SECONDS = float(os.environ.get('TASK_RETRY_MAX_SECONDS', 600))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+logger = logging.getLogger(__name__)
+
+handlers = {}
+# Set when a commit queues a task, so this process's idle workers don't wait out the poll interval
+_wakeup = threading.Event()
+_claim_lock = threading.Lock()
+
+
+def task(name, priority=0, max_attempts=3):
+    """Register a function as the handler for tasks called `name`.
+
+    It runs in an app context with the task's payload as keyword arguments
+    and may return something JSON-serializable, kept as the task's result.
+    Handlers may commit as they go; whatever they leave uncommitted is
+    committed together with the task's completion.
+    """
+    def decorator(fn):
+        fn.task_name = name
+        handlers[name] = {'fn': fn, 'priority': priority, 'max_attempts': max_attempts}
+        return fn
+    return decorator
+
+
+def enqueue(handler, payload=None, key=None, priority=None, created_by=None):
+    """Queue `handler` (a @task function) to run once the caller commits; returns the Task.
+
+    With a `key`, a queued or running task with the same key is returned instead
+    of queuing a second one.
+    """
+    options = handlers[handler.task_name]
+    if key is not None:
+        existing = Task.query.filter(Task.key == key, Task.status.in_(ACTIVE_STATUSES)).first()
+        if existing:
+            return existing
+    queued = Task(
+        name=handler.task_name,
+        payload=json.dumps(payload or {}),
+        key=key,
+        priority=options['priority'] if priority is None else priority,
+        max_attempts=options['max_attempts'],
+        created_by=created_by,
+        run_at=datetime.utcnow()
+    )
+    db.session.add(queued)
+    db.session.info['task_queued'] = True
+    return queued
+
+
+def schedule(connection, handler, key, delay=0):
+    """Queue `handler` with a Core insert on `connection`, for flush hooks that can't use the session.
+
+    A task with the same key that hasn't started yet absorbs the call, so a
+    burst of writes runs the task once, `delay` seconds after the first.
+    """
+    waiting = connection.execute(select(Task.id).where(Task.key == key, Task.status == 'queued').limit(1)).first()
+    if waiting is None:
+        options = handlers[handler.task_name]
+        now = datetime.utcnow()
+        connection.execute(insert(Task).values(
+            name=handler.task_name, payload='{}', key=key, status='queued', priority=options['priority'],
+            attempts=0, max_attempts=options['max_attempts'], run_at=now + timedelta(seconds=delay), created_at=now
+        ))
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop('task_queued', False):
+        _wakeup.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_queued(session):
+    session.info.pop('task_queued', None)
+
+
+def serialize_task(t):
+    return {
+        'id': t.id,
+        'name': t.name,
+        'status': t.status,
+        'priority': t.priority,
+        'attempts': t.attempts,
+        'max_attempts': t.max_attempts,
+        'error': t.error,
+        'result': json.loads(t.result) if t.result else None,
+        'run_at': t.run_at.isoformat() if t.run_at else None,
+        'created_at': t.created_at.isoformat() if t.created_at else None,
+        'started_at': t.started_at.isoformat() if t.started_at else None,
+        'finished_at': t.finished_at.isoformat() if t.finished_at else None
+    }
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter: about base, 2*base, 4*base... seconds, capped."""
+    delay = min(TASK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), TASK_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1)
+
+
+def claim(worker_id):
+    """Mark the most urgent due task as running on `worker_id` and return its id (None if there is none)."""
+    now = datetime.utcnow()
+    ready = select(Task.id).where(Task.status == 'queued', Task.run_at <= now).order_by(
+        Task.priority.desc(), Task.run_at, Task.id
+    ).limit(1)
+    # Idle polls stop at this plain read, so they don't take SQLite's write lock or commit anything
+    due = db.session.execute(ready).scalar()
+    db.session.rollback()
+    if due is None:
+        return None
+    postgres = db.engine.dialect.name == 'postgresql'
+    if postgres:
+        # Workers polling together each skip the rows the others are claiming instead of waiting on them
+        ready = ready.with_for_update(skip_locked=True)
+    statement = update(Task).where(Task.id == ready.scalar_subquery(), Task.status == 'queued').values(
+        status='running', attempts=Task.attempts + 1, locked_by=worker_id, locked_at=now,
+        started_at=func.coalesce(Task.started_at, now)
+    ).returning(Task.id).execution_options(synchronize_session=False)
+    # SQLite has no row locks: the UPDATE runs under the database's single write lock, so
+    # two processes can't claim one row, and this process's threads take turns at it
+    with contextlib.nullcontext() if postgres else _claim_lock:
+        task_id = db.session.execute(statement).scalar()
+        db.session.commit()
+    return task_id
+
+
+def run_task(task_id, worker_id):
+    """Run a claimed task and record how it went; failures are retried with backoff until out of attempts."""
+    claimed = db.session.get(Task, task_id)
+    name, attempts, max_attempts = claimed.name, claimed.attempts, claimed.max_attempts
+    mine = update(Task).where(Task.id == task_id, Task.locked_by == worker_id).execution_options(
+        synchronize_session=False
+    )
+    try:
+        handler = handlers.get(name)
+        if handler is None:
+            raise LookupError(f'No handler registered for task {name!r}')
+        result = handler['fn'](**json.loads(claimed.payload or '{}'))
+        result = json.dumps(result, default=str) if result is not None else None
+    except Exception as e:
+        db.session.rollback()
+        error = f'{type(e).__name__}: {e}'[:2000]
+        now = datetime.utcnow()
+        if attempts < max_attempts:
+            delay = retry_delay(attempts)
+            logger.warning('Task %s (%s) failed on attempt %s/%s, retrying in %.0fs: %s',
+                           task_id, name, attempts, max_attempts, delay, error)
+            values = {'status': 'queued', 'run_at': now + timedelta(seconds=delay)}
+        else:
+            logger.error('Task %s (%s) failed after %s attempts: %s', task_id, name, attempts, error)
+            values = {'status': 'failed', 'finished_at': now}
+        db.session.execute(mine.values(error=error, locked_by=None, locked_at=None, **values))
+    else:
+        db.session.execute(mine.values(status='succeeded', result=result, error=None, locked_by=None,
+                                       locked_at=None, finished_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def renew_leases(worker_id):
+    db.session.execute(update(Task).where(Task.locked_by == worker_id, Task.status == 'running').values(
+        locked_at=datetime.utcnow()
+    ).execution_options(synchronize_session=False))
+
+
+def requeue_expired():
+    """Tasks whose worker stopped renewing its lease (crashed, killed, redeployed) are retried or failed."""
+    now = datetime.utcnow()
+    expired = (Task.status == 'running', Task.locked_at < now - timedelta(seconds=TASK_LEASE_SECONDS))
+    lost = {'locked_by': None, 'locked_at': None, 'error': 'Worker stopped before the task finished'}
+    db.session.execute(update(Task).where(*expired, Task.attempts < Task.max_attempts).values(
+        status='queued', run_at=now, **lost
+    ).execution_options(synchronize_session=False))
+    db.session.execute(update(Task).where(*expired).values(
+        status='failed', finished_at=now, **lost
+    ).execution_options(synchronize_session=False))
+
+
+class Worker:
+    """Threads that claim and run tasks until stopped, plus one that renews their leases."""
+
+    def __init__(self, app, threads):
+        self.app = app
+        self.threads = threads
+        self.id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        targets = [self._run] * self.threads + [self._maintain]
+        for n, target in enumerate(targets):
+            thread = threading.Thread(target=target, name=f'task-worker-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Stop claiming; tasks already running are finished first."""
+        self._stop.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        failures = 0
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    task_id = claim(self.id)
+                    failures = 0
+                except Exception:
+                    # Database down or not migrated yet: log once, then back off until it answers
+                    if not failures:
+                        logger.exception('Claiming a task failed')
+                    failures += 1
+                    db.session.rollback()
+                    db.session.remove()
+                    self._stop.wait(min(TASK_POLL_INTERVAL * 2 ** failures, 60))
+                    continue
+                if task_id is None:
+                    _wakeup.wait(TASK_POLL_INTERVAL)
+                    _wakeup.clear()
+                    continue
+                try:
+                    run_task(task_id, self.id)
+                except Exception:
+                    # Recording the outcome failed; the lease lapses and the task is retried
+                    logger.exception('Task %s could not be completed', task_id)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def _maintain(self):
+        with self.app.app_context():
+            while not self._stop.wait(TASK_LEASE_SECONDS / 4):
+                try:
+                    renew_leases(self.id)
+                    requeue_expired()
+                    db.session.commit()
+                except Exception:
+                    logger.exception('Renewing task leases failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+def init_tasks(app):
+    """Start this web worker's task threads with its first request (not at import, so CLI commands don't)."""
+    if TASK_WORKER_THREADS <= 0:
+        return
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_task_worker():
+        if 'task_worker' in app.extensions:
+            return
+        with lock:
+            if 'task_worker' not in app.extensions:
+                worker = Worker(app, TASK_WORKER_THREADS)
+                worker.start()
+                app.extensions['task_worker'] = worker
+
+
+tasks_cli = AppGroup('tasks', help='Run and maintain background tasks.')
+
+
+@tasks_cli.command('worker')
+@click.option('--threads', type=int, default=4, show_default=True, help='Tasks run at once.')
+def worker_command(threads):
+    """Run tasks until interrupted (SIGINT/SIGTERM finish the running tasks first)."""
+    from flask import current_app
+    worker = Worker(current_app._get_current_object(), threads)
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+    worker.start()
+    click.echo(f'Worker {worker.id} running {threads} threads')
+    stopping.wait()
+    click.echo('Stopping after the running tasks finish')
+    worker.stop()
+
+
+@tasks_cli.command('prune')
+@click.option('--older-than-days', type=int, default=30, show_default=True)
+def prune_command(older_than_days):
+    """Delete finished tasks older than this."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    result = db.session.execute(delete(Task).where(
+        Task.status.in_(('succeeded', 'failed')), Task.finished_at < cutoff
+    ))
+    db.session.commit()
+    click.echo(f'{result.rowcount} finished tasks deleted')
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+# Configuration is read at import time, so it is set before the app modules load
+_tmp = tempfile.mkdtemp(prefix='aarna-tests-')
+os.environ.update({
+    'DATABASE_URL': f'sqlite:///{os.path.join(_tmp, "test.sqlite3")}',
+    'BLOB_STORE_URL': f'file://{os.path.join(_tmp, "blobs")}',
+    'SEMANTIC_INDEX_DIR': os.path.join(_tmp, 'vectors'),
+    'TASK_WORKER_THREADS': '0',
+    'PASSWORD_HASH_WORKERS': '0',
+    'PERF_REQUEST_LOG': '0',
+})
+
+from sqlalchemy import event
+from app import create_app
+from credentials import hash_password, hash_pin
+from extensions import db as _db
+from identity_cache import identity_cache
+from models import User
+
+PIN = '1234'
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        _db.drop_all(bind_key=None)
+        _db.create_all(bind_key=None)
+        # Ids are reused once the tables are recreated
+        identity_cache.clear()
+        yield _db
+        _db.session.remove()
+
+
+@pytest.fixture
+def make_user(db):
+    made = []
+
+    def make_user(role, **fields):
+        made.append(role)
+        fields.setdefault('name', role.title())
+        fields.setdefault('email', f'{role}{len(made)}@example.com')
+        user = User(role=role, password_hash=hash_password('password'), pin_hash=hash_pin(PIN), **fields)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def login(app):
+    def login(user):
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'user_id': user.id, 'pin': PIN})
+        assert response.status_code == 200, response.get_json()
+        return client
+    return login
+
+
+@pytest.fixture
+def count_statements(db):
+    """Context manager collecting the SQL statements run inside it."""
+    @contextmanager
+    def count_statements():
+        statements = []
+        engine = db.engine
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+    return count_statements
+
+
+@pytest.fixture
+def write_lock_free(db):
+    """Callable telling whether another connection could write to the database right now."""
+    def write_lock_free():
+        conn = sqlite3.connect(db.engine.url.database, timeout=0, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('ROLLBACK')
+            return True
+        except sqlite3.OperationalError:
+            return False
+        finally:
+            conn.close()
+    return write_lock_free
@@ -0,0 +1,23 @@
+import logging
+
+from ai_cache import MemoryCache, ResponseCache
+
+
+class BrokenTier:
+    def get(self, key):
+        raise ConnectionError('shared tier down')
+
+    def set(self, key, value):
+        raise ConnectionError('shared tier down')
+
+
+def test_shared_tier_failures_are_logged_and_fall_through(caplog):
+    cache = ResponseCache(MemoryCache(ttl=60, max_entries=10, max_bytes=10000), shared=BrokenTier())
+
+    with caplog.at_level(logging.WARNING, logger='ai_cache'):
+        assert cache.get('key') is None
+        cache.set('key', 'value')
+
+    assert cache.get('key') == 'value'
+    assert cache.stats['shared_errors'] == 2
+    assert [r.exc_info[0] for r in caplog.records] == [ConnectionError, ConnectionError]
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Assignment, Class, Enrollment, Submission
+
+
+def seed_class(db, teacher, student, assignments):
+    course = Class(name='5A', teacher_id=teacher.id)
+    db.session.add(course)
+    db.session.flush()
+    db.session.add(Enrollment(class_id=course.id, student_id=student.id))
+    for n in range(assignments):
+        assignment = Assignment(title=f'Assignment {n}', class_id=course.id,
+                                due_date=datetime.utcnow() + timedelta(days=n))
+        db.session.add(assignment)
+        db.session.flush()
+        if n % 2:
+            db.session.add(Submission(assignment_id=assignment.id, student_id=student.id,
+                                      content='answer', status='graded', grade='A'))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('role', ['student', 'teacher'])
+def test_listing_statement_count_does_not_grow_with_rows(db, make_user, login, count_statements, role):
+    teacher = make_user('teacher')
+    student = make_user('student', class_name='5A')
+    client = login(teacher if role == 'teacher' else student)
+
+    counts = []
+    for assignments in (3, 30):
+        db.session.query(Submission).delete()
+        db.session.query(Assignment).delete()
+        db.session.query(Enrollment).delete()
+        db.session.query(Class).delete()
+        db.session.commit()
+        seed_class(db, teacher, student, assignments)
+        with count_statements() as statements:
+            response = client.get('/api/assignments/?limit=100')
+        assert response.status_code == 200
+        assert len(response.get_json()['items']) == assignments
+        counts.append(len(statements))
+
+    # The user comes from the identity cache; the listing is its COUNT and one joined SELECT
+    assert counts == [2, 2], counts
+
+
+def test_student_sees_own_submission_without_extra_queries(db, make_user, login, count_statements):
+    teacher = make_user('teacher')
+    student = make_user('student', class_name='5A')
+    seed_class(db, teacher, student, 4)
+    client = login(student)
+
+    with count_statements() as statements:
+        items = client.get('/api/assignments/?limit=100').get_json()['items']
+
+    assert {(i['title'], i['submission_status'], i['grade']) for i in items} == {
+        ('Assignment 0', 'pending', None), ('Assignment 1', 'graded', 'A'),
+        ('Assignment 2', 'pending', None), ('Assignment 3', 'graded', 'A'),
+    }
+    assert not [s for s in statements if s.lstrip().upper().startswith('SELECT') and 'FROM class' in s
+                and 'JOIN' not in s.upper()]
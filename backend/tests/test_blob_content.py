@@ -0,0 +1,72 @@
+import pytest
+
+from models import Assignment, Class, Enrollment, Submission
+
+SCRIPT = b'<html><script>fetch("/api/users/")</script></html>'
+
+
+@pytest.fixture
+def classroom(db, make_user, login):
+    teacher = make_user('teacher')
+    student = make_user('student', class_name='5A')
+    course = Class(name='5A', teacher_id=teacher.id)
+    db.session.add(course)
+    db.session.flush()
+    db.session.add(Enrollment(class_id=course.id, student_id=student.id))
+    assignment = Assignment(title='Essay', class_id=course.id)
+    db.session.add(assignment)
+    db.session.commit()
+    return login(teacher), login(student), assignment.id
+
+
+def upload(student, assignment_id, body, content_type):
+    response = student.post(f'/api/submissions/?assignment_id={assignment_id}', data=body, content_type=content_type)
+    assert response.status_code in (200, 201), response.get_json()
+    return response.get_json()['id']
+
+
+@pytest.mark.parametrize('content_type', ['text/html', 'image/svg+xml', 'application/xhtml+xml'])
+def test_scriptable_uploads_are_served_as_opaque_downloads(classroom, content_type):
+    teacher, student, assignment_id = classroom
+    submission_id = upload(student, assignment_id, SCRIPT, content_type)
+
+    response = teacher.get(f'/api/submissions/{submission_id}/content')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/octet-stream'
+    assert response.headers['Content-Disposition'].startswith('attachment')
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    assert response.get_data() == SCRIPT
+
+
+def test_plain_text_stays_inline(classroom):
+    teacher, student, assignment_id = classroom
+    submission_id = upload(student, assignment_id, b'My essay', 'text/plain')
+
+    response = teacher.get(f'/api/submissions/{submission_id}/content')
+
+    assert response.mimetype == 'text/plain'
+    assert 'attachment' not in response.headers.get('Content-Disposition', '')
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+
+
+def test_allowed_binary_types_keep_their_type_but_download(classroom):
+    teacher, student, assignment_id = classroom
+    submission_id = upload(student, assignment_id, b'%PDF-1.4 ...', 'application/pdf')
+
+    response = teacher.get(f'/api/submissions/{submission_id}/content')
+
+    assert response.mimetype == 'application/pdf'
+    assert response.headers['Content-Disposition'].startswith('attachment')
+
+
+def test_rows_stored_before_the_allow_list_are_neutralized_when_served(db, classroom):
+    teacher, student, assignment_id = classroom
+    submission_id = upload(student, assignment_id, SCRIPT, 'text/plain')
+    db.session.get(Submission, submission_id).content_type = 'text/html'
+    db.session.commit()
+
+    response = teacher.get(f'/api/submissions/{submission_id}/content')
+
+    assert response.mimetype == 'application/octet-stream'
+    assert response.headers['Content-Disposition'].startswith('attachment')
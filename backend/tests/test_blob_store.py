@@ -0,0 +1,50 @@
+import os
+import time
+from types import SimpleNamespace
+
+from blob_store import LocalBlobStore, S3BlobStore
+
+
+def test_local_put_of_existing_bytes_refreshes_their_age(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    blob = store.put([b'worksheet'])
+    path = store.path(blob.digest)
+    week_ago = time.time() - 7 * 86400
+    os.utime(path, (week_ago, week_ago))
+
+    assert store.put([b'worksheet']).digest == blob.digest
+
+    assert os.path.getmtime(path) > time.time() - 60
+    assert os.listdir(store.tmp) == []
+
+
+class ClientError(Exception):
+    def __init__(self, code):
+        self.response = {'Error': {'Code': code}}
+
+
+class FakeS3:
+    exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def __init__(self):
+        self.objects = {}
+        self.copies = []
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective):
+        if Key not in self.objects:
+            raise ClientError('NoSuchKey')
+        self.copies.append(Key)
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        self.objects[key] = fileobj.read()
+
+
+def test_s3_put_of_existing_bytes_touches_instead_of_uploading():
+    client = FakeS3()
+    store = S3BlobStore('bucket', 'blobs', client=client)
+
+    blob = store.put([b'worksheet'])
+    store.put([b'worksheet'])
+
+    assert list(client.objects) == [store.key(blob.digest)]
+    assert client.copies == [store.key(blob.digest)]
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import ChatSession
+from routes import ai
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Stands in for Gemini; records the prompts it is sent."""
+    prompts = []
+
+    def call_gemini_api(prompt, role=None, use_cache=True):
+        prompts.append(prompt)
+        return f'answer {len(prompts)}'
+    monkeypatch.setattr(ai, 'get_genai_client', lambda: object())
+    monkeypatch.setattr(ai, 'call_gemini_api', call_gemini_api)
+    return prompts
+
+
+def chat(client, message, **fields):
+    response = client.post('/api/ai/chat', json={'message': message, 'role': 'student', **fields})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_chats_without_session_id_continue_the_conversation(db, make_user, login, model):
+    client = login(make_user('student'))
+
+    first = chat(client, 'What is a fraction?')
+    second = chat(client, 'Give me an example')
+
+    assert first['session_id'] == second['session_id']
+    assert ChatSession.query.count() == 1
+    assert 'What is a fraction?' in model[1] and 'answer 1' in model[1]
+
+
+def test_new_session_and_idle_sessions_start_over(db, make_user, login, model):
+    client = login(make_user('student'))
+    first = chat(client, 'Hello')
+
+    fresh = chat(client, 'Another topic', new_session=True)
+    assert fresh['session_id'] != first['session_id']
+    assert 'Hello' not in model[1]
+
+    db.session.get(ChatSession, fresh['session_id']).updated_at = datetime.utcnow() - timedelta(days=1)
+    db.session.get(ChatSession, first['session_id']).updated_at = datetime.utcnow() - timedelta(days=1)
+    db.session.commit()
+    assert chat(client, 'Later')['session_id'] not in (first['session_id'], fresh['session_id'])
+
+
+def test_explicit_session_of_another_user_is_refused(db, make_user, login, model):
+    other = chat(login(make_user('student')), 'Mine')
+
+    response = login(make_user('student')).post('/api/ai/chat', json={
+        'message': 'Let me in', 'role': 'student', 'session_id': other['session_id']
+    })
+
+    assert response.status_code == 404
+
+
+def test_model_call_runs_without_holding_the_write_lock(db, make_user, login, monkeypatch, write_lock_free):
+    client = login(make_user('student'))
+    free = []
+
+    def call_gemini_api(prompt, role=None, use_cache=True):
+        free.append(write_lock_free())
+        return 'answer'
+    monkeypatch.setattr(ai, 'get_genai_client', lambda: object())
+    monkeypatch.setattr(ai, 'call_gemini_api', call_gemini_api)
+
+    chat(client, 'First message of a new conversation')
+    chat(client, 'And a follow-up')
+
+    assert free == [True, True]
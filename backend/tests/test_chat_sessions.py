@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import chat_sessions
+from chat_sessions import build_session_prompt
+from models import ChatHistory, ChatSession
+
+
+def add_turns(db, session, count, size=40):
+    db.session.add_all(ChatHistory(
+        user_id=session.user_id, session_id=session.id, role='ai' if n % 2 else 'user',
+        message=f'turn {n} ' + 'x' * size, timestamp=datetime.utcnow()
+    ) for n in range(count))
+    db.session.commit()
+
+
+def test_turns_older_than_the_window_are_folded_into_the_summary(db, make_user, monkeypatch):
+    monkeypatch.setattr(chat_sessions, 'MAX_WINDOW_TURNS', 10)
+    monkeypatch.setattr(chat_sessions, 'HISTORY_TOKEN_BUDGET', 60)
+    monkeypatch.setattr(chat_sessions, 'SUMMARY_SLACK_TOKENS', 20)
+    user = make_user('teacher')
+    session = ChatSession(user_id=user.id, role='teacher', summarized_through_id=0)
+    db.session.add(session)
+    db.session.commit()
+    add_turns(db, session, 25)
+    folded = []
+
+    def summarize(prompt):
+        # Transcript lines look like "User: turn 3 xxx"
+        folded.extend(int(line.split()[2]) for line in prompt.splitlines() if ': turn ' in line)
+        return 'summary'
+
+    prompt = build_session_prompt(session, 'system', 'next', summarize)
+
+    turns = ChatHistory.query.order_by(ChatHistory.id).all()
+    kept = [t for t in turns if t.id > session.summarized_through_id]
+    # Every turn is either in the summary or still verbatim in the prompt; none are skipped
+    assert folded == list(range(len(turns) - len(kept)))
+    assert len(folded) > 15
+    assert all(t.message in prompt for t in kept)
+    assert session.summary == 'summary'
+
+
+def test_failed_summary_keeps_turns_for_the_next_attempt(db, make_user, caplog):
+    user = make_user('student')
+    session = ChatSession(user_id=user.id, role='student', summarized_through_id=0)
+    db.session.add(session)
+    db.session.commit()
+    add_turns(db, session, 20, size=800)
+
+    def summarize(prompt):
+        raise RuntimeError('model down')
+
+    build_session_prompt(session, '', 'next', summarize)
+
+    assert session.summarized_through_id == 0
+    assert 'Chat summary failed' in caplog.text
@@ -0,0 +1,16 @@
+from models import Enrollment
+
+
+def test_student_registered_before_class_created_is_enrolled(db, make_user, login, app):
+    teacher = make_user('teacher')
+    student = make_user('student', class_name='5A')
+    make_user('student', class_name='6B')
+
+    response = login(teacher).post('/api/classes/', json={'name': '5A'})
+    assert response.status_code == 201
+    class_id = response.get_json()['id']
+
+    assert [(e.class_id, e.student_id) for e in Enrollment.query] == [(class_id, student.id)]
+    roster = app.test_client().get('/api/auth/public/users?role=student&class_name=5A').get_json()
+    assert roster == [{'id': student.id, 'name': student.name}]
+    assert login(student).get('/api/classes/').get_json() == [{'id': class_id, 'name': '5A', 'teacher': teacher.name}]
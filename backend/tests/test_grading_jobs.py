@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+import grading_jobs
+from grading_jobs import create_grading_job, run_grading_job
+from models import Assignment, Class, GradingJob, Submission
+
+
+@pytest.fixture
+def assignment(db, make_user):
+    teacher = make_user('teacher')
+    course = Class(name='5A', teacher_id=teacher.id)
+    db.session.add(course)
+    db.session.flush()
+    assignment = Assignment(title='Essay', class_id=course.id)
+    db.session.add(assignment)
+    db.session.flush()
+    submitted_at = datetime.utcnow() - timedelta(hours=1)
+    for content in ('first draft', 'graded by hand', 'resubmitted'):
+        student = make_user('student', class_name='5A')
+        db.session.add(Submission(assignment_id=assignment.id, student_id=student.id, content=content,
+                                  status='submitted', submitted_at=submitted_at))
+    db.session.commit()
+    return assignment
+
+
+def test_submissions_changed_while_grading_keep_their_changes(db, assignment, monkeypatch):
+    monkeypatch.setattr(grading_jobs, 'GRADING_RATE_PER_SEC', 0)
+    job = create_grading_job(assignment, assignment.course.teacher_id)
+    db.session.commit()
+    engine = db.engine
+
+    def grade_fn(title, description, content, use_cache):
+        # The teacher and a student act on their own connections while the model is working
+        with engine.begin() as conn:
+            if content == 'graded by hand':
+                conn.execute(update(Submission).where(Submission.content == content)
+                             .values(grade='B+', feedback='Teacher', status='graded'))
+            elif content == 'resubmitted':
+                conn.execute(update(Submission).where(Submission.content == content)
+                             .values(content='second draft', submitted_at=datetime.utcnow()))
+        return {'grade': 'A', 'feedback': 'AI'}
+
+    run_grading_job(job.id, grade_fn)
+
+    db.session.expire_all()
+    grades = {s.content: (s.grade, s.feedback, s.status) for s in Submission.query}
+    assert grades == {
+        'first draft': ('A', 'AI', 'graded'),
+        'graded by hand': ('B+', 'Teacher', 'graded'),
+        'second draft': (None, None, 'submitted'),
+    }
+    job = db.session.get(GradingJob, job.id)
+    assert (job.status, job.graded, job.failed, job.total) == ('completed', 1, 0, 1)
@@ -0,0 +1,22 @@
+from routes import health
+
+
+def test_ready_without_gemini_key(db, app, monkeypatch):
+    monkeypatch.delenv('GEMINI_API_KEY', raising=False)
+    monkeypatch.delenv('GOOGLE_API_KEY', raising=False)
+    # The test database is built with create_all, so only the migration check may fail
+    monkeypatch.setattr('routes.health.migration_heads', lambda: set())
+    monkeypatch.setitem(health._cached, 'result', None)
+
+    response = app.test_client().get('/health/ready')
+    body = response.get_json()
+
+    assert body['dependencies']['gemini']['configured'] is False
+    assert 'gemini' not in body['checks']
+    assert response.status_code == 200, body
+
+
+def test_liveness_makes_no_queries(app, count_statements):
+    with count_statements() as statements:
+        assert app.test_client().get('/health').status_code == 200
+    assert statements == []
@@ -0,0 +1,44 @@
+from models import Resource
+
+
+def seed_resources(db, teacher, count):
+    db.session.add_all(Resource(title=f'Worksheet {n}', type='worksheet', teacher_id=teacher.id)
+                       for n in range(count))
+    db.session.commit()
+
+
+def test_unpaginated_callers_get_every_row(db, make_user, login):
+    teacher = make_user('teacher')
+    seed_resources(db, teacher, 60)
+
+    response = login(teacher).get('/api/resources/')
+
+    assert response.status_code == 200
+    assert isinstance(response.get_json(), list)
+    assert len(response.get_json()) == 60
+
+
+def test_cursor_walks_every_row_once(db, make_user, login):
+    teacher = make_user('teacher')
+    seed_resources(db, teacher, 60)
+    client = login(teacher)
+
+    seen, cursor = [], None
+    while True:
+        query = f'limit=25&cursor={cursor}' if cursor else 'limit=25'
+        page = client.get(f'/api/resources/?{query}').get_json()
+        assert page['limit'] == 25
+        seen.extend(item['id'] for item in page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen)) == 60
+
+
+def test_malformed_arguments_are_rejected(db, make_user, login):
+    client = login(make_user('teacher'))
+
+    assert client.get('/api/resources/?limit=ten').status_code == 400
+    assert client.get('/api/resources/?cursor=garbage').status_code == 400
+    assert client.get('/api/resources/?sort=colour').status_code == 400
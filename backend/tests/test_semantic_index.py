@@ -0,0 +1,102 @@
+import shutil
+
+import pytest
+
+import semantic_index
+from models import Assignment, Class, Enrollment, Resource, Task
+from routes import ai
+from search_index import index_rows
+
+
+@pytest.fixture
+def index(app, db):
+    """An empty vector index directory, re-read on the next query."""
+    index = app.extensions['semantic_index']
+    shutil.rmtree(index.directory, ignore_errors=True)
+    index._checked_at = index._missing_reported_at = 0
+    yield index
+    index._checked_at = 0
+
+
+def refreshed(index):
+    semantic_index.refresh()
+    index._checked_at = 0
+
+
+@pytest.fixture
+def school(db, make_user):
+    teacher = make_user('teacher')
+    student = make_user('student', class_name='5A')
+    mine, other = Class(name='5A', teacher_id=teacher.id), Class(name='6B', teacher_id=teacher.id)
+    db.session.add_all([mine, other])
+    db.session.flush()
+    db.session.add(Enrollment(class_id=mine.id, student_id=student.id))
+    db.session.add_all([
+        Assignment(title='Plant project', class_id=mine.id,
+                   description='Explain how photosynthesis turns sunlight and water into glucose in the leaf.'),
+        Assignment(title='Volcano report', class_id=other.id,
+                   description='Describe how photosynthesis stops when volcano ash blocks the sunlight.'),
+        Resource(title='Fractions practice', type='worksheet', teacher_id=teacher.id,
+                 content='Add fractions with like denominators and simplify each answer.'),
+    ])
+    db.session.commit()
+    return teacher, student
+
+
+def test_enrolled_student_retrieves_own_class_assignments_only(app, index, school):
+    teacher, student = school
+    refreshed(index)
+
+    with app.test_request_context():
+        hits = semantic_index.retrieve('photosynthesis sunlight glucose', student)
+
+    assert [(h.kind, h.title) for h in hits] == [('assignment', 'Plant project')]
+
+
+def test_teacher_finds_own_resource_as_duplicate(app, index, school):
+    teacher, student = school
+    refreshed(index)
+
+    with app.test_request_context():
+        duplicate = semantic_index.find_duplicate(
+            'Fractions practice\nAdd fractions with like denominators and simplify each answer.', teacher
+        )
+        assert semantic_index.find_duplicate('Write a poem about the sea', teacher) is None
+        assert semantic_index.find_duplicate('Fractions practice', student) is None
+
+    assert duplicate.title == 'Fractions practice' and duplicate.score >= semantic_index.SEMANTIC_DUPLICATE_THRESHOLD
+
+
+def test_hits_for_rows_deleted_since_the_refresh_are_dropped(app, db, index, school):
+    teacher, student = school
+    refreshed(index)
+    resource = Resource.query.filter_by(title='Fractions practice').one()
+    db.session.delete(resource)
+    db.session.commit()
+    index_rows('resource', [resource.id])
+    db.session.commit()
+
+    with app.test_request_context():
+        assert semantic_index.retrieve('fractions denominators', teacher) == []
+
+
+def test_missing_index_is_queued_without_holding_the_write_lock(db, index, school, login, monkeypatch, caplog,
+                                                               write_lock_free):
+    teacher, student = school
+    # The refresh queued by seeding would absorb the one under test
+    Task.query.delete()
+    db.session.commit()
+    free = []
+
+    def call_gemini_api(prompt, role=None, use_cache=True):
+        free.append(write_lock_free())
+        return 'answer'
+    monkeypatch.setattr(ai, 'get_genai_client', lambda: object())
+    monkeypatch.setattr(ai, 'call_gemini_api', call_gemini_api)
+
+    response = login(student).post('/api/ai/chat', json={'message': 'photosynthesis', 'role': 'student'})
+
+    assert response.status_code == 200
+    assert free == [True]
+    assert 'Library retrieval failed' not in caplog.text
+    assert Task.query.filter_by(name='semantic_refresh', status='queued').count() == 1
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from models import Task
+from tasks import claim, enqueue, run_task, task
+
+
+@task('test_echo')
+def echo(value):
+    return {'echo': value}
+
+
+def test_idle_poll_only_reads(db, count_statements):
+    db.session.add(Task(name='test_echo', payload='{}', status='queued', run_at=datetime.utcnow() + timedelta(hours=1)))
+    db.session.commit()
+
+    with count_statements() as statements:
+        assert claim('worker-1') is None
+
+    assert [s.split()[0] for s in statements] == ['SELECT']
+
+
+def test_due_task_is_claimed_and_run(db):
+    queued = enqueue(echo, {'value': 3})
+    db.session.commit()
+
+    assert claim('worker-1') == queued.id
+    assert claim('worker-2') is None
+    run_task(queued.id, 'worker-1')
+
+    finished = db.session.get(Task, queued.id)
+    assert (finished.status, finished.result, finished.attempts) == ('succeeded', '{"echo": 3}', 1)